@@ -1,187 +1,201 @@
 import streamlit as st
-import branca.colormap as cm
-import geopandas as gpd
-import numpy as np
 import pandas as pd
-import folium
-from streamlit_folium import st_folium
-from streamlit_gsheets import GSheetsConnection
-import plotly.express as px
-import unicodedata
-from datetime import date, datetime  # <-- CORRECCIÓN 2: Importar date y datetime
+import json
+import logging
+import os
+import time
+from functools import partial, wraps
+from nucleo.cantones import ConciliadorCantones
+from nucleo.cubo import (PORCENTAJES_ANUALES, actualizar_anual, actualizar_cubo, colapsar, construir_anual, construir_cubo,
+                         construir_mascara, resumen_certificacion, serie_anual)
+from nucleo.datos import (NOMBRE_AMIGABLE, SIN_DATO, cantidades_por_canton, cantones_fuera_del_mapa, cargar_hojas,
+                          cursos_seleccionados, detalle_sin_dato_html, filas_filtradas, nombres_cursos,
+                          normalizar_datos, preparar_datos_resumen)
+from nucleo.exportar import FORMATOS, exportar
+from nucleo.indice import IndiceFiltros
+from nucleo.memo import CacheLRU, clave_filtros
+from nucleo.snapshot import SnapshotHoja
+from nucleo.tiempos import ACTIVO_POR_DEFECTO, activar, activo, etapa, registros
+
+# Arranque: arriba solo se importa lo necesario para dibujar la página. El cliente
+# de Google Sheets, geopandas, folium y plotly se importan donde se usan, así el
+# título y la barra lateral aparecen antes (ver benchmarks/bench_arranque.py).
 
 st.set_page_config(layout="wide", page_title="Mapa y Estadísticas — TCU Nirien")
 
+# Perfilado (nucleo/tiempos.py): PERFILADO=1 en el entorno o ?perfilado=1 en la URL.
+# Apagado no mide nada; encendido muestra el panel en la barra lateral y escribe
+# cada etapa como una línea JSON en el log.
+def perfilado_pedido():
+    return ACTIVO_POR_DEFECTO or st.query_params.get("perfilado") == "1"
+
+activar(perfilado_pedido())
+inicio_pagina = time.perf_counter()
+
 # ---------------------------
 # Funciones auxiliares
 # ---------------------------
-def clasificar_edad(valor):
-    try:
-        if pd.isna(valor):
-            return 'Sin dato'
-        if isinstance(valor, (int, float, np.integer, np.floating)):
-            v = int(valor)
-            if 13 <= v <= 18:
-                return "13 a 18"
-            elif 19 <= v <= 35:
-                return "19 a 35"
-            elif 36 <= v <= 64:
-                return "36 a 64"
-            elif v >= 65 and v < 98:
-                return "Mayor a 65"
-            # casos especiales
-            elif v in (98, 102, 109):
-                return "19 a 35"
-            elif v in (99, 105, 106):
-                return "36 a 64"
-            elif v == 103:
-                return "30 a 39"
-            else:
-                return 'Sin dato'
-        v = str(valor).strip()
-        if v == '' or v.lower() == 'información incompleta':
-            return 'Sin dato'
-        if v in ['15-19', '15 a 18', '15-18']:
-            return '13 a 18'
-        if v in ["19-35", "20-29", "20 a 29", "18 a 35 años", "20 o más", "Más de 20"]:
-            return '19 a 35'
-        if v in ["30-39", "30 a 39"]:
-            return "30 a 39"
-        if v in ["36-64", "40-49", "40 a 49", "50-59", "Más de 50", "36 a 64 años", "Más de 30"]:
-            return '36 a 64'
-        if v in ["Más de 60", "Más de 65"]:
-            return 'Mayor a 65'
-        if v in ["Sin dato"]:
-            return "Sin dato"
-    except Exception:
-        return 'Sin dato'
-    return 'Sin dato'
-
-def normalizar_sexo(valor):
-    if pd.isna(valor):
-        return "Sin dato"
-    v = str(valor).strip()
-    if v == "":
-        return "Sin dato"
-    low = v.lower()
-    if low in ['femenino', 'f', 'mujer', 'female']:
-        return 'Femenino'
-    if low in ['masculino', 'm', 'hombre', 'male']:
-        return 'Masculino'
-    if low in ['no indica', 'no responde', 'no contesta', 'nr']:
-        return 'NR'
-    if low in ['sin dato', 'ns']:
-        return 'Sin dato'
-    return 'Sin dato'
-
-def strip_accents(s: str) -> str:
-    return unicodedata.normalize('NFKD', s).encode('ascii', errors='ignore').decode('utf-8') if isinstance(s, str) else s
-
-def safe_get_column(df, candidates):
-    for c in candidates:
-        if c in df.columns:
-            return c
-    return None
+def cronometrada(seccion):
+    # Mide la sección y, con el perfilado encendido, muestra el tiempo al pie. Aplicada
+    # debajo de @st.fragment también mide los reruns del fragmento solo (que corren
+    # en otro hilo, por eso se vuelve a activar la medición sin borrar los registros)
+    def decorador(funcion):
+        @wraps(funcion)
+        def envoltura(*args, **kwargs):
+            activar(perfilado_pedido(), reiniciar=False)
+            with etapa(f"seccion.{seccion}") as e:
+                resultado = funcion(*args, **kwargs)
+            if e.ms is not None:
+                st.caption(f"⏱️ {seccion}: {e.ms:.0f} ms")
+            return resultado
+        return envoltura
+    return decorador
 
 # ---------------------------
 # Config y rutas
 # ---------------------------
-ruta_mapa = "limitecantonal_5k_fixed.geojson"
-columna_mapa = "CANTÓN"  # columna en el geojson con el nombre del cantón
-
-# Diccionario nombres amigables
-nombre_amigable = {
-    "admision": "Admisión y lógica",
-    "admisión": "Admisión y lógica",
-    "eplve": "Economía para la vida",
-    "eplvim": "Economía para la vida: indicadores macroeconómicos",
-    "eplvmys": "Economía para la Vida: mercado y sociedad",
-    "excel": "Excel",
-    "excelbasico": "Excel básico",
-    "excelintermedio": "Excel intermedio",
-    "redaccion": "Redacción Consciente"
-}
+# Fuentes de la geometría cantonal, en orden de preferencia (ver nucleo/geometria.py).
+# limitecantonal_5k.geojson trae los polígonos solo como WKT en la columna SHAPE y
+# casi todos quedaron cortados en 32767 caracteres al exportarlo desde una hoja; si
+# no se puede preparar, se usa costaricacantonesv10.geojson. La caché de geometría
+# renombra las columnas, así que columna_mapa es la misma con cualquiera de las dos.
+rutas_mapa = ["limitecantonal_5k.geojson", "costaricacantonesv10.geojson"]
+columna_mapa = "CANTÓN"  # columna de la geometría preparada con el nombre del cantón
+# Tope de la caché de resultados por selección que comparten las sesiones (ver nucleo/memo.py)
+max_bytes_resultados = 64 * 2**20
+# Pestañas de la hoja que se unen en un solo conjunto de datos (p. ej. las de años anteriores)
+hojas_datos = ["mapa_más_reciente"]
+directorio_cache_datos = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache_datos")
+nivel_mapa = "media"  # nivel de simplificación de la caché de geometrías (ver nucleo/geometria.py)
+# Mapa dinámico: nivel de la geometría según el zoom, {nivel: zoom máximo} (None = sin tope).
+# El mapa clásico manda la geometría en cada rerun, así que usa solo nivel_mapa.
+niveles_zoom = {"baja": 7, "media": 9, "alta": None}
+# Mapa dinámico: los polígonos se descargan una vez como archivo estático y cada
+# cambio de filtro solo envía las cantidades por cantón (requiere
+# server.enableStaticServing, ver .streamlit/config.toml). Si no, se usa el mapa completo.
+mapa_dinamico = True
+# Asignar cantón a las filas 'Sin dato' que traen coordenadas o código de distrito/postal
+# (ver nucleo/geocodificar.py). Usa los polígonos de rutas_mapa sin simplificar ("completa"),
+# y los códigos de cantón (PCC) de la primera fuente que los traiga: los de
+# limitecantonal_5k.geojson se leen aunque sus polígonos no se puedan usar.
+geocodificar_cantones = True
+columna_codigo_canton = "CÓDIGO_CANTÓN"  # código de cantón (PCC), solo si la fuente lo trae
+
+# Nombres amigables de los cursos (ver nucleo/datos.py)
+nombre_amigable = NOMBRE_AMIGABLE
 
 st.title("📊 Mapa y Estadísticas de las personas beneficiarias: TCU Nirien - Habilidades para la Vida - UCR")
 
 # ---------------------------
-# Cargar datos (cacheados una vez por sesión)
+# Cargar datos (snapshot local compartido por las sesiones y procesos del nodo)
 # ---------------------------
-conn = st.connection("gsheets", type=GSheetsConnection)
+def leer_hoja():
+    # El cliente de Google Sheets (y google-auth) se importa recién al ir a la hoja:
+    # con el snapshot local vigente, el arranque no lo carga.
+    # ttl=0: cada refresco va a la hoja, sin pasar por la caché interna de la conexión.
+    # Con varias pestañas (hojas_datos) se leen a la vez y se unen (ver nucleo/datos.py).
+    from streamlit_gsheets import GSheetsConnection
+    conn = st.connection("gsheets", type=GSheetsConnection)
+    return cargar_hojas(lambda hoja: conn.read(worksheet=hoja, ttl=0), hojas_datos)
+
+@st.cache_resource
+def conciliador_cantones():
+    # Índice de nombres de cantón del geojson; memoriza cada valor de la hoja ya resuelto
+    from nucleo.geometria import cargar_primera_geometria
+    try:
+        return ConciliadorCantones(cargar_primera_geometria(rutas_mapa, nivel=nivel_mapa)[columna_mapa])
+    except Exception:
+        logging.getLogger(__name__).exception("No se pudo preparar la conciliación de cantones")
+        return None
+
+@st.cache_resource
+def ubicador_cantones():
+    # Índice espacial de los cantones; si la geometría no está disponible no se geocodifica
+    if not geocodificar_cantones:
+        return None
+    from nucleo.geocodificar import UbicadorCantones
+    from nucleo.geometria import cargar_primera_geometria, codigos_cantones
+    try:
+        return UbicadorCantones(cargar_primera_geometria(rutas_mapa, nivel="completa"), columna_mapa,
+                                columna_codigo_canton, codigos=codigos_cantones(rutas_mapa))
+    except Exception:
+        logging.getLogger(__name__).exception("No se pudo preparar la geocodificación de cantones")
+        return None
+
+@st.cache_resource
+def snapshot_datos():
+    # Snapshot Arrow de la hoja normalizada (ver nucleo/snapshot.py y nucleo/datos.py). El archivo lo
+    # comparten todos los procesos del nodo y solo uno a la vez va a la hoja; cada proceso
+    # tiene su propia copia del DataFrame, que comparten sus sesiones. El
+    # conciliador y el ubicador se arman recién cuando hay que normalizar una hoja nueva.
+    return SnapshotHoja(leer=leer_hoja,
+                        normalizar=lambda df: normalizar_datos(df, conciliador=conciliador_cantones(),
+                                                               ubicador=ubicador_cantones()),
+                        ruta=os.path.join(directorio_cache_datos, "mapa_más_reciente.arrow"),
+                        max_edad=600,
+                        agregados={
+                            # Conteos por combinación de filtros; en un refresco
+                            # incremental se actualiza solo con las filas que cambiaron
+                            'cubo': (construir_cubo, actualizar_cubo),
+                            # Bitmaps por valor de filtro para recortar la hoja sin
+                            # comparar strings; se reconstruye con cada hoja nueva
+                            'indice': (IndiceFiltros, None),
+                            # Inscritos/certificados/deserciones/intermitentes por año × curso × cantón,
+                            # para el gráfico por año; se actualiza igual que el cubo
+                            'anual': (construir_anual, actualizar_anual),
+                        })
 
-@st.cache_data(ttl=600)
 def cargar_datos():
-    # Lee la hoja
-    df = conn.read(worksheet="mapa_más_reciente")
-
-    # --- CORRECCIÓN 2: Función robusta para convertir fechas ---
-    def convert_dates(x):
-        if isinstance(x, (pd.Timestamp, datetime, date)):
-            return x.strftime("%Y-%m-%d")
-        return x
-    
-    # Aplicar la conversión
-    df = df.applymap(convert_dates)
-    # ---------------------------------------------------------
-
-    # --- MEJORA 3: Carga segura de columnas ---
-    # Normalizaciones y tipos
-    if 'CURSO' in df.columns:
-        df['CURSO'] = df['CURSO'].fillna('').astype(str)
-    else:
-        df['CURSO'] = '' # Asigna un str vacío si la columna no existe
-    df['CURSO_NORMALIZADO'] = df['CURSO'].str.lower().apply(strip_accents).str.strip()
-
-    # AÑO -> Int (si no posible -> NaN)
-    if 'AÑO' in df.columns:
-        df['AÑO'] = pd.to_numeric(df['AÑO'], errors='coerce').astype('Int64')
-    else:
-        df['AÑO'] = pd.NA # Asigna NA si la columna no existe
-    # ----------------------------------------------
-
-    # Flags -> int 0/1
-    for col in ['CERTIFICADO', 'DESERCION', 'INTERMITENTE']:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0).astype(int)
-        else:
-            df[col] = 0
-
-    # CANTON_DEF fallback
-    if 'CANTON_DEF' not in df.columns:
-        alt = safe_get_column(df, ['CANTÓN', 'Canton', 'CANTON', 'canton'])
-        if alt is not None:
-            df['CANTON_DEF'] = df[alt].fillna('Sin dato').astype(str).str.strip()
-        else:
-            df['CANTON_DEF'] = 'Sin dato'
-    else:
-        df['CANTON_DEF'] = df['CANTON_DEF'].fillna('Sin dato').astype(str).str.strip()
-
-    # EDAD y SEXO
-    if 'EDAD' in df.columns:
-        df['EDAD_CLASIFICADA'] = df['EDAD'].apply(clasificar_edad)
-    else:
-        df['EDAD_CLASIFICADA'] = 'Sin dato'
-
-    if 'SEXO' in df.columns:
-        df['SEXO_NORMALIZADO'] = df['SEXO'].apply(normalizar_sexo)
-    else:
-        df['SEXO_NORMALIZADO'] = 'Sin dato'
-
-    return df
+    # Se sirve el snapshot local al instante; si venció, se refresca en segundo plano.
+    # Devuelve (version, (df, cubo, indice, anual)), todo de la misma versión de la hoja.
+    return snapshot_datos().obtener('cubo', 'indice', 'anual', con_version=True)
+
+@st.cache_resource
+def cache_resultados():
+    # Una sola caché por proceso: todas las sesiones ven los mismos resultados
+    return CacheLRU(max_bytes_resultados)
+
+def memo(clave, nombre, calcular):
+    # Resultado derivado de la selección (clave de clave_filtros); compartido entre sesiones,
+    # así que no se modifica
+    return cache_resultados().obtener((clave, nombre), calcular)
+
+@st.cache_resource(ttl=3600)
+def cargar_geojson(nivel):
+    # Geometría simplificada y cuantizada; se construye una sola vez a partir de rutas_mapa.
+    # El GeoParquet en disco lo construye un solo proceso y los demás lo leen; dentro del
+    # proceso todas las sesiones usan el mismo objeto (no se modifica), sin copiarlo en cada rerun.
+    from nucleo.geometria import cargar_primera_geometria
+    return cargar_primera_geometria(rutas_mapa, nivel=nivel)
 
 @st.cache_data(ttl=3600)
-def cargar_geojson():
-    return gpd.read_file(ruta_mapa)
+def publicar_geojson():
+    # Publica la geometría de cada nivel de niveles_zoom en static/ y devuelve
+    # [(URL con la que la pide el navegador, zoom máximo), ...]
+    from nucleo.mapa import publicar_geometria
+    directorio = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+    base = st.get_option("server.baseUrlPath").strip("/")
+    niveles = []
+    for nivel, zoom_maximo in niveles_zoom.items():
+        nombre = publicar_geometria(cargar_geojson(nivel), columna_mapa, directorio=directorio)
+        niveles.append(("/" + "/".join(p for p in (base, "app/static", nombre) if p), zoom_maximo))
+    return niveles
 
 # Cargar fuera del formulario (solo una vez por sesión)
 try:
-    df = cargar_datos()
+    with etapa("datos.obtener") as e:
+        # Versión de los datos servidos: junto con los filtros identifica los resultados
+        # compartidos y los archivos exportados
+        version_datos, (df, cubo, indice, anual) = cargar_datos()
+        e.filas = len(df)
 except Exception as e:
     st.error(f"Error cargando Google Sheet: {e}")
     st.stop()
 
 try:
-    gdf = cargar_geojson()
+    with etapa("geojson.cargar") as e:
+        gdf = cargar_geojson(nivel_mapa)
+        e.filas = len(gdf)
 except Exception as e:
     st.error(f"Error cargando GeoJSON: {e}")
     st.stop()
@@ -198,7 +212,7 @@ with st.sidebar:
     # Cursos
     select_all_cursos = st.checkbox("Seleccionar todos los cursos", value=True)
     cursos_disponibles_raw = sorted(df['CURSO_NORMALIZADO'].dropna().unique())
-    cursos_display = [nombre_amigable.get(c, c.title()) for c in cursos_disponibles_raw]
+    cursos_display = nombres_cursos(cursos_disponibles_raw, nombre_amigable)
     if not select_all_cursos:
         seleccion_cursos_display = st.multiselect("Cursos (seleccioná uno o más)", cursos_display, default=cursos_display[:3])
     else:
@@ -258,18 +272,7 @@ with st.sidebar:
 # Construir las listas finales de selección (desambiguar nombres amigables)
 # ---------------------------
 # Cursos: convertir la selección visible a keys normalizadas
-if seleccion_cursos_display is None:
-    cursos_filtrados = list(cursos_disponibles_raw)
-else:
-    cursos_filtrados = []
-    # primero keys de nombre_amigable que coincidan
-    for key, friendly in nombre_amigable.items():
-        if friendly in seleccion_cursos_display:
-            cursos_filtrados.append(key)
-    # luego las que no están en nombre_amigable
-    for raw, disp in zip(cursos_disponibles_raw, cursos_display):
-        if disp in seleccion_cursos_display and raw not in cursos_filtrados:
-            cursos_filtrados.append(raw)
+cursos_filtrados = cursos_seleccionados(seleccion_cursos_display, cursos_disponibles_raw, nombre_amigable)
 
 # Años
 if seleccion_anios is None:
@@ -301,285 +304,248 @@ else:
 # ---------------------------
 # Filtrado eficiente
 # ---------------------------
-mask = pd.Series(True, index=df.index)
-
-# Cursos
-if cursos_filtrados:
-    mask &= df['CURSO_NORMALIZADO'].isin(cursos_filtrados)
-
-# Años (df['AÑO'] es Int64)
-if len(anios_seleccionados) > 0:
-    # Asegurarse de que los Nulos (pd.NA) no se incluyan si no se seleccionan
-    mask &= df['AÑO'].isin(anios_seleccionados)
-
-# Cantones
-if cantones_seleccionados:
-    mask &= df['CANTON_DEF'].isin(cantones_seleccionados)
-
-# Flags (OR entre seleccionadas)
-if not select_all_flags: # Solo aplicar filtro de flags si "Seleccionar todos" está desmarcado
-    mask_flag = pd.Series(False, index=df.index)
-    if cert_flags['CERTIFICADO']:
-        mask_flag |= (df['CERTIFICADO'] == 1)
-    if cert_flags['DESERCION']:
-        mask_flag |= (df['DESERCION'] == 1)
-    if cert_flags['INTERMITENTE']:
-        mask_flag |= (df['INTERMITENTE'] == 1)
-    
-    # Si ninguna flag está seleccionada, pero 'select_all' está desmarcado, no mostrar nada
-    if not (cert_flags['CERTIFICADO'] or cert_flags['DESERCION'] or cert_flags['INTERMITENTE']):
-         mask &= False # Forzar máscara a todo Falso
-    else:
-        mask &= mask_flag
-
-# Edades
-if edades_seleccionadas:
-    mask &= df['EDAD_CLASIFICADA'].isin(edades_seleccionadas)
+# Flags: None = todos los estados; si no, OR entre las columnas marcadas
+flags_seleccionados = None if select_all_flags else [col for col, activo in cert_flags.items() if activo]
 
-# Sexos
-if sexos_seleccionados:
-    mask &= df['SEXO_NORMALIZADO'].isin(sexos_seleccionados)
+filtros = dict(cursos=cursos_filtrados, anios=anios_seleccionados, cantones=cantones_seleccionados,
+               flags=flags_seleccionados, edades=edades_seleccionadas, sexos=sexos_seleccionados)
 
-df_filtrado = df[mask].copy()
+# Clave canónica de la selección: no depende del orden de los valores y "Seleccionar
+# todos" da la misma que elegir cada valor a mano. Indexa los resultados compartidos.
+disponibles = dict(cursos=cursos_disponibles_raw, anios=anios_disponibles, cantones=cantones_disponibles,
+                   edades=edades_disponibles, sexos=sexos_disponibles)
+clave_seleccion = clave_filtros(version_datos, filtros, 'seleccion', disponibles)
 
-# ===========================
-# Preparar datos resumidos para mapa y tablas
-# ===========================
-def preparar_datos_resumen(df_local):
-    df_local['CANTON_DEF'] = df_local['CANTON_DEF'].fillna('Sin dato')
-    df_cantonal = df_local.groupby('CANTON_DEF').size().reset_index(name='cantidad_beneficiarios')
-    df_detalle = df_local.groupby(['CANTON_DEF', 'CURSO_NORMALIZADO', 'AÑO']).size().reset_index(name='conteo')
-    return df_cantonal, df_detalle
-
-df_cantonal, df_detalle = preparar_datos_resumen(df_filtrado)
-
-# Merge con geojson (preservando geometrías)
-gdf_merged = gdf.merge(df_cantonal, how="left", left_on=columna_mapa, right_on="CANTON_DEF")
-gdf_merged['cantidad_beneficiarios'] = gdf_merged['cantidad_beneficiarios'].fillna(0).astype(int)
-gdf_merged['cantidad_color'] = gdf_merged['cantidad_beneficiarios']  # nombre claro para style_function
-
-# --- INICIO DE LA CORRECCIÓN PARA JSON ---
-# El error 'not JSON serializable' es casi siempre por un tipo de dato de numpy
-# (como int64) que Folium no puede manejar.
-# Forzamos la conversión a tipos nativos de Python (int) que SÍ son serializables.
-
-gdf_merged['cantidad_beneficiarios'] = gdf_merged['cantidad_beneficiarios'].apply(int)
-gdf_merged['cantidad_color'] = gdf_merged['cantidad_color'].apply(int)
-# --- FIN DE LA CORRECCIÓN ---
-
-# --- INICIO DE LA CORRECCIÓN DEFINITIVA ---
-# El error 'not JSON serializable' ocurre porque folium.GeoJson
-# intenta serializar TODAS las columnas de gdf_merged, incluidas
-# las columnas numéricas (int64, float64) del geojson original.
-
-# Solución: Crear un GeoDataFrame "limpio" solo con las columnas
-# que SÍ necesitamos, asegurándonos de que tengan tipos nativos.
-
-columnas_para_mapa = [
-    'geometry',      # Columna obligatoria de geopandas
-    columna_mapa,    # La usamos en el tooltip y estilo ('CANTÓN')
-    'cantidad_color' # La usamos en el tooltip y estilo (ya es 'int' nativo)
-]
-
-# Asegurarse de que no haya columnas duplicadas si columna_mapa == 'CANTON_DEF'
-# y chequear que existan
-columnas_finales = []
-for col in columnas_para_mapa:
-    if col in gdf_merged.columns and col not in columnas_finales:
-        columnas_finales.append(col)
-
-# Filtramos el GeoDataFrame. Folium AHORA solo recibirá estas columnas.
-gdf_para_mapa = gdf_merged[columnas_finales]
-# --- FIN DE LA CORRECCIÓN DEFINITIVA ---
+# Se filtra el cubo de conteos, no la hoja fila por fila
+with etapa("filtros.cubo", filas=len(cubo)):
+    cubo_filtrado = memo(clave_seleccion, 'cubo', lambda: cubo[construir_mascara(cubo, **filtros)])
+    total_filtrado = int(cubo_filtrado['conteo'].sum())
 
 # ===========================
-# Mapa (usando un solo GeoJson con style_function)
+# Mapa y detalle por cantón (fragmento)
 # ===========================
-st.subheader("🗺️ Mapa Interactivo")
-
-# Escala y colores
-max_beneficiarios = int(gdf_merged['cantidad_color'].max() or 0)
-if max_beneficiarios < 10:
-    max_beneficiarios = 10
-
-color_cero = '#ece7f2'
-color_no_seleccionado = '#D3D3D3'
-colores_escala = ['#a6bddb', '#74a9cf', '#3690c0', '#0570b0', '#034e7b']
-
-try:
-    pasos = np.logspace(start=0, stop=np.log10(max_beneficiarios), num=6)
-    pasos = [int(round(p)) for p in pasos]
-    pasos = sorted(list(set(pasos)))
-    if not pasos: # Asegurarse de que 'pasos' no esté vacío
-        pasos = [1, 10]
-    num_colores_necesarios = max(1, len(pasos) - 1)
-    
-    # Asegurarse de tener suficientes colores o repetir el último
-    if num_colores_necesarios > len(colores_escala):
-        colores_escala.extend([colores_escala[-1]] * (num_colores_necesarios - len(colores_escala)))
+@st.fragment
+@cronometrada("Mapa")
+def seccion_mapa(cubo_filtrado, select_all_cantones, cantones_seleccionados, clave):
+    from streamlit_folium import st_folium
+    from nucleo.mapa import (COLOR_CERO, COLOR_NO_SELECCIONADO, crear_estilo, crear_mapa_base,
+                             escala_beneficiarios, estilos_cantones, geojson_clasico)
+    with etapa("mapa.resumen", filas=len(cubo_filtrado)):
+        df_cantonal, _ = memo(clave, 'resumen', lambda: preparar_datos_resumen(cubo_filtrado))
+
+    usar_mapa_dinamico = mapa_dinamico and st.get_option("server.enableStaticServing")
+
+    # Cantidad por cantón del mapa (0 para los cantones sin beneficiarios con estos filtros)
+    cantidad_por_canton = memo(clave, 'cantidades', lambda: cantidades_por_canton(df_cantonal, gdf[columna_mapa]))
+
+    # ===========================
+    # Mapa (usando un solo GeoJson con style_function)
+    # ===========================
+    st.subheader("🗺️ Mapa Interactivo")
+
+    # Escala y colores
+    pasos, colores_escala, max_beneficiarios = escala_beneficiarios(cantidad_por_canton)
+
+    if usar_mapa_dinamico:
+        # El mapa base (sin datos) no cambia entre reruns, así que st_folium no lo
+        # vuelve a montar; solo se reenvía el grupo con el estilo del filtro actual.
+        m = crear_mapa_base(publicar_geojson(), columna_mapa, location=[9.7489, -83.7534], zoom_start=8)
+        no_seleccionados = [] if select_all_cantones else [c for c in cantidad_por_canton.index if c not in cantones_seleccionados]
+        with etapa("mapa.estilo", filas=len(cantidad_por_canton)) as e:
+            grupo_estilo = crear_estilo(cantidad_por_canton.to_dict(), columna_mapa, pasos, colores_escala,
+                                        no_seleccionados=no_seleccionados,
+                                        color_cero=COLOR_CERO,
+                                        color_no_seleccionado=COLOR_NO_SELECCIONADO)
+            if activo():
+                # Lo que viaja al navegador en cada rerun: las cantidades por cantón
+                e.bytes = len(cantidad_por_canton.to_json())
+        with etapa("mapa.st_folium"):
+            st_folium(m, key="mapa_cantones", feature_group_to_add=grupo_estilo, width=900, height=600, returned_objects=[])
     else:
-        colores_escala = colores_escala[:num_colores_necesarios]
-
-except Exception:
-    pasos = [1, 10]
-    colores_escala = [colores_escala[0]]
-
-# Asegurarse de que el índice tenga al menos vmin y un paso más
-if len(pasos) < 2:
-    pasos = [1, max(2, max_beneficiarios)]
-    colores_escala = [colores_escala[0]]
-
-colormap = cm.StepColormap(colors=colores_escala, index=pasos, vmin=1, vmax=max_beneficiarios, caption='Cantidad de Beneficiarios')
+        import branca.colormap as cm
+        import folium
+        # El colormap queda solo para la leyenda; los colores se calculan en estilos_cantones()
+        colormap = cm.StepColormap(colors=colores_escala, index=pasos, vmin=1, vmax=max_beneficiarios, caption='Cantidad de Beneficiarios')
+        seleccionados = None if select_all_cantones else cantones_seleccionados
+
+        m = folium.Map(location=[9.7489, -83.7534], zoom_start=8)
+
+        # Tooltip
+        tooltip = folium.GeoJsonTooltip(fields=[columna_mapa, 'cantidad_color'],
+                                        aliases=['Cantón', 'Beneficiarios'],
+                                        localize=True)
+
+        def calcular_geojson():
+            # Solo geometría, nombre y cantidad, con tipos nativos (ver nucleo/mapa.py)
+            para_mapa = geojson_clasico(gdf, df_cantonal, columna_mapa)
+            # Estilo de todos los cantones de una vez, como propiedad 'style' de cada feature:
+            # sin style_function, folium no llama a Python por cantón ni arma una tabla de estilos
+            para_mapa['style'] = estilos_cantones(para_mapa[columna_mapa], para_mapa['cantidad_color'],
+                                                  pasos, colores_escala, seleccionados)
+            return para_mapa.__geo_interface__
+
+        with etapa("mapa.geojson", filas=len(gdf)) as e:
+            datos_geojson = memo(clave, 'geojson', calcular_geojson)
+            if activo():
+                e.bytes = len(json.dumps(datos_geojson, default=str))
+        folium.GeoJson(
+            data=datos_geojson,
+            tooltip=tooltip,
+            name='Cantones'
+        ).add_to(m)
+
+        m.add_child(colormap)
+        with etapa("mapa.st_folium"):
+            st_folium(m, width=900, height=600, returned_objects=[])
+
+    # ===========================
+    # Detalle "Sin dato" y detalle por cantón
+    # ===========================
+    # El filtro de cantones usa los nombres del mapa, así que deja afuera los 'Sin dato' y
+    # los cantones sin equivalente: se cuentan aparte, con todos los demás filtros
+    def calcular_resumen_fuera():
+        mascara = construir_mascara(cubo, **dict(filtros, cantones=None)) & ~cubo['CANTON_DEF'].isin(gdf[columna_mapa])
+        return preparar_datos_resumen(cubo[mascara])
+
+    df_cantonal_fuera, df_detalle_fuera = memo(clave, 'resumen_fuera', calcular_resumen_fuera)
+    total_sin_dato = int(df_cantonal_fuera.loc[df_cantonal_fuera['CANTON_DEF'] == SIN_DATO,
+                                               'cantidad_beneficiarios'].sum())
+    if total_sin_dato > 0:
+        with st.expander(f"ℹ️ Observaciones 'Sin dato' (fuera del mapa): {total_sin_dato} personas"):
+            detalle_html = memo(clave, 'detalle_sin_dato',
+                                lambda: detalle_sin_dato_html(df_detalle_fuera, nombre_amigable))
+            if detalle_html is None:
+                st.write("No se encontró detalle para las observaciones 'Sin dato'.")
+            else:
+                st.markdown("<strong>Detalle por curso y año:</strong>", unsafe_allow_html=True)
+                st.markdown(detalle_html, unsafe_allow_html=True)
 
-m = folium.Map(location=[9.7489, -83.7534], zoom_start=8)
+    # Cantones de la hoja que no se pudieron conciliar con el geojson: se cuentan en
+    # las estadísticas pero no se pintan, así que se listan aparte
+    fuera_del_mapa = cantones_fuera_del_mapa(df_cantonal_fuera, cantidad_por_canton)
+    if not fuera_del_mapa.empty:
+        with st.expander(f"⚠️ Cantones sin equivalente en el mapa: {int(fuera_del_mapa['cantidad_beneficiarios'].sum())} personas"):
+            st.dataframe(fuera_del_mapa.set_index('CANTON_DEF'))
 
-# style_function
-def estilo_feature(feature):
-    props = feature.get('properties', {})
-    canton = props.get(columna_mapa, "")
-    cantidad = int(props.get('cantidad_color', 0) or 0)
-    
-    # Lógica para cantones no seleccionados
-    if not select_all_cantones and canton not in cantones_seleccionados:
-        return {
-            'fillColor': color_no_seleccionado,
-            'color': 'black',
-            'weight': 1,
-            'fillOpacity': 0.25
-        }
-    
-    # Lógica para cantones seleccionados (o todos)
-    if cantidad == 0:
-        return {
-            'fillColor': color_cero,
-            'color': 'black',
-            'weight': 1,
-            'fillOpacity': 0.7
-        }
-    return {
-        'fillColor': colormap(cantidad),
-        'color': 'black',
-        'weight': 1,
-        'fillOpacity': 0.7
-    }
-
-# Tooltip
-tooltip = folium.GeoJsonTooltip(fields=[columna_mapa, 'cantidad_color'],
-                                aliases=['Cantón', 'Beneficiarios'],
-                                localize=True)
-
-folium.GeoJson(
-    data=gdf_para_mapa.__geo_interface__, # <-- USAR EL DATAFRAME LIMPIO
-    style_function=lambda feature: estilo_feature(feature),
-    tooltip=tooltip,
-    name='Cantones'
-).add_to(m)
-
-m.add_child(colormap)
-st_folium(m, width=900, height=600, returned_objects=[])
+seccion_mapa(cubo_filtrado, select_all_cantones, cantones_seleccionados, clave_seleccion)
 
 # ===========================
-# Detalle "Sin dato" y detalle por cantón
+# Estadísticas descriptivas (fragmento)
 # ===========================
-df_sin_dato = df_filtrado[df_filtrado['CANTON_DEF'].fillna('Sin dato') == "Sin dato"]
-total_sin_dato = len(df_sin_dato)
-if total_sin_dato > 0:
-    with st.expander(f"ℹ️ Observaciones 'Sin dato' (fuera del mapa): {total_sin_dato} personas"):
-        detalles_sin_dato = df_detalle[df_detalle['CANTON_DEF'] == "Sin dato"]
-        if detalles_sin_dato.empty:
-            st.write("No se encontró detalle para las observaciones 'Sin dato'.")
-        else:
-            st.markdown("<strong>Detalle por curso y año:</strong>", unsafe_allow_html=True)
-            detalle_html = "<ul>"
-            for _, d in detalles_sin_dato.iterrows():
-                curso = nombre_amigable.get(d['CURSO_NORMALIZADO'], d['CURSO_NORMALIZADO'].title())
-                detalle_html += f"<li>{curso} ({int(d['AÑO']) if not pd.isna(d['AÑO']) else 'ND'}): {d['conteo']} personas</li>"
-            detalle_html += "</ul>"
-            st.markdown(detalle_html, unsafe_allow_html=True)
+@st.fragment
+@cronometrada("Estadísticas")
+def seccion_estadisticas(cubo_filtrado, clave):
+    st.subheader("📊 Estadísticas Descriptivas")
 
-# ===========================
-# Estadísticas descriptivas
-# ===========================
-st.subheader("📊 Estadísticas Descriptivas")
+    if cubo_filtrado['conteo'].sum() == 0:
+        st.info("No hay datos con los filtros seleccionados.")
+    else:
+        # Resumen por Curso
+        st.subheader("Resumen por Curso")
+        with etapa("estadisticas.resumen_curso", filas=len(cubo_filtrado)):
+            resumen_curso = memo(clave, 'resumen_curso', lambda: resumen_certificacion(cubo_filtrado, 'CURSO_NORMALIZADO')
+                                 .rename(index=nombre_amigable))
+            st.dataframe(resumen_curso)
+
+        # Resumen por Cantón
+        st.subheader("Resumen por Cantón")
+        with etapa("estadisticas.resumen_canton", filas=len(cubo_filtrado)):
+            resumen_canton = memo(clave, 'resumen_canton', lambda: resumen_certificacion(cubo_filtrado, 'CANTON_DEF'))
+            st.dataframe(resumen_canton)
+
+        # Gráfico de línea por año
+        st.subheader("Gráfico de Línea por Año")
+        with etapa("estadisticas.grafico_anual"):
+            # Sin filtros de edad, sexo ni estado alcanza con la tabla anual (ver nucleo/cubo.py)
+            usar_tabla_anual = seleccion_edades is None and seleccion_sexos is None and flags_seleccionados is None
+            figura = memo(clave, 'grafico_anual',
+                          lambda: grafico_anual(anual if usar_tabla_anual else None, cubo_filtrado, filtros))
+        if figura is not None:
+            st.plotly_chart(figura, use_container_width=True)
+        else:
+            st.info("No hay datos con año asignado para graficar la evolución.")
 
-if df_filtrado.empty:
-    st.info("No hay datos con los filtros seleccionados.")
-else:
-    # Resumen por Curso
-    st.subheader("Resumen por Curso")
-    resumen_curso = df_filtrado.groupby(['CURSO_NORMALIZADO', 'CERTIFICADO']).size().unstack(fill_value=0)
-    resumen_curso['Total'] = resumen_curso.sum(axis=1)
-    # Proteger contra división por cero
-    resumen_curso['% Certificado'] = (resumen_curso.get(1, 0) / resumen_curso['Total']).replace([np.inf, -np.inf, np.nan], 0) * 100
-    resumen_curso = resumen_curso.rename(index=nombre_amigable)
-    st.dataframe(resumen_curso)
-
-    # Resumen por Cantón
-    st.subheader("Resumen por Cantón")
-    resumen_canton = df_filtrado.groupby(['CANTON_DEF', 'CERTIFICADO']).size().unstack(fill_value=0)
-    resumen_canton['Total'] = resumen_canton.sum(axis=1)
-    resumen_canton['% Certificado'] = (resumen_canton.get(1, 0) / resumen_canton['Total']).replace([np.inf, -np.inf, np.nan], 0) * 100
-    st.dataframe(resumen_canton)
-
-    # Gráfico de línea por año
-    st.subheader("Gráfico de Línea por Año")
-    # Filtrar Años que no sean NA
-    df_anual_filtrado = df_filtrado.dropna(subset=['AÑO'])
-    if not df_anual_filtrado.empty:
-        df_anual = df_anual_filtrado.groupby(['AÑO', 'CERTIFICADO']).size().unstack(fill_value=0)
-        df_anual['Total'] = df_anual.sum(axis=1)
-        df_anual['% Certificado'] = (df_anual.get(1, 0) / df_anual['Total']).replace([np.inf, -np.inf, np.nan], 0) * 100
-        df_anual = df_anual.sort_index()
-        fig_linea = px.line(df_anual.reset_index(), x='AÑO', y='% Certificado',
-                            title='Evolución de la Participación y Aprobación por Año',
-                            labels={'AÑO': 'Año', '% Certificado': '% Certificado'})
-        st.plotly_chart(fig_linea, use_container_width=True)
+def grafico_anual(anual, cubo_filtrado, filtros):
+    # Se guarda con memo(): volver a una selección ya vista no rearma la serie ni la figura
+    if anual is not None:
+        tabla = anual[construir_mascara(anual, filtros['cursos'], filtros['anios'], filtros['cantones'],
+                                        None, None, None)]
     else:
-        st.info("No hay datos con año asignado para graficar la evolución.")
+        tabla = construir_anual(cubo_filtrado)
+    serie = serie_anual(tabla)
+    if serie.empty:
+        return None
+    # plotly solo hace falta para este gráfico
+    import plotly.express as px
+    return px.line(serie.reset_index(), x='AÑO', y=list(PORCENTAJES_ANUALES), markers=True,
+                   hover_data={'INSCRITOS': True, 'Δ INSCRITOS': True, 'Δ % Certificado': ':.1f',
+                               'Δ % Deserción': ':.1f', 'Δ % Intermitencia': ':.1f'},
+                   title='Evolución de la Participación y Aprobación por Año',
+                   labels={'AÑO': 'Año', 'value': '%', 'variable': 'Indicador'})
+
+seccion_estadisticas(cubo_filtrado, clave_seleccion)
 
 
 # ===========================
-# Descargas
+# Descargas (fragmento)
 # ===========================
-st.subheader("📥 Descargar Datos Filtrados")
-
-@st.cache_data
-def convertir_a_excel(df_to_save):
-    import io
-    from pandas import ExcelWriter
-    output = io.BytesIO()
-    with ExcelWriter(output, engine='xlsxwriter') as writer:
-        df_to_save.to_excel(writer, index=False, sheet_name='DatosFiltrados')
-    return output.getvalue()
-
-if not df_filtrado.empty:
-    archivo_excel = convertir_a_excel(df_filtrado)
-    st.download_button(label="📥 Descargar datos filtrados en Excel",
-                       data=archivo_excel,
-                       file_name='datos_filtrados.xlsx',
-                       mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-else:
-    st.warning("No hay datos filtrados para descargar.")
-
-
-st.subheader("📥 Descargar Datos Colapsados (por Cantón - Curso - Año)")
-activar_colapsado = st.checkbox("Quiero descargar los datos colapsados por Cantón - Curso - Año")
-if activar_colapsado:
-    if df_filtrado.empty:
-        st.warning("No hay datos para colapsar con los filtros actuales.")
+directorio_exportaciones = os.path.join(directorio_cache_datos, "exportaciones")
+nombres_formato = {'xlsx': 'Excel', 'csv': 'CSV', 'parquet': 'Parquet'}
+
+def generar_descarga(obtener_df, formato, clave):
+    # Se ejecuta recién al hacer clic (en otro hilo). El archivo queda en disco bajo
+    # la clave de la selección, así que un segundo clic, otra sesión u otro proceso
+    # con los mismos filtros lo reutilizan sin volver a generarlo.
+    with exportar(obtener_df, formato, directorio_exportaciones, clave) as f:
+        return f.read()
+
+def botones_descarga(obtener_df, nombre, descripcion, clave):
+    for columna, (formato, (mime, _)) in zip(st.columns(len(FORMATOS)), FORMATOS.items()):
+        columna.download_button(label=f"📥 Descargar {descripcion} en {nombres_formato[formato]}",
+                                data=partial(generar_descarga, obtener_df, formato, clave),
+                                file_name=f'{nombre}.{formato}',
+                                mime=mime,
+                                on_click="ignore")
+
+@st.fragment
+@cronometrada("Descargas")
+def seccion_descargas(filtros, cubo_filtrado, total_filtrado, clave):
+    # La casilla de los datos colapsados solo vuelve a ejecutar este fragmento
+    st.subheader("📥 Descargar Datos Filtrados")
+    if total_filtrado > 0:
+        botones_descarga(partial(filas_filtradas, df, indice, filtros), 'datos_filtrados', 'datos filtrados',
+                         clave_filtros(version_datos, filtros, 'datos_filtrados', disponibles))
     else:
-        df_temp = df_filtrado.dropna(subset=['AÑO', 'CANTON_DEF']).copy()
-        if not df_temp.empty:
-            df_temp['CURSO_AÑO'] = df_temp['CURSO_NORMALIZADO'].map(nombre_amigable).fillna(df_temp['CURSO_NORMALIZADO'].str.title()) + " " + df_temp['AÑO'].astype(int).astype(str)
-            df_pivot = df_temp.pivot_table(index='CANTON_DEF', columns='CURSO_AÑO', values='CERTIFICADO', aggfunc='count', fill_value=0).reset_index()
-            df_pivot['TOTAL'] = df_pivot.drop(columns='CANTON_DEF').sum(axis=1)
-            columnas_ordenadas = ['CANTON_DEF'] + sorted([c for c in df_pivot.columns if c not in ['CANTON_DEF', 'TOTAL']]) + ['TOTAL']
-            df_pivot = df_pivot[columnas_ordenadas]
-            
-            archivo_excel_colapsado = convertir_a_excel(df_pivot)
-            st.download_button(label="📥 Descargar datos colapsados en Excel",
-                               data=archivo_excel_colapsado,
-                               file_name='datos_colapsados.xlsx',
-                               mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+        st.warning("No hay datos filtrados para descargar.")
+
+    st.subheader("📥 Descargar Datos Colapsados (por Cantón - Curso - Año)")
+    activar_colapsado = st.checkbox("Quiero descargar los datos colapsados por Cantón - Curso - Año")
+    if activar_colapsado:
+        if total_filtrado == 0:
+            st.warning("No hay datos para colapsar con los filtros actuales.")
         else:
-            st.warning("No hay datos con información de Año y Cantón para colapsar.")
+            with etapa("descargas.colapsado", filas=len(cubo_filtrado)):
+                # Sale del cubo ya filtrado (no de las filas): volver a marcar la casilla
+                # con la misma selección es inmediato
+                df_colapsado = memo(clave, 'colapsado', lambda: colapsar(cubo_filtrado, nombre_amigable))
+            if not df_colapsado.empty:
+                botones_descarga(lambda: df_colapsado, 'datos_colapsados', 'datos colapsados',
+                                 clave_filtros(version_datos, filtros, 'datos_colapsados', disponibles))
+            else:
+                st.warning("No hay datos con información de Año y Cantón para colapsar.")
+
+seccion_descargas(filtros, cubo_filtrado, total_filtrado, clave_seleccion)
+
+# ---------------------------
+# Panel de perfilado
+# ---------------------------
+# Etapas de la última ejecución completa de la página. Los fragmentos que se vuelven
+# a ejecutar solos muestran su tiempo al pie; las descargas y los refrescos en
+# segundo plano corren en otros hilos y solo quedan en el log.
+if activo():
+    with st.sidebar.expander("🔍 Perfilado", expanded=True):
+        st.caption(f"Total de la página: {(time.perf_counter() - inicio_pagina) * 1000:.0f} ms")
+        resultados = cache_resultados()
+        st.caption(f"Resultados compartidos: {len(resultados)} ({resultados.bytes / 2**20:.1f} MB), "
+                   f"{resultados.aciertos} aciertos / {resultados.fallos} cálculos")
+        st.dataframe(pd.DataFrame(registros(), columns=['etapa', 'ms', 'filas', 'bytes']), hide_index=True)
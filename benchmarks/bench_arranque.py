@@ -0,0 +1,85 @@
+# Benchmark: costo de los imports al arrancar una app en un proceso nuevo.
+# Toma los imports del comienzo del script (los que corren antes de la primera
+# sentencia que no es un import, o sea antes de dibujar nada), los ejecuta en
+# un intérprete limpio con -X importtime y resume el tiempo acumulado por
+# paquete. Con --diferidos se mide también lo que cuesta cada módulo que la app
+# importa recién cuando lo usa (plotly, xlsxwriter...), con lo anterior ya cargado.
+#
+# Uso: python -m benchmarks.bench_arranque [appv2.py] [--repeticiones 5] [--top 15]
+#          [--diferidos plotly.express xlsxwriter]
+import argparse
+import ast
+import re
+import statistics
+import subprocess
+import sys
+
+LINEA_IMPORTTIME = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def imports_iniciales(ruta):
+    """Sentencias import del comienzo del script, hasta la primera que no lo es."""
+    with open(ruta, encoding="utf-8") as f:
+        fuente = f.read()
+    sentencias = []
+    for nodo in ast.parse(fuente).body:
+        if not isinstance(nodo, (ast.Import, ast.ImportFrom)):
+            break
+        sentencias.append(ast.get_source_segment(fuente, nodo))
+    return sentencias
+
+
+def medir_imports(codigo):
+    """(total en ms, {paquete de primer nivel: ms acumulados}) en un intérprete nuevo."""
+    proceso = subprocess.run([sys.executable, "-X", "importtime", "-c", codigo],
+                             capture_output=True, text=True, check=True)
+    por_paquete = {}
+    for linea in proceso.stderr.splitlines():
+        m = LINEA_IMPORTTIME.match(linea)
+        # Solo las líneas sin sangría: el acumulado de cada import de primer nivel
+        if m and len(m.group(3)) == 1:
+            paquete = m.group(4).split(".")[0]
+            por_paquete[paquete] = por_paquete.get(paquete, 0) + int(m.group(2)) / 1000
+    return sum(por_paquete.values()), por_paquete
+
+
+def medir_diferido(codigo, modulo):
+    """ms que tarda 'import modulo' en un intérprete que ya ejecutó codigo."""
+    medicion = (f"{codigo}\nimport time as _t\n_inicio = _t.perf_counter()\nimport {modulo}\n"
+                f"print((_t.perf_counter() - _inicio) * 1000)")
+    proceso = subprocess.run([sys.executable, "-c", medicion], capture_output=True, text=True, check=True)
+    return float(proceso.stdout.split()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiempo de import al arrancar un script de Streamlit")
+    parser.add_argument("script", nargs="?", default="appv2.py")
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--diferidos", nargs="*", default=["streamlit_gsheets", "geopandas", "folium", "streamlit_folium",
+                                                           "plotly.express", "xlsxwriter", "pyarrow.parquet"])
+    args = parser.parse_args()
+
+    sentencias = imports_iniciales(args.script)
+    codigo = "\n".join(sentencias)
+    corridas = [medir_imports(codigo) for _ in range(args.repeticiones)]
+    totales = [total for total, _ in corridas]
+    paquetes = {p: statistics.median(c[p] for _, c in corridas if p in c) for p in corridas[0][1]}
+
+    print(f"{args.script}: {len(sentencias)} imports iniciales, {args.repeticiones} procesos nuevos")
+    print(f"imports antes de dibujar: mediana {statistics.median(totales):8.1f} ms "
+          f"(min {min(totales):.1f}, max {max(totales):.1f})")
+    print(f"\n{'paquete':<28}{'ms':>10}")
+    for paquete, ms in sorted(paquetes.items(), key=lambda p: -p[1])[:args.top]:
+        print(f"{paquete:<28}{ms:>10.1f}")
+
+    if args.diferidos:
+        # Lo que agrega cada módulo diferido cuando por fin se usa
+        print(f"\n{'diferido':<28}{'ms extra':>10}")
+        for modulo in args.diferidos:
+            extra = [medir_diferido(codigo, modulo) for _ in range(args.repeticiones)]
+            print(f"{modulo:<28}{statistics.median(extra):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
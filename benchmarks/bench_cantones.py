@@ -0,0 +1,58 @@
+# Benchmark: conciliación de CANTON_DEF con los nombres del geojson
+# (nucleo/cantones.py). Cuenta cuántas personas entran al mapa con el merge
+# exacto y con la conciliación, y cuánto cuesta conciliar la columna completa
+# la primera vez (resolviendo cada valor distinto) y con los valores ya memorizados.
+#
+# Uso: python -m benchmarks.bench_cantones [filas] [geojson] [columna]
+import sys
+import time
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+
+from nucleo.cantones import ConciliadorCantones
+from nucleo.normalizacion import strip_accents
+
+
+def variantes(nombre):
+    """Formas en que un cantón aparece escrito en la hoja."""
+    sin_tildes = strip_accents(nombre)
+    con_error = sin_tildes[:-1] if len(sin_tildes) > 6 else sin_tildes
+    return [nombre, sin_tildes, sin_tildes.upper(), f" {nombre.lower()} ", con_error]
+
+
+def main():
+    filas = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    ruta = sys.argv[2] if len(sys.argv) > 2 else "costaricacantonesv10.geojson"
+    columna = sys.argv[3] if len(sys.argv) > 3 else "NAME_2"
+    nombres = gpd.read_file(ruta, ignore_geometry=True)[columna]
+
+    rng = np.random.default_rng(0)
+    escritos = [v for n in nombres for v in variantes(n)] + ["Sin dato", "Aguirre", "Ciudad Gótica"]
+    serie = pd.Series(rng.choice(np.array(escritos, dtype=object), filas))
+
+    inicio = time.perf_counter()
+    conciliador = ConciliadorCantones(nombres)
+    t_indice = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    conciliada = conciliador.conciliar(serie)
+    t_primera = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    conciliador.conciliar(serie)
+    t_memorizada = time.perf_counter() - inicio
+
+    exactas = serie.isin(nombres).sum()
+    en_mapa = conciliada.isin(nombres).sum()
+    print(f"{filas} filas, {serie.nunique()} valores distintos, {len(nombres)} cantones")
+    print(f"personas en el mapa: merge exacto {exactas} | conciliado {en_mapa}")
+    print(f"sin equivalente: {conciliador.no_encontrados(serie.unique())}")
+    print(f"armar índice {t_indice * 1000:.1f} ms | conciliar {t_primera * 1000:.1f} ms | "
+          f"con valores memorizados {t_memorizada * 1000:.1f} ms")
+    assert en_mapa + (serie == "Sin dato").sum() + (serie == "Ciudad Gótica").sum() == filas
+
+
+if __name__ == "__main__":
+    main()
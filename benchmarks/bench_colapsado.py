@@ -0,0 +1,59 @@
+# Benchmark: tabla de la descarga colapsada (Cantón × Curso Año). Compara el
+# pivot_table original sobre las filas filtradas con nucleo.cubo.colapsar
+# sobre el cubo filtrado, y verifica que den la misma tabla.
+#
+# Uso: python -m benchmarks.bench_colapsado [filas]
+import sys
+import time
+
+import pandas as pd
+
+from benchmarks.sinteticos import generar_hoja
+from nucleo.cubo import colapsar, construir_cubo, construir_mascara
+from nucleo.datos import normalizar_datos
+
+NOMBRES = {
+    "admision": "Admisión y lógica",
+    "admisión": "Admisión y lógica",
+    "eplve": "Economía para la vida",
+    "excel": "Excel",
+}
+
+
+def colapsar_original(df_filtrado):
+    df_temp = df_filtrado.dropna(subset=['AÑO', 'CANTON_DEF']).copy()
+    df_temp['CURSO_AÑO'] = df_temp['CURSO_NORMALIZADO'].map(NOMBRES).fillna(df_temp['CURSO_NORMALIZADO'].str.title()) + " " + df_temp['AÑO'].astype(int).astype(str)
+    df_pivot = df_temp.pivot_table(index='CANTON_DEF', columns='CURSO_AÑO', values='CERTIFICADO', aggfunc='count', fill_value=0).reset_index()
+    df_pivot['TOTAL'] = df_pivot.drop(columns='CANTON_DEF').sum(axis=1)
+    columnas_ordenadas = ['CANTON_DEF'] + sorted([c for c in df_pivot.columns if c not in ['CANTON_DEF', 'TOTAL']]) + ['TOTAL']
+    return df_pivot[columnas_ordenadas]
+
+
+def cronometrar(funcion, repeticiones=3):
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        resultado = funcion()
+    return resultado, (time.perf_counter() - inicio) / repeticiones
+
+
+def main():
+    filas = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    # Trae cursos escritos de varias formas y años nulos, como la hoja real
+    df = normalizar_datos(generar_hoja(filas))
+    cubo = construir_cubo(df)
+    filtros = dict(cursos=sorted(df["CURSO_NORMALIZADO"].unique()), anios=sorted(df["AÑO"].dropna().unique()),
+                   cantones=[], flags=None, edades=[], sexos=[])
+    df_filtrado = df[construir_mascara(df, **filtros)]
+    cubo_filtrado = cubo[construir_mascara(cubo, **filtros)]
+
+    esperado, t_original = cronometrar(lambda: colapsar_original(df_filtrado))
+    obtenido, t_cubo = cronometrar(lambda: colapsar(cubo_filtrado, NOMBRES))
+    pd.testing.assert_frame_equal(obtenido, esperado, check_dtype=False)
+
+    print(f"{filas} filas, cubo de {len(cubo)} celdas, tabla de {esperado.shape[0]}×{esperado.shape[1]}")
+    print(f"pivot_table sobre las filas:  {t_original * 1000:8.1f} ms")
+    print(f"colapsar sobre el cubo:       {t_cubo * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# Benchmark: varios procesos (como réplicas de Streamlit en un mismo nodo)
+# arrancan a la vez sin snapshot y luego refrescan a la vez un snapshot
+# vencido. Con el bloqueo de nucleo/bloqueo.py la hoja se lee una sola vez en
+# cada caso y todos los procesos terminan con la misma versión.
+#
+# Uso: python -m benchmarks.bench_compartido [procesos] [filas] [latencia_s]
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.sinteticos import generar_hoja
+from nucleo.datos import normalizar_datos
+from nucleo.snapshot import SnapshotHoja
+
+
+class ConexionContada:
+    """Como ConexionLocal, pero anota cada lectura en un archivo compartido entre procesos."""
+
+    def __init__(self, df, latencia, registro):
+        self.df = df
+        self.latencia = latencia
+        self.registro = registro
+
+    def read(self, worksheet=None, ttl=None):
+        time.sleep(self.latencia)
+        with open(self.registro, "a") as f:
+            f.write(f"{os.getpid()}\n")
+        return self.df.copy()
+
+
+def replica(ruta, conn, barrera, resultados):
+    snapshot = SnapshotHoja(leer=lambda: conn.read(worksheet="hoja", ttl=0), normalizar=normalizar_datos,
+                            ruta=ruta, max_edad=1)
+
+    barrera.wait()
+    inicio = time.perf_counter()
+    df = snapshot.obtener()
+    t_arranque = time.perf_counter() - inicio
+
+    # Se deja vencer el snapshot y todos lo refrescan a la vez, como el hilo de obtener()
+    time.sleep(1.5)
+    barrera.wait()
+    inicio = time.perf_counter()
+    refresco = snapshot.refrescar(esperar=False)
+    t_refresco = time.perf_counter() - inicio
+    barrera.wait()
+    snapshot.obtener()
+    resultados.put((os.getpid(), len(df), t_arranque, refresco, t_refresco, snapshot.version))
+
+
+def lecturas(registro):
+    if not os.path.exists(registro):
+        return 0
+    with open(registro) as f:
+        return len(f.read().split())
+
+
+def main():
+    procesos = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    filas = int(sys.argv[2]) if len(sys.argv) > 2 else 200_000
+    latencia = float(sys.argv[3]) if len(sys.argv) > 3 else 1.0
+    directorio = tempfile.mkdtemp()
+    ruta = os.path.join(directorio, "hoja.arrow")
+    registro = os.path.join(directorio, "lecturas.txt")
+    conn = ConexionContada(generar_hoja(filas), latencia, registro)
+
+    contexto = mp.get_context("fork")
+    barrera = contexto.Barrier(procesos)
+    resultados = contexto.Queue()
+    hijos = [contexto.Process(target=replica, args=(ruta, conn, barrera, resultados)) for _ in range(procesos)]
+    for hijo in hijos:
+        hijo.start()
+    filas_resultado = [resultados.get() for _ in hijos]
+    for hijo in hijos:
+        hijo.join()
+
+    print(f"{procesos} procesos, {filas} filas, latencia simulada de la hoja {latencia:.1f} s")
+    print(" pid  filas  arranque (ms)  refrescó  refresco (ms)")
+    for pid, n, t_arranque, refresco, t_refresco, _ in sorted(filas_resultado):
+        print(f"{pid:>4} {n:>6} {t_arranque * 1000:>14.1f} {str(refresco):>9} {t_refresco * 1000:>14.1f}")
+    total = lecturas(registro)
+    print(f"lecturas de la hoja: {total} (sin bloqueo serían {2 * procesos})")
+    assert total == 2
+    assert sum(r[3] for r in filas_resultado) == 1
+    assert len({r[5] for r in filas_resultado}) == 1
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# Benchmark: exportación de la hoja filtrada. Compara convertir_a_excel
+# original (to_excel en un BytesIO) con nucleo/exportar.py en Excel
+# (constant_memory), CSV y Parquet: tiempo y memoria pico de cada uno, y lo
+# que cuesta una descarga repetida con los mismos filtros. Verifica también
+# que el Excel generado tenga los mismos datos que el de to_excel.
+#
+# Uso: python -m benchmarks.bench_exportar [filas]
+import io
+import multiprocessing as mp
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks.sinteticos import generar_hoja
+from nucleo.datos import normalizar_datos
+from nucleo.exportar import FORMATOS, exportar
+from nucleo.memo import clave_filtros
+
+
+def convertir_a_excel(df_to_save):
+    output = io.BytesIO()
+    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
+        df_to_save.to_excel(writer, index=False, sheet_name='DatosFiltrados')
+    return output.getvalue()
+
+
+def memoria_kb(campo):
+    with open("/proc/self/status") as f:
+        for linea in f:
+            if linea.startswith(campo):
+                return int(linea.split()[1])
+    return 0
+
+
+def medir_en_proceso(funcion, cola):
+    # Proceso aparte (fork) para medir el pico de memoria solo de esta exportación
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")  # reinicia VmHWM
+    except OSError:
+        pass
+    base = memoria_kb("VmRSS:")
+    inicio = time.perf_counter()
+    funcion()
+    cola.put((time.perf_counter() - inicio, (memoria_kb("VmHWM:") - base) / 1024))
+
+
+def medir(funcion):
+    contexto = mp.get_context("fork")
+    cola = contexto.Queue()
+    proceso = contexto.Process(target=medir_en_proceso, args=(funcion, cola))
+    proceso.start()
+    resultado = cola.get()
+    proceso.join()
+    return resultado
+
+
+def main():
+    filas = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    df = normalizar_datos(generar_hoja(filas))
+    directorio = tempfile.mkdtemp()
+    filtros = dict(cursos=["excel"], anios=[2022, 2021], cantones=[], flags=None, edades=[], sexos=[])
+
+    def original():
+        with open(os.path.join(directorio, "original.xlsx"), "wb") as f:
+            f.write(convertir_a_excel(df))
+
+    resultados = {"to_excel en BytesIO (original)": medir(original)}
+    for formato in FORMATOS:
+        clave = clave_filtros(1, filtros, formato)
+        resultados[f"exportar {formato}"] = medir(lambda: exportar(lambda: df, formato, directorio, clave).close())
+
+    print(f"{filas} filas, {len(df.columns)} columnas")
+    print(f"{'método':<34} {'tiempo (s)':>10} {'memoria pico (MB)':>18}")
+    for nombre, (segundos, mb) in resultados.items():
+        print(f"{nombre:<34} {segundos:>10.2f} {mb:>18.1f}")
+
+    # Descarga repetida: la clave sale de los filtros y el archivo ya está en disco
+    inicio = time.perf_counter()
+    clave = clave_filtros(1, dict(filtros, anios=[2021, 2022]), "xlsx")
+    with exportar(lambda: df, "xlsx", directorio, clave) as f:
+        ruta = f.name
+    t_repetida = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    pd.util.hash_pandas_object(df)  # cota inferior de lo que st.cache_data hashea en cada rerun
+    t_hash = time.perf_counter() - inicio
+    print(f"descarga repetida (misma selección): {t_repetida * 1000:.1f} ms; hashear df: {t_hash * 1000:.1f} ms")
+
+    muestra = 20_000
+    nuevo = pd.read_excel(ruta, nrows=muestra)
+    viejo = pd.read_excel(os.path.join(directorio, "original.xlsx"), nrows=muestra)
+    pd.testing.assert_frame_equal(nuevo, viejo)
+    shutil.rmtree(directorio)
+
+
+if __name__ == "__main__":
+    main()
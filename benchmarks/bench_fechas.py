@@ -0,0 +1,62 @@
+# Benchmark: conversión de fechas a texto en una hoja ancha, función por celda
+# (el antiguo applymap(convert_dates)) vs. nucleo.normalizacion.convertir_fechas.
+#
+# Uso: python -m benchmarks.bench_fechas [filas] [columnas]
+import sys
+import time
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+from nucleo.normalizacion import convertir_fechas
+
+
+def convert_dates(x):
+    if isinstance(x, (pd.Timestamp, datetime, date)):
+        return x.strftime("%Y-%m-%d")
+    return x
+
+
+def generar(filas, columnas, semilla=0):
+    # Proporciones aproximadas de la hoja real: mayoría texto/números,
+    # algunas columnas de fecha y alguna columna mixta con fechas sueltas.
+    rng = np.random.default_rng(semilla)
+    fechas = pd.date_range("2018-01-01", periods=2000, freq="D")
+    datos = {}
+    for i in range(columnas):
+        tipo = i % 10
+        if tipo < 4:
+            datos[f"texto_{i}"] = rng.choice(np.array(["a", "bb", "ccc", "Sin dato"], dtype=object), filas)
+        elif tipo < 8:
+            datos[f"numero_{i}"] = rng.integers(0, 100, filas).astype(float)
+        elif tipo == 8:
+            datos[f"fecha_{i}"] = rng.choice(fechas, filas)
+        else:
+            mixta = rng.choice(np.array(["x", 1.5, None], dtype=object), filas)
+            mixta[::50] = date(2024, 3, 1)
+            datos[f"mixta_{i}"] = mixta
+    return pd.DataFrame(datos)
+
+
+def main():
+    filas = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    columnas = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    df = generar(filas, columnas)
+
+    inicio = time.perf_counter()
+    esperado = df.map(convert_dates)  # applymap() se llama map() desde pandas 2.1
+    t_celdas = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    obtenido = convertir_fechas(df)
+    t_columnas = time.perf_counter() - inicio
+
+    pd.testing.assert_frame_equal(esperado.astype(object), obtenido.astype(object))
+    print(f"Hoja sintética: {filas} filas x {columnas} columnas")
+    print(f"por celda (applymap):     {t_celdas:8.2f} s")
+    print(f"por columna (convertir):  {t_columnas:8.2f} s")
+
+
+if __name__ == "__main__":
+    main()
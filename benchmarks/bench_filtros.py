@@ -0,0 +1,59 @@
+# Benchmark: memoria por fila y tiempo de filtrado de la hoja por filas,
+# isin() sobre strings (nucleo.cubo.construir_mascara) vs. bitmaps
+# (nucleo.indice.IndiceFiltros).
+#
+# Uso: python -m benchmarks.bench_filtros
+import time
+
+import numpy as np
+
+from benchmarks.sinteticos import cantones_geojson, generar_hoja
+from nucleo.cantones import ConciliadorCantones
+from nucleo.cubo import construir_mascara
+from nucleo.datos import normalizar_datos
+from nucleo.indice import IndiceFiltros
+
+TAMANOS = [10_000, 100_000, 1_000_000]
+REPETICIONES = 5
+
+def generar(n, cantones, semilla=0):
+    # La hoja sintética normalizada como la sirve el snapshot de appv2.py
+    return normalizar_datos(generar_hoja(n, cantones, semilla), conciliador=ConciliadorCantones(cantones))
+
+
+def seleccion_tipica(df):
+    """Una selección parcial típica: algunos cursos y años, muchos cantones, un flag."""
+    cursos = sorted(df["CURSO_NORMALIZADO"].unique())
+    anios = sorted(df["AÑO"].dropna().unique())
+    cantones = sorted(df["CANTON_DEF"].unique())
+    sexos = sorted(df["SEXO_NORMALIZADO"].unique())
+    return dict(cursos=cursos[:3], anios=anios[2:], cantones=cantones[:60], flags=["CERTIFICADO"],
+                edades=sorted(df["EDAD_CLASIFICADA"].unique()), sexos=sexos[:2])
+
+
+def cronometrar(funcion):
+    inicio = time.perf_counter()
+    for _ in range(REPETICIONES):
+        resultado = funcion()
+    return resultado, (time.perf_counter() - inicio) / REPETICIONES
+
+
+def main():
+    cantones = cantones_geojson()
+    print(f"{'filas':>10}{'hoja B/fila':>13}{'índice B/fila':>15}{'isin (ms)':>11}{'bitmaps (ms)':>14}{'construcción (ms)':>19}")
+    for n in TAMANOS:
+        df = generar(n, cantones)
+        filtros = seleccion_tipica(df)
+        memoria_df = df.memory_usage(deep=True).sum() / n
+        inicio = time.perf_counter()
+        indice = IndiceFiltros(df)
+        t_construccion = time.perf_counter() - inicio
+        esperado, t_isin = cronometrar(lambda: construir_mascara(df, **filtros).to_numpy())
+        obtenido, t_bitmaps = cronometrar(lambda: indice.mascara(**filtros))
+        assert np.array_equal(esperado, obtenido)
+        print(f"{n:>10}{memoria_df:>13.1f}{indice.nbytes() / n:>15.1f}{t_isin * 1000:>11.1f}"
+              f"{t_bitmaps * 1000:>14.1f}{t_construccion * 1000:>19.1f}")
+
+
+if __name__ == "__main__":
+    main()
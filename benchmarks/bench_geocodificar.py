@@ -0,0 +1,52 @@
+# Benchmark: asignación de cantón por coordenadas (nucleo/geocodificar.py)
+# para filas 'Sin dato'. Compara con geopandas.sjoin punto a polígono y
+# verifica que asignen el mismo cantón.
+#
+# Uso: python -m benchmarks.bench_geocodificar [puntos] [geojson] [columna]
+import sys
+import time
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+
+from nucleo.geocodificar import UbicadorCantones, asignar_cantones
+
+
+def main():
+    puntos = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    ruta = sys.argv[2] if len(sys.argv) > 2 else "costaricacantonesv10.geojson"
+    columna = sys.argv[3] if len(sys.argv) > 3 else "NAME_2"
+    gdf = gpd.read_file(ruta).to_crs("EPSG:4326")
+
+    # Puntos dentro del país (y algunos en el mar), más filas sin coordenadas
+    rng = np.random.default_rng(0)
+    oeste, sur, este, norte = gdf.total_bounds
+    lon = rng.uniform(oeste, este, puntos)
+    lat = rng.uniform(sur, norte, puntos)
+    lon[::10] = np.nan
+    df = pd.DataFrame({"CANTON_DEF": "Sin dato", "LONGITUD": lon, "LATITUD": lat})
+
+    inicio = time.perf_counter()
+    ubicador = UbicadorCantones(gdf, columna)
+    t_arbol = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    asignado = asignar_cantones(df.copy(), ubicador, col_lat="LATITUD", col_lon="LONGITUD")
+    t_asignar = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    puntos_gdf = gpd.GeoDataFrame(geometry=gpd.points_from_xy(lon, lat), crs="EPSG:4326")
+    unido = gpd.sjoin(puntos_gdf, gdf[[columna, "geometry"]], how="left", predicate="intersects")
+    esperado = unido[~unido.index.duplicated()][columna].fillna("Sin dato")
+    t_sjoin = time.perf_counter() - inicio
+
+    assert (asignado["CANTON_DEF"].to_numpy() == esperado.to_numpy()).all()
+    print(f"{puntos} filas sin cantón, {len(gdf)} polígonos, {(asignado['CANTON_DEF'] != 'Sin dato').sum()} asignadas")
+    print(f"armar STRtree:          {t_arbol * 1000:8.1f} ms (una vez)")
+    print(f"asignar_cantones:       {t_asignar * 1000:8.1f} ms")
+    print(f"geopandas.sjoin:        {t_sjoin * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+# Benchmark: tamaño del payload y tiempo de serialización por rerun del mapa,
+# GeoJSON original vs. caché simplificada (nucleo/geometria.py).
+#
+# Uso: python -m benchmarks.bench_geometria [archivo.geojson] [columna_nombre]
+import json
+import sys
+import time
+
+import geopandas as gpd
+
+from nucleo.geometria import NIVELES, construir_cache, ruta_cache
+
+REPETICIONES = 10
+
+
+def serializar(gdf):
+    # Lo mismo que ocurre en cada rerun: __geo_interface__ + json.dumps dentro de folium
+    return json.dumps(gdf.__geo_interface__)
+
+
+def medir(gdf):
+    inicio = time.perf_counter()
+    for _ in range(REPETICIONES):
+        payload = serializar(gdf)
+    return len(payload.encode("utf-8")), (time.perf_counter() - inicio) / REPETICIONES
+
+
+def main():
+    # limitecantonal_5k.geojson no trae geometrías (solo la columna SHAPE truncada,
+    # la preparación lo rechaza), así que por defecto se mide con el otro mapa.
+    ruta = sys.argv[1] if len(sys.argv) > 1 else "costaricacantonesv10.geojson"
+    columna = sys.argv[2] if len(sys.argv) > 2 else "NAME_2"
+
+    inicio = time.perf_counter()
+    original = gpd.read_file(ruta)
+    t_lectura = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    construir_cache(ruta)
+    t_construccion = time.perf_counter() - inicio
+
+    print(f"Fuente: {ruta} ({len(original)} features)")
+    print(f"Construcción de la caché (todos los niveles): {t_construccion:.2f} s")
+    print(f"{'variante':<12}{'carga (ms)':>12}{'payload (KB)':>15}{'serialización (ms)':>21}")
+
+    bytes_, t_ser = medir(original[[columna, "geometry"]])
+    print(f"{'original':<12}{t_lectura * 1000:>12.1f}{bytes_ / 1024:>15.1f}{t_ser * 1000:>21.1f}")
+    for nivel in NIVELES:
+        inicio = time.perf_counter()
+        cacheado = gpd.read_parquet(ruta_cache(ruta, nivel))
+        t_carga = time.perf_counter() - inicio
+        bytes_, t_ser = medir(cacheado[["CANTÓN", "geometry"]])  # nombre fijo de la caché
+        print(f"{nivel:<12}{t_carga * 1000:>12.1f}{bytes_ / 1024:>15.1f}{t_ser * 1000:>21.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# Benchmark: leer y normalizar varias pestañas de la hoja (p. ej. una por año)
+# una tras otra vs. a la vez con cargar_hojas() de nucleo/datos.py. Cada
+# pestaña tiene su propia latencia simulada y algunas traen las columnas con
+# otros nombres ('Latitud', 'lon'...) o con otros tipos; se verifica que el
+# resultado sea el mismo que leyéndolas en serie.
+#
+# Uso: python -m benchmarks.bench_hojas [pestañas] [filas_por_pestaña] [latencia_s]
+import sys
+import time
+
+import pandas as pd
+
+from benchmarks.sinteticos import cantones_geojson, generar_hoja
+from nucleo.cantones import ConciliadorCantones
+from nucleo.datos import alinear_columnas, cargar_hojas, normalizar_datos, unir_hojas
+
+# Nombres de columna de las pestañas viejas (se alternan entre pestañas)
+RENOMBRES = [{}, {"LATITUD": "Latitud", "LONGITUD": "Longitud"}, {"LATITUD": "lat", "LONGITUD": "lon"}]
+
+
+class ConexionPestanas:
+    """Imita conn.read(worksheet=...) con una latencia distinta por pestaña."""
+
+    def __init__(self, pestanas, latencias):
+        self.pestanas = pestanas
+        self.latencias = latencias
+
+    def read(self, worksheet=None, ttl=None):
+        time.sleep(self.latencias[worksheet])
+        return self.pestanas[worksheet].copy()
+
+
+def generar_pestanas(cantidad, filas, cantones):
+    pestanas = {}
+    for i in range(cantidad):
+        hoja = generar_hoja(filas, cantones, semilla=i).rename(columns=RENOMBRES[i % len(RENOMBRES)])
+        if i % 2:
+            # En algunas pestañas el año quedó como texto
+            hoja["AÑO"] = hoja["AÑO"].astype("Int64").astype(str)
+        pestanas[f"mapa_{2019 + i}"] = hoja
+    return pestanas
+
+
+def main():
+    cantidad = int(sys.argv[1]) if len(sys.argv) > 1 else 6
+    filas = int(sys.argv[2]) if len(sys.argv) > 2 else 20_000
+    latencia = float(sys.argv[3]) if len(sys.argv) > 3 else 1.0
+
+    cantones = cantones_geojson()
+    conciliador = ConciliadorCantones(cantones)
+    pestanas = generar_pestanas(cantidad, filas, cantones)
+    # La más vieja es la más lenta: el total en paralelo debería acercarse a esta
+    latencias = {hoja: latencia * (1 + i / cantidad) for i, hoja in enumerate(reversed(list(pestanas)))}
+    conn = ConexionPestanas(pestanas, latencias)
+
+    def leer(hoja):
+        return conn.read(worksheet=hoja, ttl=0)
+
+    def normalizar(df):
+        return normalizar_datos(df, conciliador=conciliador)
+
+    inicio = time.perf_counter()
+    en_serie = unir_hojas([normalizar(alinear_columnas(leer(hoja))) for hoja in pestanas])
+    t_serie = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    en_paralelo = cargar_hojas(leer, list(pestanas), normalizar=normalizar)
+    t_paralelo = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    crudo = cargar_hojas(leer, list(pestanas))
+    t_crudo = time.perf_counter() - inicio
+
+    pd.testing.assert_frame_equal(en_serie, en_paralelo)
+    assert len(en_paralelo) == cantidad * filas and "Latitud" not in crudo.columns and "lat" not in crudo.columns
+
+    print(f"{cantidad} pestañas x {filas} filas, latencia simulada {min(latencias.values()):.1f}-"
+          f"{max(latencias.values()):.1f} s (suma {sum(latencias.values()):.1f} s)")
+    print(f"en serie (leer + normalizar):   {t_serie:8.2f} s")
+    print(f"cargar_hojas con normalizar:    {t_paralelo:8.2f} s")
+    print(f"cargar_hojas solo lectura:      {t_crudo:8.2f} s")
+    print("AÑO:", en_paralelo["AÑO"].dtype, "| columnas unificadas:",
+          [c for c in crudo.columns if c in ("LATITUD", "LONGITUD")])
+
+
+if __name__ == "__main__":
+    main()
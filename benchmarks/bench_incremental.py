@@ -0,0 +1,76 @@
+# Benchmark: refresco completo vs. incremental del snapshot (nucleo/snapshot.py)
+# según el tamaño del cambio en la hoja. Verifica que el resultado incremental
+# (hoja normalizada y cubo de conteos) sea igual al de un refresco completo.
+#
+# Uso: python -m benchmarks.bench_incremental [filas]
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_snapshot import ConexionLocal
+from benchmarks.sinteticos import cantones_geojson, generar_hoja
+from nucleo.cantones import ConciliadorCantones
+from nucleo.cubo import DIMENSIONES, actualizar_cubo, construir_cubo
+from nucleo.datos import normalizar_datos
+from nucleo.snapshot import SnapshotHoja
+
+CAMBIOS = [0, 100, 10_000]  # filas agregadas al final (y la décima parte modificadas)
+
+
+def cubo_ordenado(cubo):
+    return (cubo.astype({"CURSO_NORMALIZADO": object, "CANTON_DEF": object,
+                         "EDAD_CLASIFICADA": object, "SEXO_NORMALIZADO": object})
+            .sort_values(DIMENSIONES).reset_index(drop=True))
+
+
+def main():
+    filas = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    cantones = cantones_geojson()
+    conciliador = ConciliadorCantones(cantones)
+
+    def normalizar(df):
+        # La normalización de appv2.py, que trata cada fila por separado
+        return normalizar_datos(df, conciliador=conciliador)
+
+    # Las filas nuevas salen de la misma tabla generada, así los dtypes de la hoja no cambian
+    completa = generar_hoja(filas + max(CAMBIOS), cantones)
+    base = completa.iloc[:filas].copy()
+    print(f"{'filas nuevas':>13}{'modificadas':>13}{'completo (ms)':>15}{'incremental (ms)':>18}")
+    for cambio in CAMBIOS:
+        directorio = tempfile.mkdtemp()
+        conn = ConexionLocal(base, latencia=0)
+        snapshots = {}
+        for modo in ("completo", "incremental"):
+            snapshots[modo] = SnapshotHoja(leer=lambda: conn.read(), normalizar=normalizar,
+                                           ruta=os.path.join(directorio, f"{modo}.arrow"), max_edad=600,
+                                           agregados={"cubo": (construir_cubo, actualizar_cubo)})
+            snapshots[modo].obtener("cubo")
+
+        # La hoja crece al final y algunas filas viejas se corrigen
+        nueva = completa.iloc[:filas + cambio].copy()
+        modificadas = np.arange(0, filas, max(1, filas // max(1, cambio // 10))) if cambio else []
+        nueva.loc[modificadas, "SEXO"] = "Femenino"
+        conn.df = nueva
+
+        tiempos = {}
+        for modo, snapshot in snapshots.items():
+            if modo == "completo":
+                snapshot._hashes = None  # fuerza a normalizar toda la hoja
+            inicio = time.perf_counter()
+            snapshot.refrescar()
+            df, cubo = snapshot.obtener("cubo")
+            tiempos[modo] = time.perf_counter() - inicio
+
+        df_completo, cubo_completo = snapshots["completo"].obtener("cubo")
+        df_incremental, cubo_incremental = snapshots["incremental"].obtener("cubo")
+        pd.testing.assert_frame_equal(df_completo, df_incremental)
+        pd.testing.assert_frame_equal(cubo_ordenado(cubo_completo), cubo_ordenado(cubo_incremental))
+        print(f"{cambio:>13}{len(modificadas):>13}{tiempos['completo'] * 1000:>15.1f}{tiempos['incremental'] * 1000:>18.1f}")
+
+
+if __name__ == "__main__":
+    main()
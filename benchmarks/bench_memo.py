@@ -0,0 +1,85 @@
+# Benchmark: sesiones que abren el tablero con la selección por defecto (todo
+# elegido) y vuelven a filtrar el cubo y armar resúmenes, con y sin la caché
+# compartida de nucleo/memo.py. Verifica que la clave no dependa del orden de
+# los valores, que "Seleccionar todos" y elegir cada valor a mano den la misma
+# clave, que los resultados de la caché sean los mismos que recalculados y que
+# la caché no pase de su tope en bytes.
+#
+# Uso: python -m benchmarks.bench_memo [filas] [sesiones]
+import random
+import sys
+import time
+
+import pandas as pd
+
+from benchmarks.sinteticos import cantones_geojson, generar_hoja
+from nucleo.cantones import ConciliadorCantones
+from nucleo.cubo import construir_cubo, construir_mascara, resumen_certificacion
+from nucleo.datos import normalizar_datos, preparar_datos_resumen
+from nucleo.memo import CacheLRU, clave_filtros
+
+
+def resultados(cubo, filtros):
+    cubo_filtrado = cubo[construir_mascara(cubo, **filtros)]
+    df_cantonal, df_detalle = preparar_datos_resumen(cubo_filtrado)
+    return (cubo_filtrado, df_cantonal, df_detalle,
+            resumen_certificacion(cubo_filtrado, 'CURSO_NORMALIZADO'),
+            resumen_certificacion(cubo_filtrado, 'CANTON_DEF'))
+
+
+def main():
+    filas = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    sesiones = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    cantones = cantones_geojson()
+    df = normalizar_datos(generar_hoja(filas, cantones), conciliador=ConciliadorCantones(cantones))
+    cubo = construir_cubo(df)
+    disponibles = dict(cursos=sorted(df['CURSO_NORMALIZADO'].dropna().unique()),
+                       anios=sorted(int(a) for a in df['AÑO'].dropna().unique()),
+                       cantones=sorted(set(cantones)),
+                       edades=sorted(df['EDAD_CLASIFICADA'].dropna().unique()),
+                       sexos=sorted(df['SEXO_NORMALIZADO'].dropna().unique()))
+    por_defecto = dict(disponibles, flags=None)
+
+    # Mismos valores en otro orden, y todos elegidos a mano: misma clave
+    rng = random.Random(0)
+    a_mano = {nombre: rng.sample(list(valores), len(valores)) for nombre, valores in disponibles.items()}
+    clave = clave_filtros("v1", por_defecto, "seleccion", disponibles)
+    assert clave == clave_filtros("v1", dict(a_mano, flags=None), "seleccion", disponibles)
+    pocos = dict(por_defecto, cantones=disponibles['cantones'][:5])
+    assert clave_filtros("v1", pocos, "seleccion", disponibles) == \
+        clave_filtros("v1", dict(pocos, cantones=pocos['cantones'][::-1]), "seleccion", disponibles)
+    assert clave_filtros("v1", pocos, "seleccion", disponibles) != clave
+    assert clave_filtros("v2", por_defecto, "seleccion", disponibles) != clave
+    assert clave_filtros("v1", dict(por_defecto, flags=['CERTIFICADO']), "seleccion", disponibles) != clave
+
+    inicio = time.perf_counter()
+    for _ in range(sesiones):
+        sin_cache = resultados(cubo, por_defecto)
+    t_sin = time.perf_counter() - inicio
+
+    cache = CacheLRU(64 * 2**20)
+    inicio = time.perf_counter()
+    for _ in range(sesiones):
+        con_cache = cache.obtener((clave, 'resultados'), lambda: resultados(cubo, por_defecto))
+    t_con = time.perf_counter() - inicio
+    for esperado, obtenido in zip(sin_cache, con_cache):
+        pd.testing.assert_frame_equal(esperado, obtenido)
+
+    # Muchas selecciones distintas en una caché chica: se descartan las más viejas
+    chica = CacheLRU(cache.bytes // 4)
+    for canton in disponibles['cantones']:
+        filtros = dict(por_defecto, cantones=[canton])
+        chica.obtener(clave_filtros("v1", filtros, "seleccion", disponibles), lambda: resultados(cubo, filtros))
+    assert 0 < chica.bytes <= chica.max_bytes and len(chica) < len(disponibles['cantones'])
+
+    print(f"{filas} filas, {len(cubo)} filas de cubo, {sesiones} sesiones con la selección por defecto")
+    print(f"sin caché:  {t_sin / sesiones * 1000:8.1f} ms por sesión")
+    print(f"con caché:  {t_con / sesiones * 1000:8.1f} ms por sesión "
+          f"({cache.aciertos} aciertos, {cache.fallos} cálculo, {cache.bytes / 2**20:.1f} MB)")
+    print(f"caché de {chica.max_bytes / 2**20:.1f} MB con {len(disponibles['cantones'])} selecciones: "
+          f"quedan {len(chica)} ({chica.bytes / 2**20:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+# Benchmark: clasificación de EDAD y normalización de SEXO, apply() fila por
+# fila vs. las versiones vectorizadas de nucleo/normalizacion.py. La
+# equivalencia en los casos de borde se verifica en tests/test_normalizacion.py.
+#
+# Uso: python -m benchmarks.bench_normalizacion
+import time
+
+import numpy as np
+import pandas as pd
+
+from nucleo.normalizacion import (MAPA_EDADES, MAPA_SEXO, clasificar_edad, clasificar_edades,
+                                  normalizar_sexo, normalizar_sexos)
+
+TAMANOS = [10_000, 100_000, 1_000_000]
+
+# Mezcla parecida a la hoja real: edades numéricas y en texto, sexos escritos de varias formas
+EDADES = list(range(10, 110)) + [None, float("nan"), "", "Sin dato"] + list(MAPA_EDADES)
+SEXOS = list(MAPA_SEXO) + [v.upper() for v in MAPA_SEXO] + [None, "", "otro"]
+
+
+def generar(n, semilla=0):
+    rng = np.random.default_rng(semilla)
+    edades = np.array(EDADES, dtype=object)
+    sexos = np.array(SEXOS, dtype=object)
+    return pd.DataFrame({"EDAD": rng.choice(edades, n), "SEXO": rng.choice(sexos, n),
+                         # Hoja con EDAD limpia: pandas la lee como float64
+                         "EDAD_NUMERICA": rng.choice(np.r_[np.arange(10, 110), np.nan], n)})
+
+
+def cronometrar(funcion):
+    inicio = time.perf_counter()
+    resultado = funcion()
+    return resultado, time.perf_counter() - inicio
+
+
+def main():
+    print(f"{'filas':>10}{'edad apply (ms)':>17}{'edad vect. (ms)':>17}{'sexo apply (ms)':>17}{'sexo vect. (ms)':>17}"
+          f"{'edad float apply':>18}{'edad float vect.':>18}")
+    for n in TAMANOS:
+        df = generar(n)
+        edad_a, t_edad_a = cronometrar(lambda: df["EDAD"].apply(clasificar_edad))
+        edad_v, t_edad_v = cronometrar(lambda: clasificar_edades(df["EDAD"]))
+        sexo_a, t_sexo_a = cronometrar(lambda: df["SEXO"].apply(normalizar_sexo))
+        sexo_v, t_sexo_v = cronometrar(lambda: normalizar_sexos(df["SEXO"]))
+        num_a, t_num_a = cronometrar(lambda: df["EDAD_NUMERICA"].apply(clasificar_edad))
+        num_v, t_num_v = cronometrar(lambda: clasificar_edades(df["EDAD_NUMERICA"]))
+        assert edad_a.tolist() == edad_v.tolist() and sexo_a.tolist() == sexo_v.tolist()
+        assert num_a.tolist() == num_v.tolist()
+        print(f"{n:>10}{t_edad_a * 1000:>17.1f}{t_edad_v * 1000:>17.1f}{t_sexo_a * 1000:>17.1f}{t_sexo_v * 1000:>17.1f}"
+              f"{t_num_a * 1000:>18.1f}{t_num_v * 1000:>18.1f}")
+
+
+if __name__ == "__main__":
+    main()
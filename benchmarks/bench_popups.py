@@ -0,0 +1,88 @@
+# Benchmark: popups del mapa de estadisticainteractiva.py. Compara el bucle
+# original (filtrar df_detalle por cantón + una capa GeoJson por cantón) con
+# detalles_por_canton() y una sola capa, y verifica que el detalle de cada
+# cantón sea el mismo.
+#
+# Uso: python -m benchmarks.bench_popups [filas] [geojson]
+import sys
+import time
+
+import folium
+import geopandas as gpd
+
+from benchmarks.sinteticos import generar_hoja
+from nucleo.cantones import ConciliadorCantones
+from nucleo.datos import normalizar_datos
+from nucleo.detalle import SIN_DETALLE, detalles_por_canton, popup_canton
+
+NOMBRES = {"eplve": "Economía para la vida", "excel": "Excel", "redaccion": "Redacción Consciente"}
+
+
+def detalles_original(df_detalle, cantones):
+    resultado = {}
+    for canton in cantones:
+        detalles = df_detalle[df_detalle['CANTON_DEF'] == canton]
+        if detalles.empty:
+            detalle_html = SIN_DETALLE
+        else:
+            detalle_html = "<ul>"
+            for _, d in detalles.iterrows():
+                curso = NOMBRES.get(d['CURSO_NORMALIZADO'], d['CURSO_NORMALIZADO'].title())
+                detalle_html += f"<li>{curso} ({int(d['AÑO'])}): {d['conteo']} personas</li>"
+            detalle_html += "</ul>"
+        resultado[canton] = detalle_html
+    return resultado
+
+
+def mapa_original(gdf, detalles):
+    m = folium.Map(location=[9.7489, -83.7534], zoom_start=8)
+    for _, row in gdf.iterrows():
+        folium.GeoJson(row['geometry'], style_function=lambda feature: {'fillColor': 'red'},
+                       tooltip=folium.Tooltip(row['NAME_2']),
+                       popup=folium.Popup(popup_canton(row['NAME_2'], 0, detalles[row['NAME_2']]), max_width=300)).add_to(m)
+    return m.get_root().render()
+
+
+def mapa_nuevo(gdf, detalles):
+    m = folium.Map(location=[9.7489, -83.7534], zoom_start=8)
+    capa = gdf[['NAME_2', 'geometry']].copy()
+    capa['color'] = 'red'
+    capa['popup'] = [popup_canton(c, 0, detalles.get(c, SIN_DETALLE)) for c in capa['NAME_2']]
+    folium.GeoJson(capa, style_function=lambda feature: {'fillColor': feature['properties']['color']},
+                   tooltip=folium.GeoJsonTooltip(fields=['NAME_2'], labels=False),
+                   popup=folium.GeoJsonPopup(fields=['popup'], labels=False, localize=False, max_width=300)).add_to(m)
+    return m.get_root().render()
+
+
+def medir(funcion, *args, repeticiones=3):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion(*args)
+        tiempos.append(time.perf_counter() - inicio)
+    return resultado, min(tiempos)
+
+
+def main():
+    filas = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    ruta = sys.argv[2] if len(sys.argv) > 2 else "costaricacantonesv10.geojson"
+    gdf = gpd.read_file(ruta)
+    cantones = list(gdf['NAME_2'])
+    df = normalizar_datos(generar_hoja(filas, cantones), conciliador=ConciliadorCantones(cantones))
+    df_detalle = df.groupby(['CANTON_DEF', 'CURSO_NORMALIZADO', 'AÑO']).size().reset_index(name='conteo')
+
+    original, t_original = medir(detalles_original, df_detalle, cantones)
+    nuevo, t_nuevo = medir(detalles_por_canton, df_detalle, NOMBRES)
+    assert original == {c: nuevo.get(c, SIN_DETALLE) for c in cantones}
+
+    html_original, t_mapa_original = medir(mapa_original, gdf, original)
+    html_nuevo, t_mapa_nuevo = medir(mapa_nuevo, gdf, nuevo)
+
+    print(f"{filas} filas, {len(cantones)} cantones, {len(df_detalle)} filas de detalle")
+    print(f"HTML de detalles: bucle por cantón {t_original * 1000:8.1f} ms | agrupado {t_nuevo * 1000:8.1f} ms")
+    print(f"mapa completo:    una capa por cantón {t_mapa_original * 1000:8.1f} ms ({len(html_original) / 1e6:.1f} MB)"
+          f" | una capa {t_mapa_nuevo * 1000:8.1f} ms ({len(html_nuevo) / 1e6:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
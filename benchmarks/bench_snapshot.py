@@ -0,0 +1,110 @@
+# Benchmark: arranque en frío leyendo la hoja (conexión simulada con latencia)
+# vs. leyendo el snapshot Arrow local de nucleo/snapshot.py. También verifica
+# que un snapshot vencido se siga sirviendo mientras se refresca en segundo plano,
+# también cuando la hoja falla (reintentos con espera y pausa tras el fallo).
+#
+# Uso: python -m benchmarks.bench_snapshot [filas] [latencia_s]
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.sinteticos import generar_hoja
+from nucleo.datos import normalizar_datos
+from nucleo.snapshot import SnapshotHoja
+
+
+class ConexionLocal:
+    """Imita conn.read() de GSheetsConnection: devuelve una copia tras una demora."""
+
+    def __init__(self, df, latencia):
+        self.df = df
+        self.latencia = latencia
+        self.lecturas = 0
+
+    def read(self, worksheet=None, ttl=None):
+        time.sleep(self.latencia)
+        self.lecturas += 1
+        return self.df.copy()
+
+
+class ConexionInestable(ConexionLocal):
+    """Como ConexionLocal, pero las primeras 'fallas' lecturas lanzan un error."""
+
+    def __init__(self, df, latencia, fallas):
+        super().__init__(df, latencia)
+        self.fallas = fallas
+        self.intentos = 0
+
+    def read(self, worksheet=None, ttl=None):
+        self.intentos += 1
+        if self.intentos <= self.fallas:
+            time.sleep(self.latencia)
+            raise ConnectionError(f"falla simulada {self.intentos} de {self.fallas}")
+        return super().read(worksheet, ttl)
+
+
+def esperar_refresco(snapshot):
+    while snapshot._refrescando:
+        time.sleep(0.01)
+
+
+def main():
+    filas = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    latencia = float(sys.argv[2]) if len(sys.argv) > 2 else 2.0
+    conn = ConexionLocal(generar_hoja(filas), latencia)
+    ruta = os.path.join(tempfile.mkdtemp(), "hoja.arrow")
+
+    def nuevo_snapshot(max_edad):
+        return SnapshotHoja(leer=lambda: conn.read(worksheet="hoja", ttl=0), normalizar=normalizar_datos,
+                            ruta=ruta, max_edad=max_edad)
+
+    inicio = time.perf_counter()
+    nuevo_snapshot(600).obtener()  # sin snapshot: lectura + normalización + escritura
+    t_frio = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    df = nuevo_snapshot(600).obtener()  # otro proceso que arranca con el snapshot ya en disco
+    t_snapshot = time.perf_counter() - inicio
+
+    vencido = nuevo_snapshot(0)
+    inicio = time.perf_counter()
+    vencido.obtener()
+    t_vencido = time.perf_counter() - inicio
+    esperar_refresco(vencido)
+
+    # Hoja que falla dos veces: el refresco en segundo plano reintenta y termina bien
+    inestable = ConexionInestable(conn.df, latencia / 10, fallas=2)
+    reintentado = SnapshotHoja(leer=lambda: inestable.read(worksheet="hoja", ttl=0), normalizar=normalizar_datos,
+                               ruta=ruta, max_edad=0, espera=0.01)
+    inicio = time.perf_counter()
+    reintentado.obtener()
+    t_inestable = time.perf_counter() - inicio
+    version, mtime = reintentado.version, reintentado._mtime()
+    esperar_refresco(reintentado)
+    # La hoja no cambió: se renueva la fecha del snapshot pero no su versión
+    assert inestable.intentos == 3 and reintentado._mtime() != mtime and reintentado.version == version
+
+    # Hoja caída: se agotan los reintentos, se sigue sirviendo el snapshot y
+    # durante la pausa los reruns no lanzan otro refresco
+    caida = ConexionInestable(conn.df, 0, fallas=10 ** 6)
+    sin_hoja = SnapshotHoja(leer=lambda: caida.read(worksheet="hoja", ttl=0), normalizar=normalizar_datos,
+                            ruta=ruta, max_edad=0, reintentos=2, espera=0.05, espera_maxima=5)
+    sin_hoja.obtener()
+    esperar_refresco(sin_hoja)
+    for _ in range(20):
+        assert len(sin_hoja.obtener()) == filas
+    esperar_refresco(sin_hoja)
+    assert caida.intentos == 3 and sin_hoja._fallos == 1
+
+    print(f"{filas} filas, latencia simulada de la hoja {latencia:.1f} s, {os.path.getsize(ruta) / 1e6:.1f} MB en disco")
+    print(f"arranque sin snapshot:            {t_frio * 1000:9.1f} ms")
+    print(f"arranque con snapshot:            {t_snapshot * 1000:9.1f} ms")
+    print(f"snapshot vencido (sirve el viejo): {t_vencido * 1000:9.1f} ms, lecturas de la hoja: {conn.lecturas}")
+    print(f"vencido con la hoja fallando:     {t_inestable * 1000:9.1f} ms, intentos: {inestable.intentos}")
+    print(f"hoja caída: {caida.intentos} intentos y pausa de {sin_hoja._pausa_hasta - time.time():.1f} s antes del próximo refresco")
+    assert len(df) == filas and conn.lecturas == 2
+
+
+if __name__ == "__main__":
+    main()
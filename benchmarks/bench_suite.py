@@ -0,0 +1,284 @@
+# Suite de benchmarks de las dos apps sin Streamlit ni Google Sheets: genera una
+# hoja sintética (benchmarks/sinteticos.py) y mide cada etapa del camino de una
+# página (carga, normalización, filtros, agregados, serialización del mapa y
+# exportación) para appv2.py y estadisticainteractiva.py.
+#
+# Por etapa se informa la mediana de varias repeticiones, el pico de memoria
+# (tracemalloc, en una corrida aparte para no inflar los tiempos), las filas y
+# los bytes producidos. Con --json se guardan los resultados y con --comparar
+# se contrastan con una corrida anterior: las etapas que empeoran más que
+# --umbral se marcan y el proceso termina con código 1.
+#
+# Uso: python -m benchmarks.bench_suite [--filas 100000 200000] [--repeticiones 3]
+#          [--json resultados.json] [--comparar base.json] [--umbral 0.25]
+import argparse
+import io
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import folium
+import numpy as np
+import pandas as pd
+
+from benchmarks.sinteticos import generar_hoja
+from nucleo.cantones import ConciliadorCantones
+from nucleo.cubo import (actualizar_anual, colapsar, construir_anual, construir_cubo, actualizar_cubo, construir_mascara,
+                         resumen_certificacion, serie_anual)
+from nucleo.datos import (NOMBRE_AMIGABLE, cantidades_por_canton, filas_filtradas, filtrar_estadisticas,
+                          normalizar_datos, normalizar_datos_estadistica, preparar_datos_resumen, resumen_filas)
+from nucleo.detalle import datos_mapa
+from nucleo.exportar import FORMATOS
+from nucleo.geocodificar import UbicadorCantones
+from nucleo.geometria import cargar_geometria_cacheada
+from nucleo.indice import IndiceFiltros
+from nucleo.mapa import crear_estilo, escala_beneficiarios, estilos_cantones, geojson_clasico
+from nucleo.snapshot import SnapshotHoja
+
+RUTA_GEOJSON = "costaricacantonesv10.geojson"
+COLUMNA_MAPA = "CANTÓN"  # nombre fijo en la geometría preparada (nucleo/geometria.py)
+
+
+def seleccion_tipica(df):
+    """Filtros de la barra lateral de appv2 con algo elegido en cada uno."""
+    anios = sorted(int(a) for a in df['AÑO'].dropna().unique())
+    return dict(cursos=['excel', 'excelbasico', 'eplve', 'redaccion'], anios=anios[-3:], cantones=[],
+                flags=['CERTIFICADO'], edades=['19 a 35', '36 a 64'], sexos=[])
+
+
+def serializar_geojson(gdf):
+    return len(json.dumps(gdf.__geo_interface__, default=str))
+
+
+# ---------------------------
+# Medición
+# ---------------------------
+def medir(funcion, repeticiones, memoria):
+    """funcion() devuelve (filas, bytes); se mide su tiempo y, aparte, su pico de memoria."""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        filas, tamano = funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    pico = None
+    if memoria:
+        tracemalloc.start()
+        funcion()
+        pico = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+    return {"ms": round(statistics.median(tiempos), 2), "mb": None if pico is None else round(pico, 2),
+            "filas": filas, "bytes": tamano}
+
+
+def etapas_appv2(hoja, gdf, conciliador, ubicador, directorio):
+    ruta_snapshot = os.path.join(directorio, "hoja.arrow")
+
+    def snapshot():
+        return SnapshotHoja(leer=hoja.copy, normalizar=lambda d: normalizar_datos(d, conciliador, ubicador),
+                            ruta=ruta_snapshot, max_edad=3600,
+                            agregados={'cubo': (construir_cubo, actualizar_cubo), 'indice': (IndiceFiltros, None),
+                                       'anual': (construir_anual, actualizar_anual)})
+
+    def carga_fria():
+        # Sin snapshot en disco: lectura + normalización + escritura + cubo e índice
+        if os.path.exists(ruta_snapshot):
+            os.remove(ruta_snapshot)
+        df, _, _, _ = snapshot().obtener('cubo', 'indice', 'anual')
+        return len(df), os.path.getsize(ruta_snapshot)
+
+    def carga_snapshot():
+        # Otro proceso que arranca con el snapshot ya escrito
+        df, _, _, _ = snapshot().obtener('cubo', 'indice', 'anual')
+        return len(df), os.path.getsize(ruta_snapshot)
+
+    estado = {}
+
+    def normalizar():
+        estado['df'] = df = normalizar_datos(hoja.copy(), conciliador, ubicador)
+        return len(df), None
+
+    yield "carga.fria", carga_fria
+    yield "carga.snapshot", carga_snapshot
+    yield "normalizar", normalizar
+    # El resto parte de la hoja ya normalizada, con su cubo e índice
+    df = estado['df']
+    cubo, indice, anual = construir_cubo(df), IndiceFiltros(df), construir_anual(df)
+    filtros = seleccion_tipica(df)
+    estado['cubo_filtrado'] = cubo[construir_mascara(cubo, **filtros)]
+
+    def filtrar_cubo():
+        cubo_filtrado = cubo[construir_mascara(cubo, **filtros)]
+        return len(cubo_filtrado), None
+
+    def filtrar_filas():
+        filas = filas_filtradas(df, indice, filtros)
+        return len(filas), None
+
+    def agregar():
+        cubo_filtrado = estado['cubo_filtrado']
+        estado['cantonal'], detalle = preparar_datos_resumen(cubo_filtrado)
+        for por in ('CURSO_NORMALIZADO', 'CANTON_DEF', 'AÑO'):
+            resumen_certificacion(cubo_filtrado, por)
+        return len(detalle), None
+
+    def serie():
+        # Serie del gráfico por año desde la tabla anual (filtros de edad, sexo y estado en "todos")
+        tabla = anual[construir_mascara(anual, filtros['cursos'], filtros['anios'], filtros['cantones'], None, None, None)]
+        return len(serie_anual(tabla)), None
+
+    def colapsado():
+        tabla = colapsar(estado['cubo_filtrado'], NOMBRE_AMIGABLE)
+        return len(tabla), None
+
+    def mapa_dinamico():
+        # Lo que viaja en cada rerun con el mapa dinámico: el estilo con los valores por cantón
+        cantidades = cantidades_por_canton(estado['cantonal'], gdf[COLUMNA_MAPA])
+        pasos, colores, _ = escala_beneficiarios(cantidades)
+        grupo = crear_estilo(cantidades.to_dict(), COLUMNA_MAPA, pasos, colores)
+        estilo = next(iter(grupo._children.values())).estilo
+        return len(cantidades), len(json.dumps(estilo))
+
+    def mapa_clasico():
+        # Mapa completo: merge con la geometría y GeoJSON de todos los cantones en cada rerun
+        para_mapa = geojson_clasico(gdf, estado['cantonal'], COLUMNA_MAPA)
+        cantidades = para_mapa['cantidad_color']
+        pasos, colores, _ = escala_beneficiarios(cantidades)
+        para_mapa['style'] = estilos_cantones(para_mapa[COLUMNA_MAPA], cantidades, pasos, colores)
+        return len(para_mapa), serializar_geojson(para_mapa)
+
+    yield "filtrar.cubo", filtrar_cubo
+    yield "filtrar.filas", filtrar_filas
+    yield "agregar", agregar
+    yield "agregar.anual", serie
+    yield "agregar.colapsado", colapsado
+    yield "mapa.dinamico", mapa_dinamico
+    yield "mapa.clasico", mapa_clasico
+
+    filas = filas_filtradas(df, indice, filtros)
+    for formato, (_, escribir) in FORMATOS.items():
+        def exportar(formato=formato, escribir=escribir):
+            destino = os.path.join(directorio, f"exportacion.{formato}")
+            escribir(filas, destino)
+            return len(filas), os.path.getsize(destino)
+        yield f"exportar.{formato}", exportar
+
+
+def etapas_estadistica(hoja, gdf, conciliador):
+    estado = {}
+
+    def normalizar():
+        estado['df'] = df = normalizar_datos_estadistica(hoja.copy(), conciliador)
+        return len(df), None
+
+    yield "normalizar", normalizar
+    df = estado['df']
+    cursos = ['excel', 'excelbasico', 'eplve', 'redaccion']
+    anios = sorted(df['AÑO'].dropna().unique())[-3:]
+    cantones = df['CANTON_DEF'].dropna().unique()
+    estado['filtrado'] = df[df["CURSO_NORMALIZADO"].isin(cursos) & df['AÑO'].isin(anios)]
+
+    def filtrar():
+        filtrado = df[df["CURSO_NORMALIZADO"].isin(cursos) & df['AÑO'].isin(anios)]
+        estadisticas = filtrar_estadisticas(df, cantones, cursos, anios, [0, 1])
+        return len(filtrado) + len(estadisticas), None
+
+    def agregar_mapa():
+        # datos_mapa(): cantidades, detalle por cantón y popups
+        estado['popups'] = datos_mapa(df, gdf[COLUMNA_MAPA], cursos, anios, NOMBRE_AMIGABLE)
+        return len(estado['popups']), None
+
+    def agregar_estadisticas():
+        filtrado = estado['filtrado']
+        for por in ('CURSO_NORMALIZADO', 'CANTON_DEF', 'AÑO'):
+            resumen_filas(filtrado, por)
+        return len(filtrado), None
+
+    def mapa():
+        capa = gdf[[COLUMNA_MAPA, 'geometry']].join(estado['popups'])
+        m = folium.Map(location=[9.7489, -83.7534], zoom_start=8)
+        folium.GeoJson(capa, popup=folium.GeoJsonPopup(fields=['popup'], labels=False)).add_to(m)
+        html = io.BytesIO()
+        m.save(html, close_file=False)
+        return len(capa), html.tell()
+
+    yield "filtrar", filtrar
+    yield "agregar.mapa", agregar_mapa
+    yield "agregar.estadisticas", agregar_estadisticas
+    yield "mapa.html", mapa
+
+
+# ---------------------------
+# Resultados
+# ---------------------------
+def correr(tamanos, repeticiones, memoria):
+    gdf = cargar_geometria_cacheada(RUTA_GEOJSON, nivel="completa")
+    gdf_mapa = cargar_geometria_cacheada(RUTA_GEOJSON, nivel="media")
+    conciliador = ConciliadorCantones(gdf[COLUMNA_MAPA])
+    ubicador = UbicadorCantones(gdf, COLUMNA_MAPA)
+    cantones = gdf[COLUMNA_MAPA].tolist()
+    resultados = []
+    for filas in tamanos:
+        hoja = generar_hoja(filas, cantones)
+        directorio = tempfile.mkdtemp()
+        try:
+            for app, etapas in (("appv2", etapas_appv2(hoja, gdf_mapa, conciliador, ubicador, directorio)),
+                                ("estadistica", etapas_estadistica(hoja, gdf, conciliador))):
+                for nombre, funcion in etapas:
+                    medida = medir(funcion, repeticiones, memoria)
+                    resultados.append({"app": app, "etapa": nombre, "tamano": filas, **medida})
+                    print(f"{app:>12} {nombre:<22}{filas:>9}{medida['ms']:>11.1f} ms"
+                          + ("" if medida['mb'] is None else f"{medida['mb']:>9.1f} MB")
+                          + ("" if medida['bytes'] is None else f"{medida['bytes'] / 1e3:>11.1f} kB salida"),
+                          flush=True)
+        finally:
+            shutil.rmtree(directorio, ignore_errors=True)
+    return resultados
+
+
+def comparar(resultados, base, umbral):
+    """Etapas cuyo tiempo creció más que 'umbral' (fracción) respecto de la corrida base."""
+    anteriores = {(r["app"], r["etapa"], r["tamano"]): r for r in base}
+    regresiones = []
+    print(f"\n{'app':>12} {'etapa':<22}{'filas':>9}{'base ms':>11}{'ahora ms':>11}{'cambio':>9}")
+    for r in resultados:
+        previo = anteriores.get((r["app"], r["etapa"], r["tamano"]))
+        if previo is None or not previo["ms"]:
+            continue
+        cambio = r["ms"] / previo["ms"] - 1
+        marca = " <-- regresión" if cambio > umbral else ""
+        print(f"{r['app']:>12} {r['etapa']:<22}{r['tamano']:>9}{previo['ms']:>11.1f}{r['ms']:>11.1f}{cambio:>+9.0%}{marca}")
+        if marca:
+            regresiones.append(r)
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Etapas de appv2.py y estadisticainteractiva.py sobre datos sintéticos")
+    parser.add_argument("--filas", type=int, nargs="+", default=[100_000])
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--sin-memoria", action="store_true", help="no medir el pico de memoria")
+    parser.add_argument("--json", help="guardar los resultados en este archivo")
+    parser.add_argument("--comparar", help="resultados de una corrida anterior (--json)")
+    parser.add_argument("--umbral", type=float, default=0.25, help="empeoramiento tolerado (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    print(f"{'app':>12} {'etapa':<22}{'filas':>9}{'mediana':>14}{'pico':>12}")
+    resultados = correr(args.filas, args.repeticiones, not args.sin_memoria)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"python": sys.version.split()[0], "pandas": pd.__version__, "numpy": np.__version__,
+                       "resultados": resultados}, f, ensure_ascii=False, indent=1)
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            base = json.load(f)["resultados"]
+        if comparar(resultados, base, args.umbral):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+# Hoja de beneficiarios sintética para los benchmarks, con las mismas columnas
+# y los mismos tipos de valores sucios que trae la hoja real: cursos escritos
+# de varias formas, cantones del geojson con y sin tildes, códigos de edad
+# raros (98, 103, '20-29', 'Más de 50'...), sexos abreviados, flags con
+# celdas vacías y algunas filas 'Sin dato' con coordenadas.
+#
+# Uso: python -m benchmarks.sinteticos [filas] [destino.parquet]
+import sys
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+
+from nucleo.normalizacion import strip_accents
+
+# valor como viene en la hoja -> peso relativo
+CURSOS = {
+    "Excel": 20, "excel ": 4, "Excel Basico": 1, "ExcelBasico": 8, "ExcelIntermedio": 6,
+    "EPLVE": 14, "eplve": 2, "EPLVIM": 5, "EPLVMYS": 5,
+    "Redacción": 10, "Redaccion": 3, "Admisión": 8, "admision": 2, "Inglés": 2, None: 1,
+}
+ANIOS = {2019: 2, 2020: 3, 2021: 5, 2022: 7, 2023: 8, 2024: 9, 2025: 6, np.nan: 1}
+EDADES = {
+    **{edad: 3 for edad in range(13, 80)},
+    **dict.fromkeys([98, 99, 102, 103, 105, 106, 109, 150], 2),
+    **dict.fromkeys([17.0, 24.5, 41.0], 4),
+    **dict.fromkeys(["15-19", "20-29", "20 a 29", "30-39", "40-49", "Más de 50", "Más de 65",
+                     "18 a 35 años", "información incompleta", "Sin dato", "", " 36-64 "], 3),
+    None: 10,
+}
+SEXOS = {"Femenino": 30, "F": 15, "mujer": 3, "Masculino": 25, "M": 10, "hombre": 2,
+         "NR": 2, "no indica": 1, "": 2, None: 5}
+FLAGS = {"CERTIFICADO": 0.6, "DESERCION": 0.15, "INTERMITENTE": 0.1}  # probabilidad de 1
+
+# Cómo aparece escrito un cantón en la hoja (peso relativo de cada variante)
+VARIANTES_CANTON = [
+    (lambda c: c, 85),
+    (strip_accents, 8),
+    (lambda c: strip_accents(c).upper(), 3),
+    (lambda c: f" {c.lower()} ", 3),
+    (lambda c: c[:-1] if len(c) > 6 else c, 1),
+]
+PROPORCION_SIN_DATO = 0.04
+PROPORCION_NULOS = 0.01
+
+
+def elegir(rng, pesos, filas):
+    valores = np.array(list(pesos), dtype=object)
+    p = np.array(list(pesos.values()), dtype=float)
+    return valores[rng.choice(len(valores), filas, p=p / p.sum())]
+
+
+def cantones_geojson(ruta="costaricacantonesv10.geojson", columna="NAME_2"):
+    return gpd.read_file(ruta, ignore_geometry=True)[columna].dropna().tolist()
+
+
+def generar_hoja(filas, cantones=None, semilla=0, limites=(-85.95, 8.03, -82.55, 11.22)):
+    """DataFrame con la forma de conn.read() de la hoja de beneficiarios.
+
+    Los cantones siguen una distribución tipo Zipf (pocos cantones concentran
+    muchas personas) y se escriben con las variantes de VARIANTES_CANTON.
+    Las filas 'Sin dato' traen LATITUD/LONGITUD dentro de 'limites'.
+    """
+    rng = np.random.default_rng(semilla)
+    if cantones is None:
+        cantones = cantones_geojson()
+    cantones = np.array(cantones, dtype=object)
+
+    pesos = 1 / np.arange(1, len(cantones) + 1)
+    canton = cantones[rng.permutation(len(cantones))][rng.choice(len(cantones), filas, p=pesos / pesos.sum())]
+    variante = rng.choice(len(VARIANTES_CANTON), filas,
+                          p=np.array([p for _, p in VARIANTES_CANTON]) / sum(p for _, p in VARIANTES_CANTON))
+    canton_hoja = canton.copy()
+    for i, (escribir, _) in enumerate(VARIANTES_CANTON):
+        cambiar = variante == i
+        if i and cambiar.any():
+            unicos, codigos = np.unique(canton[cambiar], return_inverse=True)
+            canton_hoja[cambiar] = np.array([escribir(c) for c in unicos], dtype=object)[codigos]
+    azar = rng.random(filas)
+    sin_dato = azar < PROPORCION_SIN_DATO
+    canton_hoja[sin_dato] = "Sin dato"
+    canton_hoja[(azar >= PROPORCION_SIN_DATO) & (azar < PROPORCION_SIN_DATO + PROPORCION_NULOS)] = None
+
+    # Coordenadas solo para una parte de las filas sin cantón
+    oeste, sur, este, norte = limites
+    con_punto = sin_dato & (rng.random(filas) < 0.6)
+    longitud = np.where(con_punto, rng.uniform(oeste, este, filas), np.nan)
+    latitud = np.where(con_punto, rng.uniform(sur, norte, filas), np.nan)
+
+    hoja = pd.DataFrame({
+        "ID": np.char.add("B", np.arange(filas).astype(str)).astype(object),
+        "CURSO": elegir(rng, CURSOS, filas),
+        "AÑO": elegir(rng, ANIOS, filas).astype(float),
+        "CANTON_DEF": canton_hoja,
+        "EDAD": elegir(rng, EDADES, filas),
+        "SEXO": elegir(rng, SEXOS, filas),
+        "LATITUD": latitud,
+        "LONGITUD": longitud,
+        "FECHA_INSCRIPCION": pd.Timestamp("2019-01-01") + pd.to_timedelta(rng.integers(0, 2500, filas), unit="D"),
+    })
+    for col, probabilidad in FLAGS.items():
+        # La hoja devuelve floats, con celdas vacías (NaN) de vez en cuando
+        valores = (rng.random(filas) < probabilidad).astype(float)
+        valores[rng.random(filas) < 0.01] = np.nan
+        hoja[col] = valores
+    return hoja
+
+
+if __name__ == "__main__":
+    filas = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    hoja = generar_hoja(filas)
+    if len(sys.argv) > 2:
+        hoja.to_parquet(sys.argv[2], index=False)
+        print(f"{filas} filas -> {sys.argv[2]}")
+    else:
+        print(hoja.head(20).to_string())
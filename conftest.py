@@ -0,0 +1,2 @@
+# Vacío a propósito: pytest agrega el directorio de este archivo a sys.path, así
+# los tests de tests/ importan nucleo igual que las apps y los benchmarks.
@@ -1,54 +1,67 @@
 import streamlit as st
-import geopandas as gpd
-import pandas as pd
-import folium
-from streamlit_folium import st_folium
-from streamlit_gsheets import GSheetsConnection
-import plotly.express as px
+import os
+from nucleo.cantones import ConciliadorCantones
+from nucleo.datos import NOMBRE_AMIGABLE, cargar_hojas, filtrar_estadisticas, normalizar_datos_estadistica, resumen_filas
+from nucleo.detalle import datos_mapa as calcular_datos_mapa
+from nucleo.snapshot import SnapshotHoja
 
-# ===============================
-# Cargar datos desde Google Sheets
-# ===============================
-conn = st.connection("gsheets", type=GSheetsConnection)
-df = conn.read(worksheet="mapa_v1", ttl=120)
-
-# Diccionario para mostrar nombres amigables
-nombre_amigable = {
-    "admision": "Admisión y lógica",
-    "admisión": "Admisión y lógica",
-    "eplve": "Economía para la vida",
-    "eplvim": "Economía para la vida: indicadores macroeconómicos",
-    "eplvmys": "Economía para la Vida: mercado y sociedad",
-    "excel": "Excel",
-    "excelbasico": "Excel básico",
-    "excelintermedio": "Excel intermedio",
-    "redaccion": "Redacción Consciente"
-}
+# geopandas (en nucleo/geometria.py), folium, plotly y el cliente de Google Sheets se importan donde se
+# usan, para que el título aparezca antes (ver benchmarks/bench_arranque.py)
 
 # ===============================
 # Título de la app
 # ===============================
+# Antes de cargar nada, así es lo primero que se ve
 st.title("📊 Mapa y Estadísticas de las personas beneficiarias: TCU Nirien - Habilidades para la Vida - UCR")
 
 # ===============================
-# Cargar geojson con caché
+# Cargar datos desde Google Sheets
 # ===============================
-@st.cache_data
+# Pestañas que se unen (se leen a la vez, ver nucleo/datos.py)
+hojas_datos = ["mapa_v1"]
+
+def leer_hoja():
+    # Con el snapshot local vigente no se importa ni se conecta el cliente de la hoja
+    from streamlit_gsheets import GSheetsConnection
+    conn = st.connection("gsheets", type=GSheetsConnection)
+    return cargar_hojas(lambda hoja: conn.read(worksheet=hoja, ttl=0), hojas_datos)
+
+@st.cache_resource
 def cargar_geojson():
-    return gpd.read_file("costaricacantonesv10.geojson")
+    # Geometría preparada una sola vez (válida, EPSG:4326, solo cantón y provincia) y
+    # guardada como GeoParquet junto al geojson; ver nucleo/geometria.py.
+    # Nivel "completa": los mismos polígonos del archivo, sin simplificar.
+    from nucleo.geometria import cargar_geometria_cacheada
+    return cargar_geometria_cacheada("costaricacantonesv10.geojson", nivel="completa")
+
+@st.cache_resource
+def conciliador_cantones():
+    return ConciliadorCantones(cargar_geojson()["CANTÓN"])
+
+@st.cache_resource
+def snapshot_datos():
+    # Snapshot Arrow local de la hoja (ver nucleo/snapshot.py): se sirve al instante
+    # y, pasados 120 s, se vuelve a leer la hoja en segundo plano.
+    return SnapshotHoja(leer=leer_hoja,
+                        normalizar=lambda df: normalizar_datos_estadistica(df, conciliador_cantones()),
+                        ruta=os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache_datos", "mapa_v1.arrow"),
+                        max_edad=120)
+
+# Versión de los datos servidos, leída junto con df: clave de las cachés que dependen de df
+version_datos, df = snapshot_datos().obtener(con_version=True)
+
+# Diccionario para mostrar nombres amigables (ver nucleo/datos.py)
+nombre_amigable = NOMBRE_AMIGABLE
 
+# ===============================
+# Cargar geojson con caché
+# ===============================
 try:
     gdf = cargar_geojson()
 except Exception as e:
     st.error(f"Ocurrió un error cargando los archivos: {e}")
     st.stop()
 
-# ===============================
-# Normalización y preparación
-# ===============================
-df["CURSO_NORMALIZADO"] = df["CURSO"].str.lower().str.normalize('NFKD') \
-    .str.encode('ascii', errors='ignore').str.decode('utf-8')
-
 # Sidebar - Filtros
 st.sidebar.title("Filtros para el Mapa📌")
 
@@ -90,70 +103,37 @@ if not anios_seleccionados:
 # ===============================
 # Filtrar datos
 # ===============================
-df_filtrado = df[
-    (df["CURSO_NORMALIZADO"].isin(cursos_filtrados)) &
-    (df['AÑO'].isin(anios_seleccionados))
-]
-
-df_cantonal = df_filtrado.groupby('CANTON_DEF').size().reset_index(name='cantidad_beneficiarios')
-
-# Agrupar por cantón, curso y año para mostrar detalles en el mapa
-df_detalle = df_filtrado.groupby(['CANTON_DEF', 'CURSO_NORMALIZADO', 'AÑO']).size().reset_index(name='conteo')
-
-gdf_merged = gdf.merge(df_cantonal, how="left", left_on="NAME_2", right_on="CANTON_DEF")
+@st.cache_data(max_entries=64)
+def datos_mapa(version, _df, _cantones, cursos, anios):
+    # Color y popup de cada cantón para la selección actual (ver nucleo/detalle.py).
+    # Se calcula una vez por selección y versión de la hoja: la versión identifica a _df,
+    # que no se hashea; _cantones es la geometría cacheada, igual en todo el proceso.
+    return calcular_datos_mapa(_df, _cantones, cursos, anios, nombre_amigable)
 
 # ===============================
 # Mapa interactivo
 # ===============================
 st.subheader("🗺️ Mapa Interactivo")
 
-m = folium.Map(location=[9.7489, -83.7534], zoom_start=8)
+import folium
+from streamlit_folium import st_folium
 
-def color_por_cantidad(cantidad):
-    if pd.isnull(cantidad):
-        return 'gray'
-    elif cantidad == 0:
-        return 'green'
-    elif cantidad < 20:
-        return 'orange'
-    else:
-        return 'red'
-
-for _, row in gdf_merged.iterrows():
-    canton = row['NAME_2']
-    cantidad = row['cantidad_beneficiarios']
-    color = color_por_cantidad(cantidad)
-
-    # Filtrar detalles para este cantón
-    detalles = df_detalle[df_detalle['CANTON_DEF'] == canton]
-
-    if detalles.empty:
-        detalle_html = "<i>Sin datos disponibles</i>"
-    else:
-        detalle_html = "<ul>"
-        for _, d in detalles.iterrows():
-            curso = nombre_amigable.get(d['CURSO_NORMALIZADO'], d['CURSO_NORMALIZADO'].title())
-            detalle_html += f"<li>{curso} ({int(d['AÑO'])}): {d['conteo']} personas</li>"
-        detalle_html += "</ul>"
-
-    popup_html = f"""
-        <strong>Cantón:</strong> {canton}<br>
-        <strong>Total de beneficiarios:</strong> {cantidad if not pd.isnull(cantidad) else '0'}<br>
-        <strong>Detalle:</strong> {detalle_html}
-    """
-
-    folium.GeoJson(
-        row['geometry'],
-        style_function=lambda feature, color=color: {
-            'fillColor': color,
-            'color': 'black',
-            'weight': 1,
-            'fillOpacity': 0.5
-        },
-        tooltip=folium.Tooltip(f"{canton}"),
-        popup=folium.Popup(popup_html, max_width=300)
-    ).add_to(m)
+m = folium.Map(location=[9.7489, -83.7534], zoom_start=8)
 
+# Una sola capa para todos los cantones: color y popup salen de las propiedades de cada feature
+capa = gdf[['CANTÓN', 'geometry']].join(datos_mapa(version_datos, df, gdf['CANTÓN'],
+                                                      tuple(cursos_filtrados), tuple(anios_seleccionados)))
+folium.GeoJson(
+    capa,
+    style_function=lambda feature: {
+        'fillColor': feature['properties']['color'],
+        'color': 'black',
+        'weight': 1,
+        'fillOpacity': 0.5
+    },
+    tooltip=folium.GeoJsonTooltip(fields=['CANTÓN'], labels=False),
+    popup=folium.GeoJsonPopup(fields=['popup'], labels=False, localize=False, max_width=300)
+).add_to(m)
 
 st_folium(m, width=800, height=600)
 
@@ -169,6 +149,8 @@ st.markdown("""
 # ===============================
 st.subheader("📊 Estadísticas Descriptivas")
 
+import plotly.express as px
+
 # Filtros adicionales
 st.sidebar.title("Filtros para Estadísticas📊")
 
@@ -187,26 +169,18 @@ certificados_disponibles = df["CERTIFICADO"].dropna().unique()
 certificados_seleccionados = st.sidebar.multiselect("Selecciona certificado", certificados_disponibles, default=certificados_disponibles, key="filtro_certificado_estadisticas")
 
 # Filtrar datos para estadísticas
-df_estadisticas = df[
-    (df["CANTON_DEF"].isin(cantones_seleccionados)) &
-    (df["CURSO_NORMALIZADO"].isin(cursos_filtrados)) &
-    (df['AÑO'].isin(anios_seleccionados_estadisticas)) &
-    (df['CERTIFICADO'].isin(certificados_seleccionados))
-]
+df_estadisticas = filtrar_estadisticas(df, cantones_seleccionados, cursos_filtrados,
+                                       anios_seleccionados_estadisticas, certificados_seleccionados)
 
 # Tabla resumen por curso
 st.subheader("Resumen por Curso")
-resumen_curso = df_estadisticas.groupby(['CURSO_NORMALIZADO', 'CERTIFICADO']).size().unstack(fill_value=0)
-resumen_curso['Total'] = resumen_curso.sum(axis=1)
-resumen_curso['% Certificado'] = (resumen_curso[1] / resumen_curso['Total']) * 100
+resumen_curso = resumen_filas(df_estadisticas, 'CURSO_NORMALIZADO')
 resumen_curso = resumen_curso.rename(columns=nombre_amigable)
 st.dataframe(resumen_curso)
 
 # Tabla resumen por cantón
 st.subheader("Resumen por Cantón")
-resumen_canton = df_estadisticas.groupby(['CANTON_DEF', 'CERTIFICADO']).size().unstack(fill_value=0)
-resumen_canton['Total'] = resumen_canton.sum(axis=1)
-resumen_canton['% Certificado'] = (resumen_canton[1] / resumen_canton['Total']) * 100
+resumen_canton = resumen_filas(df_estadisticas, 'CANTON_DEF')
 st.dataframe(resumen_canton)
 
 # Gráfico de barras apiladas por curso y certificado
@@ -218,9 +192,7 @@ st.plotly_chart(fig_barras)
 
 # Gráfico de línea por año con evolución de participación y aprobación
 st.subheader("Gráfico de Línea por Año")
-df_anual = df_estadisticas.groupby(['AÑO', 'CERTIFICADO']).size().unstack(fill_value=0)
-df_anual['Total'] = df_anual.sum(axis=1)
-df_anual['% Certificado'] = (df_anual[1] / df_anual['Total']) * 100
+df_anual = resumen_filas(df_estadisticas, 'AÑO')
 fig_linea = px.line(df_anual, x=df_anual.index, y='% Certificado', 
                     title='Evolución de la Participación y Aprobación por Año',
                     labels={'AÑO': 'Año', '% Certificado': '% Certificado'})
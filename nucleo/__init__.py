@@ -0,0 +1 @@
+# Núcleo de procesamiento de datos (sin dependencias de Streamlit)
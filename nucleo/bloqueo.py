@@ -0,0 +1,50 @@
+import contextlib
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: solo se coordinan los hilos del mismo proceso
+    fcntl = None
+
+# ---------------------------
+# Bloqueo entre procesos (single-flight)
+# ---------------------------
+# Varias réplicas de Streamlit en el mismo nodo comparten los archivos de
+# caché (snapshot Arrow, GeoParquet). Antes de reconstruir uno se toma un
+# bloqueo sobre '<ruta>.lock', de modo que un solo proceso va a la fuente y
+# los demás leen el archivo que este deja listo.
+
+_locks_locales = {}
+_locks_locales_lock = threading.Lock()
+
+
+def _lock_local(ruta):
+    # flock no excluye a los hilos del mismo proceso si abren el archivo por separado
+    with _locks_locales_lock:
+        return _locks_locales.setdefault(ruta, threading.Lock())
+
+
+@contextlib.contextmanager
+def bloqueo_archivo(ruta, esperar=True):
+    """Toma el bloqueo de 'ruta'. Con esperar=False entrega False si otro ya lo tiene."""
+    local = _lock_local(ruta)
+    if not local.acquire(blocking=esperar):
+        yield False
+        return
+    try:
+        os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+        with open(ruta + ".lock", "a") as f:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX if esperar else fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    yield False
+                    return
+            try:
+                yield True
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+    finally:
+        local.release()
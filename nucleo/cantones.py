@@ -0,0 +1,94 @@
+import logging
+import re
+
+import numpy as np
+import pandas as pd
+
+from nucleo.normalizacion import strip_accents
+
+# ---------------------------
+# Conciliación de nombres de cantón (hoja <-> geojson)
+# ---------------------------
+# El merge del mapa compara nombres exactos: 'Perez Zeledon' o 'perez zeledón'
+# no encuentran 'Pérez Zeledón' y sus personas quedan fuera del mapa. Aquí se
+# arma una sola vez un índice clave -> nombre oficial (clave: sin tildes, en
+# minúscula, sin puntuación) con alias de cantones renombrados, y cada valor
+# distinto de la hoja se resuelve una sola vez (exacto, alias o distancia de
+# edición) y queda memorizado.
+
+logger = logging.getLogger(__name__)
+
+SIN_DATO = 'Sin dato'
+
+# Nombres anteriores o abreviados de un mismo cantón (en forma de clave)
+ALIAS = [
+    ("quepos", "aguirre"),
+    ("sarchi", "valverde vega"),
+    ("vazquez de coronado", "coronado", "vasquez de coronado"),
+    ("leon cortes castro", "leon cortes"),
+]
+
+
+def clave_canton(nombre):
+    clave = strip_accents(str(nombre)).lower()
+    clave = re.sub(r"[^a-z0-9]+", " ", clave)
+    return " ".join(clave.split())
+
+
+def distancia_edicion(a, b, maximo):
+    """Levenshtein entre a y b, o maximo + 1 si se pasa (corta apenas se sabe)."""
+    if abs(len(a) - len(b)) > maximo:
+        return maximo + 1
+    previa = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        actual = [i]
+        for j, cb in enumerate(b, 1):
+            actual.append(min(previa[j] + 1, actual[j - 1] + 1, previa[j - 1] + (ca != cb)))
+        if min(actual) > maximo:
+            return maximo + 1
+        previa = actual
+    return previa[-1]
+
+
+class ConciliadorCantones:
+    def __init__(self, nombres_oficiales, alias=ALIAS):
+        self.oficiales = {}
+        for nombre in pd.Series(nombres_oficiales).dropna().unique():
+            self.oficiales.setdefault(clave_canton(nombre), nombre)
+        for grupo in alias:
+            # El alias apunta al nombre que use el geojson, sea el nuevo o el anterior
+            presentes = [self.oficiales[c] for c in grupo if c in self.oficiales]
+            if presentes:
+                for clave in grupo:
+                    self.oficiales.setdefault(clave, presentes[0])
+        self.resueltos = {}  # valor de la hoja -> nombre oficial o None
+
+    def resolver(self, valor):
+        """Nombre oficial para un valor de la hoja, o None si no hay uno claro."""
+        if valor in self.resueltos:
+            return self.resueltos[valor]
+        clave = clave_canton(valor)
+        oficial = self.oficiales.get(clave)
+        if oficial is None and clave:
+            # Un error de tipeo cada ~5 letras; si dos cantones empatan no se elige ninguno
+            maximo = max(1, len(clave) // 5)
+            distancias = sorted((distancia_edicion(clave, c, maximo), o) for c, o in self.oficiales.items())
+            candidatos = {o for d, o in distancias if d == distancias[0][0] and d <= maximo}
+            if len(candidatos) == 1:
+                oficial = candidatos.pop()
+        self.resueltos[valor] = oficial
+        return oficial
+
+    def conciliar(self, serie):
+        """Serie con los nombres oficiales; lo que no se resuelve (y 'Sin dato') queda como venía."""
+        codigos, unicos = pd.factorize(serie)
+        resueltos = [SIN_DATO if u == SIN_DATO else self.resolver(u) for u in unicos]
+        no_encontrados = [u for u, r in zip(unicos, resueltos) if r is None]
+        if no_encontrados:
+            logger.warning("Cantones sin equivalente en el mapa: %s", ", ".join(map(str, no_encontrados)))
+        finales = np.array([u if r is None else r for u, r in zip(unicos, resueltos)] + [None], dtype=object)
+        return pd.Series(finales[codigos], index=serie.index)
+
+    def no_encontrados(self, valores):
+        """Valores (distintos de 'Sin dato') que no corresponden a ningún cantón del mapa."""
+        return sorted(v for v in set(valores) if v != SIN_DATO and self.resolver(v) is None)
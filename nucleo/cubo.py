@@ -0,0 +1,128 @@
+import numpy as np
+import pandas as pd
+
+# ---------------------------
+# Cubo de conteos por combinación de filtros
+# ---------------------------
+# Todas las dimensiones de la barra lateral son categóricas de baja
+# cardinalidad, así que la hoja completa se resume una sola vez en una tabla
+# de conteos. Los filtros se aplican sobre esa tabla (mucho más chica que la
+# hoja) y las tablas del mapa y de estadísticas salen de sumar 'conteo'.
+
+DIMENSIONES = [
+    'CURSO_NORMALIZADO', 'AÑO', 'CANTON_DEF',
+    'CERTIFICADO', 'DESERCION', 'INTERMITENTE',
+    'EDAD_CLASIFICADA', 'SEXO_NORMALIZADO',
+]
+FLAGS = ['CERTIFICADO', 'DESERCION', 'INTERMITENTE']
+
+
+def construir_cubo(df):
+    # dropna=False conserva los AÑO nulos, que la tabla "Sin dato" sí cuenta
+    return df.groupby(DIMENSIONES, dropna=False, sort=False).size().reset_index(name='conteo')
+
+
+def construir_mascara(tabla, cursos, anios, cantones, flags, edades, sexos):
+    """Misma lógica de filtrado que la hoja por filas; sirve para la hoja o para el cubo.
+
+    flags es None cuando están todos los estados, o la lista de columnas
+    seleccionadas (se combinan con OR).
+    """
+    mask = pd.Series(True, index=tabla.index)
+    if cursos:
+        mask &= tabla['CURSO_NORMALIZADO'].isin(cursos)
+    if len(anios) > 0:
+        mask &= tabla['AÑO'].isin(anios)
+    if cantones:
+        mask &= tabla['CANTON_DEF'].isin(cantones)
+    if flags is not None:
+        mask_flag = pd.Series(False, index=tabla.index)
+        for col in flags:
+            mask_flag |= (tabla[col] == 1)
+        mask &= mask_flag
+    if edades:
+        mask &= tabla['EDAD_CLASIFICADA'].isin(edades)
+    if sexos:
+        mask &= tabla['SEXO_NORMALIZADO'].isin(sexos)
+    return mask
+
+
+def sumar(cubo, por):
+    """Equivalente a df.groupby(por).size() sobre las filas originales."""
+    return cubo.groupby(por)['conteo'].sum()
+
+
+def resumen_certificacion(cubo, por):
+    """Conteos por CERTIFICADO (columnas 0/1), total y porcentaje certificado."""
+    resumen = sumar(cubo, [por, 'CERTIFICADO']).unstack(fill_value=0)
+    resumen['Total'] = resumen.sum(axis=1)
+    resumen['% Certificado'] = (resumen.get(1, 0) / resumen['Total']).replace([np.inf, -np.inf, np.nan], 0) * 100
+    return resumen
+
+
+def actualizar_cubo(cubo, quitadas, agregadas):
+    """Cubo tras reemplazar las filas 'quitadas' por las 'agregadas' (refresco incremental)."""
+    restar = construir_cubo(quitadas)
+    restar['conteo'] = -restar['conteo']
+    combinado = pd.concat([cubo, construir_cubo(agregadas), restar], ignore_index=True)
+    combinado = combinado.groupby(DIMENSIONES, dropna=False, sort=False)['conteo'].sum().reset_index()
+    return combinado[combinado['conteo'] != 0].reset_index(drop=True)
+
+
+# ---------------------------
+# Serie anual
+# ---------------------------
+# Por año × curso × cantón, cuántas personas se inscribieron y cuántas de ellas
+# certificaron, desertaron o son intermitentes (los flags pasan de dimensiones
+# a columnas de conteo). Es mucho más chica que el cubo: con los filtros de
+# edad, sexo y estado en "todos", la serie del gráfico por año sale de filtrar
+# esta tabla y sumar por AÑO. Con esos filtros puestos se arma desde el cubo filtrado.
+DIMENSIONES_ANUALES = ['AÑO', 'CURSO_NORMALIZADO', 'CANTON_DEF']
+MEDIDAS_ANUALES = {'INSCRITOS': None, 'CERTIFICADOS': 'CERTIFICADO',
+                   'DESERCIONES': 'DESERCION', 'INTERMITENTES': 'INTERMITENTE'}
+PORCENTAJES_ANUALES = {'% Certificado': 'CERTIFICADOS', '% Deserción': 'DESERCIONES',
+                       '% Intermitencia': 'INTERMITENTES'}
+
+
+def construir_anual(tabla):
+    """Medidas por año a partir de las filas de la hoja o de un cubo (con 'conteo'); sin AÑO nulo."""
+    tabla = tabla.dropna(subset=['AÑO'])
+    conteo = tabla['conteo'] if 'conteo' in tabla.columns else pd.Series(1, index=tabla.index)
+    medidas = pd.DataFrame({medida: conteo if flag is None else conteo * (tabla[flag] == 1)
+                            for medida, flag in MEDIDAS_ANUALES.items()}, index=tabla.index)
+    return (pd.concat([tabla[DIMENSIONES_ANUALES], medidas], axis=1)
+            .groupby(DIMENSIONES_ANUALES, dropna=False, sort=False).sum().reset_index())
+
+
+def actualizar_anual(anual, quitadas, agregadas):
+    """Como actualizar_cubo(), para la tabla de construir_anual()."""
+    restar = construir_anual(quitadas)
+    restar[list(MEDIDAS_ANUALES)] = -restar[list(MEDIDAS_ANUALES)]
+    combinado = pd.concat([anual, construir_anual(agregadas), restar], ignore_index=True)
+    combinado = combinado.groupby(DIMENSIONES_ANUALES, dropna=False, sort=False).sum().reset_index()
+    return combinado[combinado['INSCRITOS'] != 0].reset_index(drop=True)
+
+
+def serie_anual(anual):
+    """Totales por año, porcentajes sobre los inscritos y variación respecto del año anterior."""
+    serie = anual.groupby('AÑO')[list(MEDIDAS_ANUALES)].sum().sort_index()
+    serie = serie[serie['INSCRITOS'] > 0]
+    for porcentaje, medida in PORCENTAJES_ANUALES.items():
+        serie[porcentaje] = serie[medida] / serie['INSCRITOS'] * 100
+    return pd.concat([serie, serie.diff().add_prefix('Δ ')], axis=1)
+
+
+def colapsar(cubo, nombres):
+    """Tabla Cantón × 'Curso Año' de la descarga colapsada, a partir de los conteos.
+
+    Equivale al pivot_table(aggfunc='count') sobre las filas con AÑO y cantón:
+    las etiquetas se arman al final, una por columna, y los cursos que comparten
+    nombre amigable (p. ej. 'admision' y 'admisión') quedan en la misma columna.
+    """
+    cubo = cubo.dropna(subset=['AÑO', 'CANTON_DEF'])
+    tabla = sumar(cubo, ['CANTON_DEF', 'CURSO_NORMALIZADO', 'AÑO']).unstack(['CURSO_NORMALIZADO', 'AÑO'], fill_value=0)
+    etiquetas = [f"{nombres.get(curso, curso.title())} {int(anio)}" for curso, anio in tabla.columns]
+    tabla = tabla.T.groupby(etiquetas).sum().T
+    tabla.columns.name = 'CURSO_AÑO'
+    tabla['TOTAL'] = tabla.sum(axis=1)
+    return tabla.reset_index()
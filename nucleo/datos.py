@@ -0,0 +1,252 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from nucleo.cubo import resumen_certificacion, sumar
+from nucleo.geocodificar import asignar_cantones
+from nucleo.normalizacion import clasificar_edades, convertir_fechas, normalizar_sexos, strip_accents
+from nucleo.tiempos import etapa
+
+# ---------------------------
+# Pipeline de la hoja, sin Streamlit
+# ---------------------------
+# Normalización, selección de filtros y resúmenes que usan appv2.py y
+# estadisticainteractiva.py. Son funciones puras (reciben y devuelven
+# DataFrames), así que se pueden importar, medir y cachear por separado; los
+# scripts de Streamlit solo arman los widgets y muestran los resultados.
+
+SIN_DATO = 'Sin dato'
+
+# Diccionario nombres amigables
+NOMBRE_AMIGABLE = {
+    "admision": "Admisión y lógica",
+    "admisión": "Admisión y lógica",
+    "eplve": "Economía para la vida",
+    "eplvim": "Economía para la vida: indicadores macroeconómicos",
+    "eplvmys": "Economía para la Vida: mercado y sociedad",
+    "excel": "Excel",
+    "excelbasico": "Excel básico",
+    "excelintermedio": "Excel intermedio",
+    "redaccion": "Redacción Consciente"
+}
+
+COLUMNAS_CANTON = ['CANTÓN', 'Canton', 'CANTON', 'canton']
+COLUMNAS_LATITUD = ['LATITUD', 'Latitud', 'LAT', 'lat']
+COLUMNAS_LONGITUD = ['LONGITUD', 'Longitud', 'LON', 'LNG', 'lon']
+COLUMNAS_CODIGO = ['CODIGO_DISTRITO', 'CÓDIGO_DISTRITO', 'COD_DISTRITO', 'CODIGO_POSTAL', 'CÓDIGO_POSTAL']
+# Grupos de nombres equivalentes que se unifican al juntar varias pestañas
+GRUPOS_COLUMNAS = [COLUMNAS_CANTON, COLUMNAS_LATITUD, COLUMNAS_LONGITUD, COLUMNAS_CODIGO]
+
+
+def safe_get_column(df, candidates):
+    for c in candidates:
+        if c in df.columns:
+            return c
+    return None
+
+
+# ---------------------------
+# Varias pestañas
+# ---------------------------
+def alinear_columnas(df, grupos=GRUPOS_COLUMNAS):
+    """Renombra la variante de cada grupo que trae la pestaña (la de safe_get_column) al primer nombre."""
+    renombrar = {}
+    for candidatas in grupos:
+        col = safe_get_column(df, candidatas)
+        if col is not None and col != candidatas[0]:
+            renombrar[col] = candidatas[0]
+    return df.rename(columns=renombrar)
+
+
+def unir_hojas(hojas):
+    """Concatena las pestañas; una columna con tipos distintos entre pestañas (no numéricos) pasa a texto."""
+    tipos = {}
+    for df in hojas:
+        for col, tipo in df.dtypes.items():
+            tipos.setdefault(col, set()).add(tipo)
+    a_texto = [col for col, t in tipos.items()
+               if len(t) > 1 and not all(pd.api.types.is_numeric_dtype(x) for x in t)]
+    hojas = [df.astype({col: 'str' for col in a_texto if col in df.columns}) for df in hojas]
+    return pd.concat(hojas, ignore_index=True)
+
+
+def cargar_hojas(leer, hojas, normalizar=None, max_hilos=None):
+    """Lee varias pestañas a la vez y las une en un solo DataFrame.
+
+    leer(hoja) -> DataFrame crudo de esa pestaña. Cada pestaña se lee (y se
+    normaliza, si se pasa normalizar) en su propio hilo: la lectura es casi
+    toda espera de red, así que el total tarda lo que la pestaña más lenta.
+    """
+    def cargar(hoja):
+        with etapa(f"hojas.leer.{hoja}") as e:
+            df = leer(hoja)
+            e.filas = len(df)
+        if len(hojas) > 1:
+            df = alinear_columnas(df)
+        if normalizar is not None:
+            with etapa(f"hojas.normalizar.{hoja}", filas=len(df)):
+                df = normalizar(df)
+        return df
+
+    if len(hojas) == 1:
+        return cargar(hojas[0])
+    with ThreadPoolExecutor(max_workers=max_hilos or len(hojas)) as pool:
+        return unir_hojas(list(pool.map(cargar, hojas)))
+
+
+# ---------------------------
+# Normalización
+# ---------------------------
+def normalizar_datos(df, conciliador=None, ubicador=None):
+    """Hoja de appv2.py lista para filtrar: cursos, años, flags, cantón, edad y sexo normalizados."""
+    with etapa("normalizar.fechas", filas=len(df)):
+        # --- CORRECCIÓN 2: Conversión de fechas a texto, solo en columnas con fechas ---
+        df = convertir_fechas(df)
+        # ---------------------------------------------------------
+
+    with etapa("normalizar.tipos", filas=len(df)):
+        # --- MEJORA 3: Carga segura de columnas ---
+        # Normalizaciones y tipos
+        if 'CURSO' in df.columns:
+            df['CURSO'] = df['CURSO'].fillna('').astype(str)
+        else:
+            df['CURSO'] = '' # Asigna un str vacío si la columna no existe
+        df['CURSO_NORMALIZADO'] = df['CURSO'].str.lower().apply(strip_accents).str.strip()
+
+        # AÑO -> Int (si no posible -> NaN)
+        if 'AÑO' in df.columns:
+            df['AÑO'] = pd.to_numeric(df['AÑO'], errors='coerce').astype('Int64')
+        else:
+            df['AÑO'] = pd.NA # Asigna NA si la columna no existe
+        # ----------------------------------------------
+
+        # Flags -> int8 0/1
+        for col in ['CERTIFICADO', 'DESERCION', 'INTERMITENTE']:
+            if col in df.columns:
+                df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0).astype('int8')
+            else:
+                df[col] = np.int8(0)
+
+    with etapa("normalizar.cantones", filas=len(df)):
+        # CANTON_DEF fallback
+        if 'CANTON_DEF' not in df.columns:
+            alt = safe_get_column(df, COLUMNAS_CANTON)
+            if alt is not None:
+                df['CANTON_DEF'] = df[alt].fillna(SIN_DATO).astype(str).str.strip()
+            else:
+                df['CANTON_DEF'] = SIN_DATO
+        else:
+            df['CANTON_DEF'] = df['CANTON_DEF'].fillna(SIN_DATO).astype(str).str.strip()
+
+        # Nombres de cantón tal como están en el geojson (tildes, mayúsculas, alias, errores de tipeo)
+        if conciliador is not None:
+            df['CANTON_DEF'] = conciliador.conciliar(df['CANTON_DEF'])
+
+        # Cantón a partir de coordenadas o código, para las filas que no lo traen
+        if ubicador is not None:
+            df = asignar_cantones(df, ubicador,
+                                  col_lat=safe_get_column(df, COLUMNAS_LATITUD),
+                                  col_lon=safe_get_column(df, COLUMNAS_LONGITUD),
+                                  col_codigo=safe_get_column(df, COLUMNAS_CODIGO))
+
+    with etapa("normalizar.edad_sexo", filas=len(df)):
+        # EDAD y SEXO
+        if 'EDAD' in df.columns:
+            df['EDAD_CLASIFICADA'] = clasificar_edades(df['EDAD'])
+        else:
+            df['EDAD_CLASIFICADA'] = SIN_DATO
+
+        if 'SEXO' in df.columns:
+            df['SEXO_NORMALIZADO'] = normalizar_sexos(df['SEXO'])
+        else:
+            df['SEXO_NORMALIZADO'] = SIN_DATO
+
+    return df
+
+
+def normalizar_datos_estadistica(df, conciliador):
+    """Hoja de estadisticainteractiva.py: curso sin tildes y cantón con el nombre del geojson."""
+    df["CURSO_NORMALIZADO"] = df["CURSO"].str.lower().str.normalize('NFKD') \
+        .str.encode('ascii', errors='ignore').str.decode('utf-8')
+    # Nombres de cantón como en la columna CANTÓN de la geometría, para que el merge del mapa no pierda filas
+    df["CANTON_DEF"] = conciliador.conciliar(df["CANTON_DEF"])
+    return df
+
+
+# ---------------------------
+# Selección de filtros
+# ---------------------------
+def nombres_cursos(cursos, nombres=NOMBRE_AMIGABLE):
+    """Nombre visible de cada curso normalizado (los que no tienen nombre amigable, en título)."""
+    return [nombres.get(c, c.title()) for c in cursos]
+
+
+def cursos_seleccionados(seleccion_display, cursos_disponibles, nombres=NOMBRE_AMIGABLE):
+    """Claves normalizadas de los cursos elegidos por su nombre visible (None = todos)."""
+    if seleccion_display is None:
+        return list(cursos_disponibles)
+    cursos = []
+    # primero keys de nombre_amigable que coincidan
+    for key, friendly in nombres.items():
+        if friendly in seleccion_display:
+            cursos.append(key)
+    # luego las que no están en nombre_amigable
+    for raw, disp in zip(cursos_disponibles, nombres_cursos(cursos_disponibles, nombres)):
+        if disp in seleccion_display and raw not in cursos:
+            cursos.append(raw)
+    return cursos
+
+
+def filas_filtradas(df, indice, filtros):
+    # Las descargas sí necesitan las filas originales
+    return df[indice.mascara(**filtros)]
+
+
+def filtrar_estadisticas(df, cantones, cursos, anios, certificados):
+    """Filas de estadisticainteractiva.py que entran en las tablas y gráficos."""
+    return df[
+        (df["CANTON_DEF"].isin(cantones)) &
+        (df["CURSO_NORMALIZADO"].isin(cursos)) &
+        (df['AÑO'].isin(anios)) &
+        (df['CERTIFICADO'].isin(certificados))
+    ]
+
+
+# ---------------------------
+# Resúmenes
+# ---------------------------
+def preparar_datos_resumen(cubo_local):
+    df_cantonal = sumar(cubo_local, 'CANTON_DEF').reset_index(name='cantidad_beneficiarios')
+    df_detalle = sumar(cubo_local, ['CANTON_DEF', 'CURSO_NORMALIZADO', 'AÑO']).reset_index(name='conteo')
+    return df_cantonal, df_detalle
+
+
+def cantidades_por_canton(df_cantonal, cantones_mapa):
+    """Cantidad por cantón del mapa (0 para los cantones sin beneficiarios con estos filtros)."""
+    return (df_cantonal.set_index('CANTON_DEF')['cantidad_beneficiarios']
+            .reindex(pd.Series(cantones_mapa).dropna().unique(), fill_value=0))
+
+
+def cantones_fuera_del_mapa(df_cantonal, cantidades):
+    """Cantones de la hoja que no se pudieron conciliar con el geojson (sin 'Sin dato')."""
+    return df_cantonal[~df_cantonal['CANTON_DEF'].isin(cantidades.index)
+                       & (df_cantonal['CANTON_DEF'] != SIN_DATO)]
+
+
+def detalle_sin_dato_html(df_detalle, nombres=NOMBRE_AMIGABLE):
+    """Lista HTML por curso y año de las personas sin cantón, o None si no hay detalle."""
+    detalles_sin_dato = df_detalle[df_detalle['CANTON_DEF'] == SIN_DATO]
+    if detalles_sin_dato.empty:
+        return None
+    detalle_html = "<ul>"
+    for _, d in detalles_sin_dato.iterrows():
+        curso = nombres.get(d['CURSO_NORMALIZADO'], d['CURSO_NORMALIZADO'].title())
+        detalle_html += f"<li>{curso} ({int(d['AÑO']) if not pd.isna(d['AÑO']) else 'ND'}): {d['conteo']} personas</li>"
+    detalle_html += "</ul>"
+    return detalle_html
+
+
+def resumen_filas(df, por):
+    """resumen_certificacion() sobre las filas de la hoja (sin pasar por el cubo)."""
+    return resumen_certificacion(df[[por, 'CERTIFICADO']].assign(conteo=1), por)
@@ -0,0 +1,63 @@
+import pandas as pd
+
+# ---------------------------
+# Popups por cantón (estadisticainteractiva.py)
+# ---------------------------
+# Antes se filtraba df_detalle una vez por cantón y se armaba el HTML fila por
+# fila. Aquí se arma el de todos los cantones en una sola pasada agrupada.
+
+SIN_DETALLE = "<i>Sin datos disponibles</i>"
+
+
+def detalles_por_canton(df_detalle, nombres):
+    """{cantón: '<ul><li>Curso (año): n personas</li>...</ul>'} a partir del conteo por cantón, curso y año."""
+    if df_detalle.empty:
+        return {}
+    cursos = df_detalle['CURSO_NORMALIZADO']
+    etiquetas = cursos.map(nombres).fillna(cursos.str.title())
+    items = ('<li>' + etiquetas + ' (' + df_detalle['AÑO'].astype(int).astype(str) + '): '
+             + df_detalle['conteo'].astype(str) + ' personas</li>')
+    return ('<ul>' + items.groupby(df_detalle['CANTON_DEF'], sort=False).agg(''.join) + '</ul>').to_dict()
+
+
+def popup_canton(canton, cantidad, detalle_html):
+    return f"""
+        <strong>Cantón:</strong> {canton}<br>
+        <strong>Total de beneficiarios:</strong> {int(cantidad) if not pd.isnull(cantidad) else '0'}<br>
+        <strong>Detalle:</strong> {detalle_html}
+    """
+
+
+def color_por_cantidad(cantidad):
+    if pd.isnull(cantidad):
+        return 'gray'
+    elif cantidad == 0:
+        return 'green'
+    elif cantidad < 20:
+        return 'orange'
+    else:
+        return 'red'
+
+
+def datos_mapa(df, cantones_mapa, cursos, anios, nombres):
+    """Color y popup de cada cantón del mapa (índice de cantones_mapa) para la selección.
+
+    Una sola pasada agrupada sobre df: cantidades por cantón y detalle por
+    cantón, curso y año.
+    """
+    df_filtrado = df[
+        (df["CURSO_NORMALIZADO"].isin(cursos)) &
+        (df['AÑO'].isin(anios))
+    ]
+    cantidades = df_filtrado.groupby('CANTON_DEF').size()
+
+    # Agrupar por cantón, curso y año para mostrar detalles en el mapa
+    df_detalle = df_filtrado.groupby(['CANTON_DEF', 'CURSO_NORMALIZADO', 'AÑO']).size().reset_index(name='conteo')
+    detalles = detalles_por_canton(df_detalle, nombres)
+
+    cantidad = cantones_mapa.map(cantidades)
+    return pd.DataFrame({
+        'color': cantidad.map(color_por_cantidad),
+        'popup': [popup_canton(canton, n, detalles.get(canton, SIN_DETALLE))
+                  for canton, n in zip(cantones_mapa, cantidad)],
+    }, index=cantones_mapa.index)
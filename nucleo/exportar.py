@@ -0,0 +1,113 @@
+import os
+
+import pandas as pd
+
+from nucleo.bloqueo import bloqueo_archivo
+from nucleo.snapshot import compatible_con_arrow
+from nucleo.tiempos import etapa
+
+# ---------------------------
+# Exportación de los datos filtrados (Excel, CSV, Parquet)
+# ---------------------------
+# Los archivos se generan solo cuando alguien los pide y quedan en disco bajo
+# una clave hecha con la versión del snapshot y la selección de filtros, así
+# que no hace falta hashear el DataFrame para saber si ya existe (la clave
+# sale de clave_filtros(), en nucleo/memo.py). El Excel se escribe por bloques
+# con el modo constant_memory de xlsxwriter: cada fila se vuelca al disco
+# apenas se escribe, en lugar de tener todo el libro en memoria.
+# xlsxwriter y pyarrow.parquet se importan recién al exportar en ese formato.
+
+FILAS_POR_BLOQUE = 20_000
+# Archivos que se conservan en el directorio de exportaciones (se borran los más viejos)
+MAX_ARCHIVOS = 40
+# Nombre del bloqueo del directorio de exportaciones ('<directorio>/exportaciones.lock')
+BLOQUEO = "exportaciones"
+
+
+def escribir_excel(df, destino, hoja="DatosFiltrados"):
+    """Como df.to_excel(destino, index=False, sheet_name=hoja), en memoria constante."""
+    import xlsxwriter
+    libro = xlsxwriter.Workbook(destino, {"constant_memory": True, "nan_inf_to_errors": True})
+    try:
+        hoja_excel = libro.add_worksheet(hoja)
+        encabezado = libro.add_format({"bold": True, "border": 1, "align": "center", "valign": "top"})
+        hoja_excel.write_row(0, 0, [str(c) for c in df.columns], encabezado)
+        fila = 1
+        for inicio in range(0, len(df), FILAS_POR_BLOQUE):
+            bloque = df.iloc[inicio:inicio + FILAS_POR_BLOQUE]
+            for col in bloque.columns[[pd.api.types.is_datetime64_any_dtype(t) for t in bloque.dtypes]]:
+                bloque = bloque.assign(**{col: bloque[col].dt.strftime("%Y-%m-%d %H:%M:%S")})
+            # Los nulos (NaN, None, pd.NA) quedan como celdas vacías, igual que con to_excel
+            valores = bloque.astype(object).where(bloque.notna(), None).to_numpy().tolist()
+            for valores_fila in valores:
+                hoja_excel.write_row(fila, 0, valores_fila)
+                fila += 1
+    finally:
+        libro.close()
+
+
+def escribir_csv(df, destino):
+    df.to_csv(destino, index=False, chunksize=FILAS_POR_BLOQUE)
+
+
+def escribir_parquet(df, destino):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    pq.write_table(pa.Table.from_pandas(compatible_con_arrow(df), preserve_index=False), destino)
+
+
+# formato -> (tipo MIME, función que escribe el archivo)
+FORMATOS = {
+    "xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", escribir_excel),
+    "csv": ("text/csv", escribir_csv),
+    "parquet": ("application/vnd.apache.parquet", escribir_parquet),
+}
+
+
+def limpiar(directorio, maximo=MAX_ARCHIVOS):
+    # Se llama con el bloqueo del directorio tomado (ver exportar)
+    archivos = []
+    for nombre in os.listdir(directorio):
+        ruta = os.path.join(directorio, nombre)
+        if nombre.endswith(".lock"):
+            if nombre != f"{BLOQUEO}.lock":  # bloqueos por archivo de versiones anteriores
+                _borrar(ruta)
+        elif not nombre.endswith(".tmp"):
+            archivos.append(ruta)
+    archivos.sort(key=os.path.getmtime, reverse=True)
+    for ruta in archivos[maximo:]:
+        _borrar(ruta)
+
+
+def _borrar(ruta):
+    try:
+        os.remove(ruta)
+    except OSError:
+        pass
+
+
+def exportar(obtener_df, formato, directorio, clave):
+    """Archivo exportado, abierto en modo 'rb'; obtener_df() solo se llama si no existe todavía.
+
+    Se entrega abierto y no la ruta: limpiar() puede borrarlo desde otra sesión
+    en cualquier momento, pero un archivo ya abierto se sigue pudiendo leer.
+    """
+    ruta = os.path.join(directorio, f"{clave}.{formato}")
+    try:
+        return open(ruta, "rb")
+    except FileNotFoundError:
+        pass
+    # Un solo bloqueo para todo el directorio: generar, limpiar y abrir no se
+    # cruzan con el limpiar() de otra sesión o proceso
+    with bloqueo_archivo(os.path.join(directorio, BLOQUEO)):
+        # Otra sesión o proceso pudo generarlo mientras se esperaba el bloqueo
+        if not os.path.exists(ruta):
+            temporal = f"{ruta}.{os.getpid()}.tmp"
+            with etapa(f"exportar.{formato}") as e:
+                df = obtener_df()
+                FORMATOS[formato][1](df, temporal)
+                e.filas, e.bytes = len(df), os.path.getsize(temporal)
+            os.replace(temporal, ruta)
+        archivo = open(ruta, "rb")
+        limpiar(directorio)
+    return archivo
@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import shapely
+
+# ---------------------------
+# Asignación de cantón a filas sin CANTON_DEF
+# ---------------------------
+# Las filas sin cantón caen en 'Sin dato' y quedan fuera del mapa. Si la fila
+# trae coordenadas (WGS84) se busca el polígono que las contiene con un
+# STRtree armado una sola vez (el árbol descarta por caja y la prueba exacta
+# se hace con los polígonos preparados); si trae un código de distrito o postal
+# (PCCDD: provincia, cantón, distrito) se usan sus tres primeros dígitos, que
+# son el código del cantón. Todas las búsquedas se hacen en bloque.
+
+SIN_DATO = 'Sin dato'
+
+
+class UbicadorCantones:
+    def __init__(self, gdf, columna, columna_codigo=None, codigos=None):
+        # gdf en EPSG:4326 (el de nucleo.geometria); columna: nombre del cantón como en CANTON_DEF.
+        # codigos: {código de cantón: nombre} aparte, para cuando la geometría no trae columna_codigo
+        # (ver nucleo.geometria.codigos_cantones)
+        gdf = gdf[gdf.geometry.notna() & ~gdf.geometry.is_empty]
+        self.nombres = gdf[columna].to_numpy(dtype=object)
+        self.poligonos = np.asarray(gdf.geometry.values)
+        shapely.prepare(self.poligonos)
+        self.arbol = shapely.STRtree(self.poligonos)
+        self.codigos = dict(codigos or {})
+        if columna_codigo is not None and columna_codigo in gdf.columns:
+            codigos = pd.to_numeric(gdf[columna_codigo], errors='coerce')
+            self.codigos.update((int(c), n) for c, n in zip(codigos, gdf[columna]) if not pd.isna(c))
+
+    def por_coordenadas(self, lon, lat):
+        """Cantón que contiene cada punto, o None si no hay coordenadas o caen fuera."""
+        lon = pd.to_numeric(pd.Series(lon), errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+        lat = pd.to_numeric(pd.Series(lat), errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+        resultado = np.full(len(lon), None, dtype=object)
+        validos = np.flatnonzero(np.isfinite(lon) & np.isfinite(lat))
+        if len(validos) == 0:
+            return resultado
+        x, y = lon[validos], lat[validos]
+        # query(predicate=...) no aprovecha que los polígonos estén preparados: se filtra por
+        # caja y luego se prueba cada par (punto, polígono candidato) con intersects_xy
+        i_punto, i_poligono = self.arbol.query(shapely.points(x, y))
+        dentro = shapely.intersects_xy(self.poligonos[i_poligono], x[i_punto], y[i_punto])
+        i_punto, i_poligono = i_punto[dentro], i_poligono[dentro]
+        # Un punto sobre un borde compartido toca dos cantones: se queda con el primero
+        _, primeros = np.unique(i_punto, return_index=True)
+        resultado[validos[i_punto[primeros]]] = self.nombres[i_poligono[primeros]]
+        return resultado
+
+    def por_codigo(self, codigos):
+        """Cantón para códigos de distrito/postales de 5 dígitos o de cantón de 3, o None."""
+        numeros = pd.to_numeric(pd.Series(codigos), errors='coerce')
+        nombres = numeros.where(numeros < 1000, numeros // 100).map(self.codigos)
+        return nombres.astype(object).where(nombres.notna(), None).to_numpy()
+
+
+def asignar_cantones(df, ubicador, col_lat=None, col_lon=None, col_codigo=None):
+    """Completa CANTON_DEF (en el mismo df) en las filas 'Sin dato' con coordenadas y, si no alcanzan, el código."""
+    faltantes = np.flatnonzero(df['CANTON_DEF'].to_numpy() == SIN_DATO)
+    if len(faltantes) == 0:
+        return df
+    asignados = np.full(len(faltantes), None, dtype=object)
+    if col_lat is not None and col_lon is not None:
+        asignados = ubicador.por_coordenadas(df[col_lon].iloc[faltantes], df[col_lat].iloc[faltantes])
+    if col_codigo is not None:
+        pendientes = pd.isna(asignados)
+        if pendientes.any():
+            asignados[pendientes] = ubicador.por_codigo(df[col_codigo].iloc[faltantes[pendientes]])
+    encontrados = ~pd.isna(asignados)
+    if encontrados.any():
+        columna = df.columns.get_loc('CANTON_DEF')
+        df.iloc[faltantes[encontrados], columna] = asignados[encontrados]
+    return df
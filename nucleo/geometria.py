@@ -0,0 +1,257 @@
+import logging
+import os
+import sys
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+
+from nucleo.bloqueo import bloqueo_archivo
+
+# ---------------------------
+# Caché de geometrías preparadas y simplificadas
+# ---------------------------
+# El GeoJSON cantonal original pesa varios MB y se serializaba completo en
+# cada rerun. Aquí se prepara una sola vez (geometrías válidas, EPSG:4326 y
+# solo las columnas que usan las apps, con nombres fijos), se simplifica
+# (preservando los bordes compartidos entre cantones) y se cuantiza, y el
+# resultado se guarda como GeoParquet junto al archivo fuente. Las réplicas
+# del nodo comparten ese archivo: solo una lo construye y las demás lo leen.
+# Si una fuente no se puede preparar queda una marca con el error en la misma
+# carpeta, y ningún proceso vuelve a leerla hasta que el archivo cambie.
+
+logger = logging.getLogger(__name__)
+
+CRS_MAPA = "EPSG:4326"
+CRS_METRICO = "EPSG:5367"  # CRTM05, para simplificar con tolerancias en metros
+
+# nivel -> (tolerancia en metros, decimales de las coordenadas); None = sin tocar
+NIVELES = {
+    "baja": (1000, 3),   # vista nacional (zoom <= 7)
+    "media": (250, 4),   # vista por defecto del mapa (zoom 8-9)
+    "alta": (50, 5),     # acercamientos a nivel de cantón (zoom >= 10)
+    "completa": (None, None),  # solo preparada, con la geometría original
+}
+
+# Versión de la preparación: cambiarla invalida las cachés ya construidas
+VERSION = 2
+
+# Columnas de la caché -> cómo se llaman en las fuentes conocidas
+# (limitecantonal_5k del IGN y costaricacantonesv10 de GADM)
+COLUMNAS = {
+    "CANTÓN": ["CANTÓN", "NAME_2"],
+    "CÓDIGO_CANTÓN": ["CÓDIGO_CANTÓN"],
+    "PROVINCIA": ["PROVINCIA", "NAME_1"],
+}
+# Columna con la geometría en WKT de las exportaciones desde una hoja de cálculo
+COLUMNA_WKT = "SHAPE"
+# Una celda de Excel guarda como máximo 32767 caracteres: un WKT de ese largo está cortado
+LARGO_CELDA_EXCEL = 32767
+
+DIRECTORIO_CACHE = "cache_geometria"
+
+
+class GeometriaIncompleta(ValueError):
+    """La fuente no trae una geometría utilizable para algunos cantones."""
+
+
+def ruta_cache(ruta_fuente, nivel):
+    base = os.path.splitext(os.path.basename(ruta_fuente))[0]
+    directorio = os.path.join(os.path.dirname(ruta_fuente), DIRECTORIO_CACHE)
+    return os.path.join(directorio, f"{base}_{nivel}_v{VERSION}.parquet")
+
+
+# ---------------------------
+# Preparación
+# ---------------------------
+def geometrias_desde_wkt(gdf, crs):
+    """Geometrías de la columna SHAPE (WKT); falla si alguna no se puede leer."""
+    textos = gdf[COLUMNA_WKT]
+    geometrias = shapely.from_wkt(textos.to_numpy(dtype=object), on_invalid="ignore")
+    faltantes = pd.isna(geometrias) & textos.notna().to_numpy()
+    if faltantes.any():
+        cortados = int((textos[faltantes].str.len() == LARGO_CELDA_EXCEL).sum())
+        nombres = ", ".join(map(str, columnas_preparadas(gdf[faltantes])["CANTÓN"].head(5)))
+        raise GeometriaIncompleta(
+            f"{int(faltantes.sum())} de {len(gdf)} geometrías WKT no se pueden leer ({nombres}...)"
+            + (f"; {cortados} tienen exactamente {LARGO_CELDA_EXCEL} caracteres, el máximo de una "
+               "celda de Excel, así que el texto quedó cortado al exportar" if cortados else ""))
+    return gpd.GeoSeries(geometrias, index=gdf.index, crs=crs)
+
+
+def solo_poligonos(geometrias):
+    """make_valid() para las geometrías inválidas, conservando solo la parte poligonal."""
+    geometrias = np.asarray(geometrias, dtype=object).copy()
+    invalidas = np.flatnonzero(~shapely.is_valid(geometrias) & ~pd.isna(geometrias))
+    if len(invalidas):
+        logger.info("Reparando %d geometrías inválidas", len(invalidas))
+        reparadas = shapely.make_valid(geometrias[invalidas])
+        for i, geometria in zip(invalidas, reparadas):
+            if shapely.get_type_id(geometria) == 7:  # GeometryCollection: se descartan líneas y puntos
+                partes = shapely.get_parts(geometria)
+                geometria = shapely.union_all(partes[np.isin(shapely.get_type_id(partes), (3, 6))])
+            geometrias[i] = geometria
+    return geometrias
+
+
+def columnas_preparadas(gdf):
+    """Columnas de COLUMNAS que se encuentran en gdf, con su nombre fijo."""
+    datos = {}
+    for destino, candidatas in COLUMNAS.items():
+        origen = next((c for c in candidatas if c in gdf.columns), None)
+        if origen is not None:
+            datos[destino] = gdf[origen].to_numpy()
+    return pd.DataFrame(datos, index=gdf.index)
+
+
+def preparar(ruta_fuente, crs_wkt=CRS_METRICO):
+    """Lee la fuente y devuelve solo cantón, código, provincia y geometría válida en EPSG:4326.
+
+    Si las features no traen geometría pero sí una columna SHAPE con WKT (como
+    limitecantonal_5k.geojson, exportado desde una hoja), se usa esa columna,
+    que viene en crs_wkt.
+    """
+    gdf = gpd.read_file(ruta_fuente)
+    if gdf.geometry.isna().all() and COLUMNA_WKT in gdf.columns:
+        geometria = geometrias_desde_wkt(gdf, crs_wkt)
+    else:
+        geometria = gdf.geometry if gdf.crs is not None else gdf.geometry.set_crs(CRS_MAPA)
+    if "CANTÓN" not in columnas_preparadas(gdf.head(0)).columns:
+        raise GeometriaIncompleta(f"{ruta_fuente} no tiene ninguna columna de nombre de cantón "
+                                  f"({', '.join(COLUMNAS['CANTÓN'])})")
+    geometria = gpd.GeoSeries(solo_poligonos(geometria.values), index=gdf.index, crs=geometria.crs)
+    if geometria.crs != CRS_MAPA:
+        geometria = geometria.to_crs(CRS_MAPA)
+    vacias = geometria.isna() | geometria.is_empty
+    if vacias.any():
+        raise GeometriaIncompleta(f"{int(vacias.sum())} de {len(gdf)} features de {ruta_fuente} no tienen geometría")
+    return gpd.GeoDataFrame(columnas_preparadas(gdf), geometry=geometria)
+
+
+def simplificar(gdf, nivel):
+    """Simplifica todas las geometrías como una cobertura y cuantiza las coordenadas."""
+    tolerancia, decimales = NIVELES[nivel]
+    if tolerancia is None:
+        return gdf
+    metrico = gdf.to_crs(CRS_METRICO)
+    # coverage_simplify mueve los bordes compartidos de forma idéntica en ambos
+    # polígonos, así no aparecen huecos ni traslapes entre cantones vecinos.
+    geometrias = shapely.coverage_simplify(metrico.geometry.values, tolerancia)
+    simplificado = gpd.GeoDataFrame(gdf.drop(columns="geometry"),
+                                    geometry=gpd.GeoSeries(geometrias, index=gdf.index, crs=CRS_METRICO).to_crs(CRS_MAPA))
+    # 'pointwise' redondea cada vértice sin reconstruir la geometría, de modo que
+    # los vértices compartidos siguen coincidiendo exactamente.
+    simplificado.geometry = shapely.set_precision(simplificado.geometry.values, 10 ** -decimales, mode="pointwise")
+    return simplificado
+
+
+def construir_cache(ruta_fuente, niveles=None):
+    gdf = preparar(ruta_fuente)
+    rutas = {}
+    for nivel in niveles or NIVELES:
+        destino = ruta_cache(ruta_fuente, nivel)
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        # Se escribe aparte y se reemplaza de una vez: otro proceso puede estar leyéndolo
+        temporal = f"{destino}.{os.getpid()}.tmp"
+        simplificar(gdf, nivel).to_parquet(temporal)
+        os.replace(temporal, destino)
+        rutas[nivel] = destino
+    return rutas
+
+
+def cache_vigente(ruta_fuente, nivel):
+    destino = ruta_cache(ruta_fuente, nivel)
+    return os.path.exists(destino) and os.path.getmtime(destino) >= os.path.getmtime(ruta_fuente)
+
+
+def cargar_geometria_cacheada(ruta_fuente, nivel="media"):
+    """Devuelve el GeoDataFrame preparado y simplificado; lo construye si falta o está desactualizado."""
+    if not cache_vigente(ruta_fuente, nivel):
+        with bloqueo_archivo(ruta_cache(ruta_fuente, nivel)):
+            # Otro proceso pudo construirlo mientras se esperaba el bloqueo
+            if not cache_vigente(ruta_fuente, nivel):
+                construir_cache(ruta_fuente, niveles=[nivel])
+    return gpd.read_parquet(ruta_cache(ruta_fuente, nivel))
+
+
+def ruta_fallo(ruta_fuente):
+    base = os.path.splitext(os.path.basename(ruta_fuente))[0]
+    return os.path.join(os.path.dirname(ruta_fuente), DIRECTORIO_CACHE, f"{base}_fallida_v{VERSION}.txt")
+
+
+def fallo_registrado(ruta_fuente):
+    """Error con que falló la preparación de la versión actual de la fuente, o None."""
+    marca = ruta_fallo(ruta_fuente)
+    try:
+        if os.path.getmtime(marca) >= os.path.getmtime(ruta_fuente):
+            with open(marca, encoding="utf-8") as f:
+                return f.read()
+    except OSError:
+        pass
+    return None
+
+
+def registrar_fallo(ruta_fuente, error):
+    # Marca junto a la caché: los demás procesos (y los que arranquen después) no
+    # vuelven a leer la fuente hasta que cambie su mtime o VERSION
+    marca = ruta_fallo(ruta_fuente)
+    try:
+        os.makedirs(os.path.dirname(marca), exist_ok=True)
+        temporal = f"{marca}.{os.getpid()}.tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            f.write(str(error))
+        os.replace(temporal, marca)
+    except OSError as e:
+        logger.warning("No se pudo registrar el fallo de %s: %s", ruta_fuente, e)
+
+
+def cargar_primera_geometria(rutas, nivel="media"):
+    """Como cargar_geometria_cacheada() con la primera fuente de 'rutas' que se pueda preparar."""
+    errores = []
+    for ruta in rutas:
+        if not os.path.exists(ruta):
+            errores.append(f"{ruta} no existe")
+            continue
+        fallo = fallo_registrado(ruta)
+        if fallo is not None:
+            errores.append(fallo)
+            continue
+        try:
+            return cargar_geometria_cacheada(ruta, nivel)
+        except (OSError, ValueError) as e:
+            logger.warning("No se pudo usar %s como geometría de los cantones: %s", ruta, e)
+            # Un error al leer el archivo puede ser pasajero; una geometría inválida no
+            if isinstance(e, ValueError):
+                registrar_fallo(ruta, e)
+            errores.append(str(e))
+    raise GeometriaIncompleta("; ".join(errores) or "no hay fuentes de geometría")
+
+
+def codigos_cantones(rutas):
+    """{código de cantón (PCC): nombre} de la primera fuente de 'rutas' que trae los dos.
+
+    Lee solo las propiedades, sin la geometría: limitecantonal_5k.geojson trae
+    CÓDIGO_CANTÓN y CANTÓN intactos aunque sus polígonos no se puedan preparar.
+    """
+    candidatas = [c for destino in ("CANTÓN", "CÓDIGO_CANTÓN") for c in COLUMNAS[destino]]
+    for ruta in filter(os.path.exists, rutas):
+        try:
+            propiedades = columnas_preparadas(gpd.read_file(ruta, columns=candidatas, ignore_geometry=True))
+        except (OSError, ValueError) as e:
+            logger.warning("No se pudieron leer los códigos de cantón de %s: %s", ruta, e)
+            continue
+        if {"CANTÓN", "CÓDIGO_CANTÓN"} <= set(propiedades.columns):
+            codigos = pd.to_numeric(propiedades["CÓDIGO_CANTÓN"], errors="coerce")
+            return {int(c): n for c, n in zip(codigos, propiedades["CANTÓN"]) if not pd.isna(c) and not pd.isna(n)}
+    return {}
+
+
+if __name__ == "__main__":
+    # Uso: python -m nucleo.geometria <archivo.geojson> [...]
+    for ruta in sys.argv[1:]:
+        try:
+            for nivel, destino in construir_cache(ruta).items():
+                print(f"{ruta} [{nivel}] -> {destino}")
+        except GeometriaIncompleta as e:
+            print(f"{ruta}: {e}", file=sys.stderr)
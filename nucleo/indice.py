@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+
+# ---------------------------
+# Índice de bitmaps para filtrar la hoja por filas
+# ---------------------------
+# Cada valor de cada columna de filtro guarda un bitmap empaquetado (1 bit por
+# fila). Filtrar es un OR de los bitmaps de los valores seleccionados por
+# columna y un AND entre columnas, sin comparar strings en cada rerun.
+
+COLUMNAS = ['CURSO_NORMALIZADO', 'AÑO', 'CANTON_DEF', 'EDAD_CLASIFICADA', 'SEXO_NORMALIZADO']
+FLAGS = ['CERTIFICADO', 'DESERCION', 'INTERMITENTE']
+
+
+class IndiceFiltros:
+    def __init__(self, df):
+        self.n = len(df)
+        self.bitmaps = {}
+        for col in COLUMNAS:
+            # Los nulos quedan con código -1 y no entran en ningún bitmap, igual que con isin()
+            codigos, valores = pd.factorize(df[col])
+            self.bitmaps[col] = {valor: np.packbits(codigos == i) for i, valor in enumerate(valores.tolist())}
+        for col in FLAGS:
+            self.bitmaps[col] = {1: np.packbits(df[col].to_numpy() == 1)}
+
+    def nbytes(self):
+        return sum(b.nbytes for porvalor in self.bitmaps.values() for b in porvalor.values())
+
+    def _vacio(self):
+        return np.zeros((self.n + 7) // 8, dtype=np.uint8)
+
+    def _union(self, col, valores):
+        resultado = self._vacio()
+        bitmaps = self.bitmaps[col]
+        for valor in valores:
+            bitmap = bitmaps.get(valor)
+            if bitmap is not None:
+                np.bitwise_or(resultado, bitmap, out=resultado)
+        return resultado
+
+    def mascara(self, cursos, anios, cantones, flags, edades, sexos):
+        """Misma semántica que nucleo.cubo.construir_mascara, pero devuelve un array bool."""
+        resultado = np.full((self.n + 7) // 8, 0xFF, dtype=np.uint8)
+        for col, seleccion in (('CURSO_NORMALIZADO', cursos), ('AÑO', anios), ('CANTON_DEF', cantones),
+                               ('EDAD_CLASIFICADA', edades), ('SEXO_NORMALIZADO', sexos)):
+            if len(seleccion) > 0:
+                np.bitwise_and(resultado, self._union(col, seleccion), out=resultado)
+        if flags is not None:
+            mask_flag = self._vacio()
+            for col in flags:
+                np.bitwise_or(mask_flag, self.bitmaps[col][1], out=mask_flag)
+            np.bitwise_and(resultado, mask_flag, out=resultado)
+        return np.unpackbits(resultado, count=self.n).astype(bool)
@@ -0,0 +1,241 @@
+import hashlib
+import json
+import os
+
+import folium
+import numpy as np
+from branca.element import MacroElement
+from jinja2 import Template
+
+# ---------------------------
+# Mapa dinámico: geometría estática + valores por filtro
+# ---------------------------
+# La geometría de los cantones se publica una sola vez como archivo estático,
+# uno por nivel de simplificación (el navegador descarga el del zoom actual y
+# lo guarda en caché). En cada rerun solo viaja un
+# diccionario {cantón: cantidad} con los cortes de la escala, y el navegador
+# vuelve a pintar la capa que ya tiene cargada.
+
+NOMBRE_CAPA = "Cantones"
+
+COLOR_CERO = '#ece7f2'
+COLOR_NO_SELECCIONADO = '#D3D3D3'
+COLORES_ESCALA = ['#a6bddb', '#74a9cf', '#3690c0', '#0570b0', '#034e7b']
+
+
+def escala_beneficiarios(cantidades, colores=COLORES_ESCALA):
+    """(pasos, colores, máximo) de la escala logarítmica a partir de las cantidades por cantón."""
+    max_beneficiarios = int(cantidades.max() or 0) if len(cantidades) else 0
+    if max_beneficiarios < 10:
+        max_beneficiarios = 10
+    colores_escala = list(colores)
+
+    try:
+        pasos = np.logspace(start=0, stop=np.log10(max_beneficiarios), num=6)
+        pasos = [int(round(p)) for p in pasos]
+        pasos = sorted(list(set(pasos)))
+        if not pasos: # Asegurarse de que 'pasos' no esté vacío
+            pasos = [1, 10]
+        num_colores_necesarios = max(1, len(pasos) - 1)
+
+        # Asegurarse de tener suficientes colores o repetir el último
+        if num_colores_necesarios > len(colores_escala):
+            colores_escala.extend([colores_escala[-1]] * (num_colores_necesarios - len(colores_escala)))
+        else:
+            colores_escala = colores_escala[:num_colores_necesarios]
+
+    except Exception:
+        pasos = [1, 10]
+        colores_escala = [colores_escala[0]]
+
+    # Asegurarse de que el índice tenga al menos vmin y un paso más
+    if len(pasos) < 2:
+        pasos = [1, max(2, max_beneficiarios)]
+        colores_escala = [colores_escala[0]]
+    return pasos, colores_escala, max_beneficiarios
+
+
+def estilos_cantones(cantones, cantidades, pasos, colores, cantones_seleccionados=None,
+                     color_cero=COLOR_CERO, color_no_seleccionado=COLOR_NO_SELECCIONADO):
+    """Estilo Leaflet de cada cantón, calculado de una vez para todos.
+
+    El tramo de la escala sale de np.digitize sobre los pasos (los mismos cortes
+    que branca.colormap.StepColormap); cantones_seleccionados=None significa todos.
+    """
+    cantidades = np.asarray(cantidades)
+    tramos = np.clip(np.digitize(cantidades, pasos) - 1, 0, len(colores) - 1)
+    relleno = np.asarray(colores, dtype=object)[tramos]
+    relleno[cantidades == 0] = color_cero
+    opacidad = np.full(len(cantidades), 0.7)
+    # Lógica para cantones no seleccionados
+    if cantones_seleccionados is not None:
+        seleccionados = set(cantones_seleccionados)
+        fuera = np.fromiter((c not in seleccionados for c in cantones), dtype=bool, count=len(cantidades))
+        relleno[fuera] = color_no_seleccionado
+        opacidad[fuera] = 0.25
+    return [{'fillColor': c, 'color': 'black', 'weight': 1, 'fillOpacity': o}
+            for c, o in zip(relleno.tolist(), opacidad.tolist())]
+
+
+def geojson_clasico(gdf, df_cantonal, columna):
+    """GeoDataFrame del mapa completo: geometría, nombre y 'cantidad_color' como int nativo.
+
+    folium.GeoJson serializa todas las columnas, y los tipos de numpy (int64)
+    no son serializables; por eso solo quedan estas tres, con ints de Python.
+    Sin style_function, folium pinta cada feature con su propiedad 'style'
+    (ver estilos_cantones()).
+    """
+    gdf_merged = gdf.merge(df_cantonal, how="left", left_on=columna, right_on="CANTON_DEF")
+    gdf_merged['cantidad_color'] = gdf_merged['cantidad_beneficiarios'].fillna(0).astype(int).apply(int)
+    # Sin columnas duplicadas si columna == 'CANTON_DEF'
+    columnas = list(dict.fromkeys(['geometry', columna, 'cantidad_color']))
+    return gdf_merged[columnas]
+
+
+def publicar_geometria(gdf, columna, directorio="static"):
+    """Escribe la geometría (solo nombre + polígonos) en un archivo con hash en el nombre."""
+    contenido = json.dumps(gdf[[columna, "geometry"]].__geo_interface__, separators=(",", ":"))
+    digest = hashlib.sha1(contenido.encode("utf-8")).hexdigest()[:12]
+    nombre = f"cantones_{digest}.geojson"
+    destino = os.path.join(directorio, nombre)
+    if not os.path.exists(destino):
+        os.makedirs(directorio, exist_ok=True)
+        with open(destino, "w", encoding="utf-8") as f:
+            f.write(contenido)
+    return nombre
+
+
+class CapaCantonesEstatica(MacroElement):
+    """Capa GeoJSON que se descarga desde una URL y se pinta con window.estiloCantones.
+
+    niveles: [(url, zoom máximo), ...] de la geometría menos detallada a la más
+    detallada (None = sin tope). Al cambiar el zoom se muestra la del nivel
+    que corresponde; cada una se descarga la primera vez que hace falta.
+    """
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+            window.mapaCantones = {{ this._parent.get_name() }};
+            window.capasCantones = {};
+            window.aplicarEstiloCantones = function() {
+                var capa = window.capaCantones, estilo = window.estiloCantones;
+                if (!capa || !estilo) { return; }
+                var colorPorCantidad = function(n) {
+                    var pasos = estilo.pasos, colores = estilo.colores;
+                    if (n <= pasos[0]) { return colores[0]; }
+                    if (n >= pasos[pasos.length - 1]) { return colores[colores.length - 1]; }
+                    var i = 0;
+                    while (i < pasos.length && pasos[i] <= n) { i++; }
+                    return colores[i - 1];
+                };
+                capa.setStyle(function(feature) {
+                    var canton = feature.properties[estilo.columna];
+                    var cantidad = estilo.valores[canton] || 0;
+                    if (estilo.no_seleccionados.indexOf(canton) >= 0) {
+                        return {fillColor: estilo.color_no_seleccionado, color: 'black', weight: 1, fillOpacity: 0.25};
+                    }
+                    return {fillColor: cantidad === 0 ? estilo.color_cero : colorPorCantidad(cantidad),
+                            color: 'black', weight: 1, fillOpacity: 0.7};
+                });
+                if (window.leyendaCantones) { window.mapaCantones.removeControl(window.leyendaCantones); }
+                window.leyendaCantones = L.control({position: 'topright'});
+                window.leyendaCantones.onAdd = function() {
+                    var div = L.DomUtil.create('div');
+                    div.style.cssText = 'background: white; padding: 6px 8px; font: 12px sans-serif;';
+                    var html = '<strong>' + estilo.titulo + '</strong><br>';
+                    for (var i = 0; i < estilo.colores.length; i++) {
+                        html += '<i style="display:inline-block;width:12px;height:12px;background:' + estilo.colores[i] + '"></i> '
+                              + estilo.pasos[i] + ' – ' + estilo.pasos[i + 1] + '<br>';
+                    }
+                    div.innerHTML = html;
+                    return div;
+                };
+                window.leyendaCantones.addTo(window.mapaCantones);
+            };
+            var niveles = {{ this.niveles|tojson }};
+            var crearCapa = function(datos) {
+                return L.geoJson(datos, {
+                    onEachFeature: function(feature, layer) {
+                        layer.bindTooltip(function() {
+                            var estilo = window.estiloCantones || {valores: {}};
+                            var canton = feature.properties[{{ this.columna|tojson }}];
+                            return '<strong>Cantón</strong> ' + canton + '<br><strong>Beneficiarios</strong> '
+                                 + (estilo.valores[canton] || 0).toLocaleString();
+                        });
+                    }
+                });
+            };
+            var mostrarNivel = function() {
+                var zoom = window.mapaCantones.getZoom(), url = niveles[niveles.length - 1][0];
+                for (var i = 0; i < niveles.length; i++) {
+                    if (niveles[i][1] === null || zoom <= niveles[i][1]) { url = niveles[i][0]; break; }
+                }
+                if (window.urlCantones === url) { return; }
+                window.urlCantones = url;
+                var usar = function(capa) {
+                    // Si el zoom cambió otra vez mientras se descargaba, ya se pidió otro nivel
+                    if (window.urlCantones !== url) { return; }
+                    if (window.capaCantones) { window.mapaCantones.removeLayer(window.capaCantones); }
+                    window.capaCantones = capa.addTo(window.mapaCantones);
+                    window.aplicarEstiloCantones();
+                };
+                if (window.capasCantones[url]) { usar(window.capasCantones[url]); return; }
+                fetch(url)
+                    .then(function(respuesta) { return respuesta.json(); })
+                    .then(function(datos) {
+                        window.capasCantones[url] = crearCapa(datos);
+                        usar(window.capasCantones[url]);
+                    });
+            };
+            window.mapaCantones.on('zoomend', mostrarNivel);
+            mostrarNivel();
+        {% endmacro %}
+    """)
+
+    def __init__(self, niveles, columna):
+        super().__init__()
+        self._name = "CapaCantonesEstatica"
+        self.niveles = [[url, zoom_maximo] for url, zoom_maximo in niveles]
+        self.columna = columna
+
+
+class EstiloCantones(MacroElement):
+    """Script pequeño que se reenvía en cada rerun: valores por cantón y escala de colores."""
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+            window.estiloCantones = {{ this.estilo|tojson }};
+            if (window.aplicarEstiloCantones) { window.aplicarEstiloCantones(); }
+        {% endmacro %}
+    """)
+
+    def __init__(self, estilo):
+        super().__init__()
+        self._name = "EstiloCantones"
+        self.estilo = estilo
+
+
+def crear_mapa_base(niveles, columna, location, zoom_start):
+    """Mapa sin datos por filtro: su script es idéntico entre reruns (niveles: ver CapaCantonesEstatica)."""
+    m = folium.Map(location=location, zoom_start=zoom_start)
+    CapaCantonesEstatica(niveles, columna).add_to(m)
+    return m
+
+
+def crear_estilo(valores, columna, pasos, colores, no_seleccionados=(),
+                 color_cero="#ece7f2", color_no_seleccionado="#D3D3D3",
+                 titulo="Cantidad de Beneficiarios"):
+    """FeatureGroup (para st_folium(feature_group_to_add=...)) con el estilo del filtro actual."""
+    estilo = {
+        "columna": columna,
+        "valores": {str(k): int(v) for k, v in valores.items() if int(v) != 0},
+        "pasos": [int(p) for p in pasos],
+        "colores": list(colores),
+        "no_seleccionados": sorted(no_seleccionados),
+        "color_cero": color_cero,
+        "color_no_seleccionado": color_no_seleccionado,
+        "titulo": titulo,
+    }
+    grupo = folium.FeatureGroup(name=NOMBRE_CAPA + " (estilo)", control=False)
+    EstiloCantones(estilo).add_to(grupo)
+    return grupo
@@ -0,0 +1,114 @@
+import hashlib
+import json
+import sys
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+# ---------------------------
+# Clave canónica de la selección y caché de resultados
+# ---------------------------
+# La mayoría de las sesiones abren el tablero con todo seleccionado, y cada
+# una volvía a filtrar el cubo y a armar resúmenes y mapa. La selección se
+# lleva a una forma canónica (listas como tuplas ordenadas, "todos" igual a
+# elegir cada valor a mano) y su hash, junto con la versión de los datos,
+# indexa una caché LRU acotada por tamaño que comparten todas las sesiones
+# del proceso. Los resultados guardados se comparten: no hay que modificarlos.
+
+# Marca de un filtro con todos sus valores disponibles elegidos
+TODOS = "*"
+
+
+def canonizar_filtros(filtros, disponibles=None):
+    """Selección en forma canónica, sin depender del orden en que se eligieron los valores.
+
+    Cada lista pasa a tupla ordenada de textos; si un filtro de 'disponibles'
+    tiene todos sus valores elegidos queda como TODOS, igual que con
+    "Seleccionar todos". En esos filtros se descartan antes los valores que no
+    están disponibles: no cambian el resultado (p. ej. el alias "admisión" de
+    NOMBRE_AMIGABLE cuando la hoja solo trae "admision"). None se conserva
+    (significa otra cosa que la lista completa, p. ej. en los flags).
+    """
+    disponibles = disponibles or {}
+    canonicos = {}
+    for nombre, valores in filtros.items():
+        if valores is None:
+            canonicos[nombre] = None
+            continue
+        valores = {str(v) for v in valores}
+        if nombre in disponibles:
+            todos = {str(v) for v in disponibles[nombre]}
+            valores &= todos
+            if valores == todos:
+                canonicos[nombre] = TODOS
+                continue
+        canonicos[nombre] = tuple(sorted(valores))
+    return canonicos
+
+
+def clave_filtros(version, filtros, nombre="datos", disponibles=None):
+    """Clave estable para una selección y versión de los datos."""
+    texto = json.dumps([nombre, str(version), canonizar_filtros(filtros, disponibles)],
+                       sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(texto.encode("utf-8")).hexdigest()[:16]
+
+
+def tamano(valor):
+    """Bytes aproximados de un resultado (DataFrame, Series, figura, dict de GeoJSON, tuplas...)."""
+    if isinstance(valor, pd.DataFrame):
+        return int(valor.memory_usage(deep=True).sum())
+    if isinstance(valor, pd.Series):
+        return int(valor.memory_usage(deep=True))
+    if isinstance(valor, (str, bytes)):
+        return len(valor)
+    if isinstance(valor, (tuple, list)):
+        return sys.getsizeof(valor) + sum(tamano(v) for v in valor)
+    if hasattr(valor, "to_json"):
+        # Figuras de plotly: lo que pesan serializadas
+        return len(valor.to_json())
+    if isinstance(valor, dict):
+        try:
+            return len(json.dumps(valor, default=str))
+        except (TypeError, ValueError):
+            return sys.getsizeof(valor)
+    return sys.getsizeof(valor)
+
+
+class CacheLRU:
+    """Resultados por clave; al pasar max_bytes se descartan los usados hace más tiempo."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.aciertos = 0
+        self.fallos = 0
+        self._datos = OrderedDict()  # clave -> (valor, bytes)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._datos)
+
+    def obtener(self, clave, calcular):
+        """Valor guardado para clave; si no está, lo calcula con calcular() y lo guarda."""
+        with self._lock:
+            if clave in self._datos:
+                self._datos.move_to_end(clave)
+                self.aciertos += 1
+                return self._datos[clave][0]
+            self.fallos += 1
+        # Se calcula fuera del lock: otra sesión con la misma selección puede
+        # calcularlo a la vez, y queda el último que termina
+        valor = calcular()
+        peso = tamano(valor)
+        with self._lock:
+            if clave in self._datos:
+                self.bytes -= self._datos.pop(clave)[1]
+            # Un resultado más grande que toda la caché no se guarda
+            if peso <= self.max_bytes:
+                self._datos[clave] = (valor, peso)
+                self.bytes += peso
+                while self.bytes > self.max_bytes:
+                    _, (_, descartado) = self._datos.popitem(last=False)
+                    self.bytes -= descartado
+        return valor
@@ -0,0 +1,191 @@
+import unicodedata
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+
+def strip_accents(s: str) -> str:
+    return unicodedata.normalize('NFKD', s).encode('ascii', errors='ignore').decode('utf-8') if isinstance(s, str) else s
+
+
+# ---------------------------
+# Normalización de EDAD y SEXO
+# ---------------------------
+# clasificar_edad / normalizar_sexo son las versiones originales, valor por
+# valor. clasificar_edades / normalizar_sexos dan exactamente el mismo
+# resultado sobre una columna completa, sin llamar una función Python por fila.
+
+
+def clasificar_edad(valor):
+    try:
+        if pd.isna(valor):
+            return 'Sin dato'
+        if isinstance(valor, (int, float, np.integer, np.floating)):
+            v = int(valor)
+            if 13 <= v <= 18:
+                return "13 a 18"
+            elif 19 <= v <= 35:
+                return "19 a 35"
+            elif 36 <= v <= 64:
+                return "36 a 64"
+            elif v >= 65 and v < 98:
+                return "Mayor a 65"
+            # casos especiales
+            elif v in (98, 102, 109):
+                return "19 a 35"
+            elif v in (99, 105, 106):
+                return "36 a 64"
+            elif v == 103:
+                return "30 a 39"
+            else:
+                return 'Sin dato'
+        v = str(valor).strip()
+        if v == '' or v.lower() == 'información incompleta':
+            return 'Sin dato'
+        if v in ['15-19', '15 a 18', '15-18']:
+            return '13 a 18'
+        if v in ["19-35", "20-29", "20 a 29", "18 a 35 años", "20 o más", "Más de 20"]:
+            return '19 a 35'
+        if v in ["30-39", "30 a 39"]:
+            return "30 a 39"
+        if v in ["36-64", "40-49", "40 a 49", "50-59", "Más de 50", "36 a 64 años", "Más de 30"]:
+            return '36 a 64'
+        if v in ["Más de 60", "Más de 65"]:
+            return 'Mayor a 65'
+        if v in ["Sin dato"]:
+            return "Sin dato"
+    except Exception:
+        return 'Sin dato'
+    return 'Sin dato'
+
+
+def normalizar_sexo(valor):
+    if pd.isna(valor):
+        return "Sin dato"
+    v = str(valor).strip()
+    if v == "":
+        return "Sin dato"
+    low = v.lower()
+    if low in ['femenino', 'f', 'mujer', 'female']:
+        return 'Femenino'
+    if low in ['masculino', 'm', 'hombre', 'male']:
+        return 'Masculino'
+    if low in ['no indica', 'no responde', 'no contesta', 'nr']:
+        return 'NR'
+    if low in ['sin dato', 'ns']:
+        return 'Sin dato'
+    return 'Sin dato'
+
+
+# ---------------------------
+# Versiones vectorizadas
+# ---------------------------
+# Edades numéricas: tabla indexada por la edad entera (truncada, como int()).
+# Todo lo que cae fuera de la tabla es 'Sin dato'.
+TABLA_EDADES = np.full(110, 'Sin dato', dtype=object)
+TABLA_EDADES[13:19] = '13 a 18'
+TABLA_EDADES[19:36] = '19 a 35'
+TABLA_EDADES[36:65] = '36 a 64'
+TABLA_EDADES[65:98] = 'Mayor a 65'
+# casos especiales
+TABLA_EDADES[[98, 102, 109]] = '19 a 35'
+TABLA_EDADES[[99, 105, 106]] = '36 a 64'
+TABLA_EDADES[103] = '30 a 39'
+
+# Edades escritas como texto (comparación exacta tras strip()); el resto es 'Sin dato'
+MAPA_EDADES = {
+    **dict.fromkeys(['15-19', '15 a 18', '15-18'], '13 a 18'),
+    **dict.fromkeys(["19-35", "20-29", "20 a 29", "18 a 35 años", "20 o más", "Más de 20"], '19 a 35'),
+    **dict.fromkeys(["30-39", "30 a 39"], "30 a 39"),
+    **dict.fromkeys(["36-64", "40-49", "40 a 49", "50-59", "Más de 50", "36 a 64 años", "Más de 30"], '36 a 64'),
+    **dict.fromkeys(["Más de 60", "Más de 65"], 'Mayor a 65'),
+}
+
+# Sexo: comparación tras strip().lower(); el resto es 'Sin dato'
+MAPA_SEXO = {
+    **dict.fromkeys(['femenino', 'f', 'mujer', 'female'], 'Femenino'),
+    **dict.fromkeys(['masculino', 'm', 'hombre', 'male'], 'Masculino'),
+    **dict.fromkeys(['no indica', 'no responde', 'no contesta', 'nr'], 'NR'),
+}
+
+TIPOS_NUMERICOS = (int, float, np.integer, np.floating)
+
+
+def _clasificar_numeros(valores):
+    with np.errstate(invalid='ignore'):
+        enteros = np.trunc(valores)
+    # NaN e infinitos no pasan este filtro (int(inf) lanzaba una excepción -> 'Sin dato')
+    validos = np.isfinite(enteros) & (enteros >= 0) & (enteros < len(TABLA_EDADES))
+    # TABLA_EDADES[0] es 'Sin dato', así que los inválidos apuntan a la posición 0
+    posiciones = np.where(validos, enteros, 0).astype(np.intp)
+    return TABLA_EDADES[posiciones]
+
+
+def clasificar_edades(serie):
+    """Equivalente vectorizado de serie.apply(clasificar_edad)."""
+    if pd.api.types.is_numeric_dtype(serie):
+        resultado = _clasificar_numeros(serie.to_numpy(dtype=float, na_value=np.nan))
+        return pd.Series(resultado, index=serie.index)
+
+    # Columna mixta (lo usual al leer la hoja): se separan números y texto por tipo,
+    # igual que el isinstance() original, de modo que "25" como texto sigue siendo 'Sin dato'.
+    # Los nulos no necesitan trato aparte: NaN cae fuera de la tabla numérica y
+    # None/pd.NA/NaT quedan con código -1 al factorizar el texto; todos son 'Sin dato'.
+    valores = serie.to_numpy(dtype=object)
+    codigos_tipo, tipos = pd.factorize(np.fromiter(map(type, valores), dtype=object, count=len(valores)))
+    numericos = np.array([issubclass(t, TIPOS_NUMERICOS) for t in tipos], dtype=bool)[codigos_tipo]
+    textos = ~numericos
+
+    resultado = np.full(len(valores), 'Sin dato', dtype=object)
+    resultado[numericos] = _clasificar_numeros(valores[numericos].astype(float))
+    if textos.any():
+        # Pocos valores distintos: se clasifica cada uno una sola vez
+        codigos, unicos = pd.factorize(valores[textos])
+        etiquetas = pd.Series(unicos).astype(str).str.strip().map(MAPA_EDADES).fillna('Sin dato')
+        resultado[textos] = np.append(etiquetas.to_numpy(dtype=object), 'Sin dato')[codigos]
+    return pd.Series(resultado, index=serie.index)
+
+
+def normalizar_sexos(serie):
+    """Equivalente vectorizado de serie.apply(normalizar_sexo)."""
+    # Los nulos quedan con código -1; se clasifica cada valor distinto una sola vez
+    codigos, unicos = pd.factorize(serie)
+    etiquetas = pd.Series(unicos).astype(str).str.strip().str.lower().map(MAPA_SEXO).fillna('Sin dato')
+    resultado = np.append(etiquetas.to_numpy(dtype=object), 'Sin dato')[codigos]
+    return pd.Series(resultado, index=serie.index)
+
+
+# ---------------------------
+# Fechas -> texto 'YYYY-MM-DD'
+# ---------------------------
+# Reemplaza df.applymap(convert_dates): solo se tocan las columnas datetime64
+# y las columnas object que realmente contienen fechas.
+TIPOS_FECHA = (pd.Timestamp, datetime, date)
+# Resultados de infer_dtype que pueden incluir fechas en una columna object
+INFERENCIAS_CON_FECHAS = {'datetime', 'datetime64', 'date', 'mixed', 'mixed-integer'}
+
+
+def _mascara_fechas(valores):
+    codigos_tipo, tipos = pd.factorize(np.fromiter(map(type, valores), dtype=object, count=len(valores)))
+    # NaT también hereda de datetime, pero no tiene strftime(); se deja como nulo
+    es_fecha = [issubclass(t, TIPOS_FECHA) and t is not type(pd.NaT) for t in tipos]
+    return np.array(es_fecha, dtype=bool)[codigos_tipo]
+
+
+def convertir_fechas(df):
+    """Convierte a texto 'YYYY-MM-DD' toda celda con una fecha; el resto queda igual."""
+    # Copia: conn.read() guarda el DataFrame en su propia caché y no debe modificarse
+    df = df.copy()
+    for col in df.columns:
+        serie = df[col]
+        if pd.api.types.is_datetime64_any_dtype(serie):
+            df[col] = serie.dt.strftime("%Y-%m-%d").astype(object)
+        elif serie.dtype == object and pd.api.types.infer_dtype(serie, skipna=True) in INFERENCIAS_CON_FECHAS:
+            valores = serie.to_numpy(dtype=object)
+            fechas = _mascara_fechas(valores)
+            if fechas.any():
+                valores = valores.copy()
+                valores[fechas] = [v.strftime("%Y-%m-%d") for v in valores[fechas]]
+                df[col] = pd.Series(valores, index=serie.index, dtype=object)
+    return df
@@ -0,0 +1,340 @@
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from nucleo.bloqueo import bloqueo_archivo
+from nucleo.tiempos import etapa
+
+# ---------------------------
+# Snapshot local de una hoja normalizada (Arrow IPC)
+# ---------------------------
+# La hoja ya normalizada se guarda en disco sin compresión, para poder leerla
+# con memory_map al arrancar (sin descomprimir ni copiar a un búfer antes de
+# pasarla a pandas). Mientras el snapshot exista se sirve de
+# inmediato; si es más viejo que max_edad se vuelve a leer la hoja en un hilo
+# aparte y se reemplaza el archivo de forma atómica.
+#
+# Refresco incremental: junto a cada fila se guarda el hash de la fila cruda.
+# Al releer la hoja solo se normalizan las filas nuevas o modificadas, y los
+# agregados derivados (p. ej. el cubo de conteos) se actualizan con esas
+# filas en lugar de recalcularse sobre toda la historia.
+#
+# El archivo es la caché compartida de todas las réplicas del nodo: el
+# refresco toma un bloqueo de archivo, así que cuando vence solo un proceso va
+# a la hoja y normaliza, y los demás recargan el archivo nuevo. Lo que se
+# comparte es el archivo (y sus páginas en la caché del sistema operativo), no
+# el DataFrame: to_pandas() copia los datos, así que cada proceso tiene su
+# propia copia en memoria.
+#
+# Errores de la hoja: cada lectura se reintenta con espera exponencial (con
+# algo de azar, para que las réplicas no reintenten juntas). Si el refresco en
+# segundo plano falla igual, se sigue sirviendo el snapshot anterior y no se
+# vuelve a intentar hasta que pase una pausa que crece con cada fallo seguido.
+#
+# Versión: el contenido (un digest de los hashes de fila, guardado en los
+# metadatos del esquema) identifica los datos y es la clave de las cachés que
+# dependen de ellos. El mtime del archivo solo dice cuán fresco está: si la hoja
+# no cambió se renueva la fecha sin tocar la versión, y los procesos que ven el
+# mtime nuevo leen solo el esquema y no recargan nada.
+
+logger = logging.getLogger(__name__)
+
+COLUMNA_HASH = "_HASH_FILA"
+CLAVE_ESQUEMA = b"esquema_crudo"
+CLAVE_VERSION = b"version_datos"
+# Si cambia más de esta fracción de las filas, conviene normalizar todo de nuevo
+MAX_FRACCION_DELTA = 0.5
+
+
+def columna_compatible(serie):
+    """La columna tal cual si Arrow la acepta; si no, numérica o, como último recurso, texto."""
+    try:
+        pa.array(serie, from_pandas=True)
+        return serie
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        pass
+    # Números guardados con tipos distintos (25, 40.0, '17', Decimal): se pasan a número
+    # si ningún valor se pierde, contando las celdas vacías como nulos
+    vacias = serie.str.strip().eq('').fillna(False).astype(bool)
+    numeros = pd.to_numeric(serie.where(~vacias), errors='coerce')
+    if (numeros.notna() | serie.isna() | vacias).all():
+        return numeros
+    # Números mezclados con texto (p. ej. EDAD: 25 y '20-29'): todo como texto
+    return serie.astype(str).astype(object).where(serie.notna(), None)
+
+
+def compatible_con_arrow(df):
+    """Convierte solo las columnas object con tipos mezclados que Arrow no puede guardar."""
+    df = df.reset_index(drop=True)
+    for col in df.columns:
+        serie = df[col]
+        if serie.dtype == object and pd.api.types.infer_dtype(serie, skipna=True) in ('mixed', 'mixed-integer'):
+            df[col] = columna_compatible(serie)
+    return df
+
+
+def alinear_tipos(df, referencia):
+    """Lleva al dtype de 'referencia' las columnas de texto, para concatenar sin mezclar tipos."""
+    df = df.copy()
+    for col in df.columns:
+        destino = referencia[col].dtype
+        if df[col].dtype != destino and isinstance(destino, pd.StringDtype):
+            df[col] = df[col].astype(destino)
+    return df
+
+
+def hashes_de_filas(df):
+    return pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+
+def esquema_crudo(df):
+    return json.dumps([[str(c), str(t)] for c, t in df.dtypes.items()])
+
+
+def version_de(hashes, esquema):
+    """Versión del contenido: cambia solo si cambia alguna fila o el esquema de la hoja."""
+    digest = hashlib.sha1(esquema.encode())
+    digest.update(np.ascontiguousarray(hashes, dtype=np.uint64).tobytes())
+    return digest.hexdigest()[:16]
+
+
+class SnapshotHoja:
+    def __init__(self, leer, normalizar, ruta, max_edad, agregados=None,
+                 reintentos=3, espera=1.0, espera_maxima=300):
+        # leer() -> DataFrame crudo de la hoja; normalizar(df) -> DataFrame listo para la app.
+        # normalizar debe tratar cada fila por separado para poder aplicarse solo al delta.
+        # agregados: {nombre: (construir(df), actualizar(valor, quitadas, agregadas) o None)}
+        # reintentos/espera/espera_maxima: reintentos de leer() y pausas en segundos entre ellos
+        self.leer = leer
+        self.normalizar = normalizar
+        self.ruta = ruta
+        self.max_edad = max_edad
+        self.agregados = agregados or {}
+        self.reintentos = reintentos
+        self.espera = espera
+        self.espera_maxima = espera_maxima
+        self.version = None  # versión del contenido cargado (ver version_de); sirve como clave de caché
+        self._mtime_visto = None  # mtime del archivo al cargarlo o al comprobar su versión
+        self._df = None
+        self._hashes = None
+        self._esquema = None
+        self._valores = {}
+        self._lock = threading.Lock()
+        self._refrescando = False
+        self._fallos = 0  # refrescos en segundo plano fallidos seguidos
+        self._pausa_hasta = 0.0
+
+    def _mtime(self):
+        try:
+            return os.path.getmtime(self.ruta)
+        except OSError:
+            return None
+
+    def _pausa(self, intento):
+        # Espera exponencial, con un azar de hasta la mitad para no sincronizar réplicas
+        return min(self.espera * 2 ** intento, self.espera_maxima) * random.uniform(0.5, 1)
+
+    def _leer_con_reintentos(self):
+        for intento in range(self.reintentos + 1):
+            try:
+                return self.leer()
+            except Exception as error:
+                if intento == self.reintentos:
+                    raise
+                pausa = self._pausa(intento)
+                logger.warning("Error leyendo la hoja de %s (intento %d de %d), se reintenta en %.1f s: %s",
+                               self.ruta, intento + 1, self.reintentos + 1, pausa, error)
+                time.sleep(pausa)
+
+    def _cargar(self, mtime, valores=None):
+        with etapa("snapshot.cargar") as e:
+            self._cargar_tabla(mtime, valores)
+            e.filas = len(self._df)
+
+    def _cargar_tabla(self, mtime, valores):
+        tabla = feather.read_table(self.ruta, memory_map=True)
+        metadata = tabla.schema.metadata or {}
+        self._esquema = metadata.get(CLAVE_ESQUEMA, b"").decode() or None
+        if COLUMNA_HASH in tabla.column_names:
+            self._hashes = tabla.column(COLUMNA_HASH).to_numpy()
+            tabla = tabla.drop_columns([COLUMNA_HASH])
+        else:
+            self._hashes = None
+        # Copia privada del proceso; la tabla mapeada se suelta al salir de aquí
+        self._df = tabla.to_pandas()
+        # Los snapshots escritos antes de guardar la versión la calculan al cargarse
+        self.version = metadata.get(CLAVE_VERSION, b"").decode() or (
+            version_de(self._hashes, self._esquema or "") if self._hashes is not None else str(mtime))
+        self._mtime_visto = mtime
+        # Sin valores actualizados (snapshot de otro proceso o refresco completo)
+        # los agregados se reconstruyen la próxima vez que se pidan
+        self._valores = valores or {}
+
+    def _escribir(self, df, hashes, esquema):
+        tabla = pa.Table.from_pandas(compatible_con_arrow(df), preserve_index=False)
+        tabla = tabla.append_column(COLUMNA_HASH, pa.array(hashes, type=pa.uint64()))
+        tabla = tabla.replace_schema_metadata({**(tabla.schema.metadata or {}), CLAVE_ESQUEMA: esquema.encode(),
+                                               CLAVE_VERSION: version_de(hashes, esquema).encode()})
+        os.makedirs(os.path.dirname(self.ruta) or ".", exist_ok=True)
+        temporal = f"{self.ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+        feather.write_feather(tabla, temporal, compression="uncompressed")
+        os.replace(temporal, self.ruta)
+
+    def _version_en_disco(self):
+        # Solo el esquema (pie del archivo IPC), sin leer los datos
+        try:
+            with pa.memory_map(self.ruta) as fuente:
+                metadata = pa.ipc.open_file(fuente).schema.metadata or {}
+        except (OSError, pa.ArrowInvalid):
+            return None
+        return metadata.get(CLAVE_VERSION, b"").decode() or None
+
+    def _sincronizar(self, mtime):
+        """Recarga el snapshot si su contenido cambió desde la última carga (con el lock tomado)."""
+        if self._df is not None and mtime == self._mtime_visto:
+            return
+        if self._df is not None and self._version_en_disco() == self.version:
+            # Otro proceso solo renovó la fecha: se conservan los datos y los agregados
+            self._mtime_visto = mtime
+            return
+        self._cargar(mtime)
+
+    def _delta(self, crudo, hashes, esquema):
+        """Posiciones (cambiadas o nuevas, eliminadas) respecto del snapshot, o None si no sirve."""
+        if self._df is None or self._hashes is None or esquema != self._esquema:
+            return None
+        previos = self._hashes
+        comun = min(len(hashes), len(previos))
+        cambiadas = np.flatnonzero(hashes[:comun] != previos[:comun])
+        nuevas = np.arange(comun, len(hashes))
+        eliminadas = np.arange(comun, len(previos))
+        if len(cambiadas) + len(nuevas) + len(eliminadas) > MAX_FRACCION_DELTA * max(len(hashes), 1):
+            return None
+        return np.concatenate([cambiadas, nuevas]), np.concatenate([cambiadas, eliminadas])
+
+    def refrescar(self, esperar=True):
+        """Lee la hoja y actualiza el snapshot, normalizando solo lo que cambió.
+
+        Un solo proceso del nodo refresca a la vez. Con esperar=False devuelve
+        False sin hacer nada si otro proceso ya está refrescando.
+        """
+        with bloqueo_archivo(self.ruta, esperar) as tomado:
+            if tomado:
+                self._refrescar_bloqueado()
+            return tomado
+
+    def _refrescar_bloqueado(self):
+        mtime = self._mtime()
+        if mtime is not None and mtime != self._mtime_visto:
+            # Otro proceso escribió o renovó el snapshot desde la última carga: se parte de él
+            with self._lock:
+                self._sincronizar(mtime)
+            if time.time() - mtime <= self.max_edad:
+                # ...y es reciente (lo refrescó mientras se esperaba el bloqueo)
+                return
+
+        with etapa("hoja.leer") as e:
+            crudo = self._leer_con_reintentos().reset_index(drop=True)
+            e.filas = len(crudo)
+        with etapa("hoja.hashes", filas=len(crudo)):
+            hashes = hashes_de_filas(crudo)
+            esquema = esquema_crudo(crudo)
+        with self._lock:
+            previo, valores_previos = self._df, self._valores
+            delta = self._delta(crudo, hashes, esquema)
+
+        if delta is None:
+            with etapa("hoja.normalizar", filas=len(crudo)):
+                df = self.normalizar(crudo)
+            valores = None
+        else:
+            a_normalizar, a_quitar = delta
+            if len(a_normalizar) == 0 and len(a_quitar) == 0:
+                # La hoja no cambió: solo se renueva la fecha para que no se considere
+                # vencido; la versión (y las cachés que dependen de ella) sigue igual
+                os.utime(self.ruta)
+                with self._lock:
+                    self._mtime_visto = self._mtime()
+                return
+            with etapa("hoja.normalizar", filas=len(a_normalizar)):
+                agregadas = self.normalizar(crudo.iloc[a_normalizar])
+            with etapa("hoja.combinar", filas=len(a_normalizar) + len(a_quitar)):
+                quitadas = previo.iloc[a_quitar]
+                conservadas = previo.iloc[:len(hashes)].drop(index=a_quitar, errors="ignore")
+                df = pd.concat([conservadas, alinear_tipos(agregadas, previo)]).sort_index()
+                valores = {}
+                for nombre, valor in valores_previos.items():
+                    actualizar = self.agregados[nombre][1]
+                    if actualizar is not None:
+                        valores[nombre] = actualizar(valor, quitadas, agregadas)
+
+        with etapa("snapshot.escribir", filas=len(df)) as e:
+            self._escribir(df, hashes, esquema)
+            e.bytes = os.path.getsize(self.ruta)
+        with self._lock:
+            self._cargar(self._mtime(), valores)
+
+    def _refrescar_en_segundo_plano(self):
+        try:
+            self.refrescar(esperar=False)
+        except Exception:
+            # Se sigue sirviendo el snapshot anterior; se reintenta pasada la pausa
+            with self._lock:
+                self._fallos += 1
+                # La pausa sigue la misma progresión que los reintentos de leer()
+                pausa = self._pausa(self.reintentos + self._fallos)
+                self._pausa_hasta = time.time() + pausa
+            logger.exception("No se pudo refrescar el snapshot %s; próximo intento en %.1f s", self.ruta, pausa)
+        else:
+            with self._lock:
+                self._fallos = 0
+        finally:
+            with self._lock:
+                self._refrescando = False
+
+    def refrescar_en_segundo_plano(self):
+        with self._lock:
+            if self._refrescando or time.time() < self._pausa_hasta:
+                return
+            self._refrescando = True
+        threading.Thread(target=self._refrescar_en_segundo_plano, daemon=True).start()
+
+    def _valor(self, nombre):
+        if nombre not in self._valores:
+            construir = self.agregados[nombre][0]
+            with etapa(f"snapshot.{nombre}", filas=len(self._df)):
+                self._valores[nombre] = construir(self._df)
+        return self._valores[nombre]
+
+    def obtener(self, *agregados, con_version=False):
+        """DataFrame actual; con nombres de agregados devuelve (df, valor1, ...) de la misma versión.
+
+        Con con_version=True devuelve (version, datos), leídos juntos: la versión
+        es la de esos datos aunque un refresco los reemplace justo después.
+        """
+        mtime = self._mtime()
+        if mtime is None:
+            # Primer arranque: no hay nada que servir todavía. Si otro proceso ya
+            # está leyendo la hoja, se espera su snapshot en vez de leerla de nuevo
+            self.refrescar()
+            mtime = self._mtime()
+        with self._lock:
+            # Cargado por primera vez en este proceso, o reemplazado por otro proceso
+            self._sincronizar(mtime)
+            # Todo se lee bajo el mismo lock para que un refresco en segundo plano
+            # no mezcle la hoja de una versión con los agregados de otra
+            resultado = (self._df, *(self._valor(nombre) for nombre in agregados))
+            version = self.version
+        if time.time() - mtime > self.max_edad:
+            self.refrescar_en_segundo_plano()
+        resultado = resultado if agregados else resultado[0]
+        return (version, resultado) if con_version else resultado
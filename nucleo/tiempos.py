@@ -0,0 +1,109 @@
+import json
+import logging
+import os
+import threading
+import time
+
+# ---------------------------
+# Medición de tiempos por etapa
+# ---------------------------
+# Cada etapa (leer la hoja, normalizar, filtrar, armar el mapa, exportar...)
+# se envuelve en 'with etapa(nombre) as e:' y puede anotar e.filas y e.bytes.
+# Si la medición está apagada, etapa() devuelve siempre el mismo objeto nulo:
+# no se toma la hora ni se guarda nada.
+#
+# El estado es por hilo: cada ejecución del script de Streamlit (y cada
+# refresco en segundo plano) activa y junta sus propios registros. Con la
+# medición activa, además, cada etapa se escribe como una línea JSON en el
+# logger 'nucleo.tiempos'. Si nadie configuró logging para ese nivel, al
+# activar la medición se le agrega un handler a stderr en INFO.
+
+logger = logging.getLogger(__name__)
+
+# Valor por defecto para los hilos que no llaman a activar() (p. ej. los refrescos en segundo plano)
+ACTIVO_POR_DEFECTO = os.environ.get("PERFILADO", "") not in ("", "0")
+
+_estado = threading.local()
+_lock_logger = threading.Lock()
+
+
+class _Etapa:
+    __slots__ = ("nombre", "filas", "bytes", "inicio", "ms")
+
+    def __init__(self, nombre, filas):
+        self.nombre = nombre
+        self.filas = filas
+        self.bytes = None
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.ms = (time.perf_counter() - self.inicio) * 1000
+        registro = {"etapa": self.nombre, "ms": round(self.ms, 2), "filas": self.filas, "bytes": self.bytes}
+        # Los hilos que no llamaron a activar() solo dejan la línea en el log
+        lista = getattr(_estado, "registros", None)
+        if lista is not None:
+            lista.append(registro)
+        logger.info(json.dumps(registro, ensure_ascii=False))
+        return False
+
+
+class _EtapaNula:
+    """Lo que devuelve etapa() con la medición apagada: acepta y descarta todo."""
+    __slots__ = ()
+    filas = bytes = ms = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setattr__(self, nombre, valor):
+        pass
+
+
+ETAPA_NULA = _EtapaNula()
+
+
+def configurar_logger():
+    """Asegura que las líneas INFO de 'nucleo.tiempos' se escriban en algún lado."""
+    with _lock_logger:  # varias sesiones pueden activar la medición a la vez
+        if logger.handlers or logger.getEffectiveLevel() <= logging.INFO:
+            return  # ya lo configuró la aplicación
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s %(name)s %(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        # Sin propagar: los handlers de la raíz no las repiten
+        logger.propagate = False
+
+
+def activo():
+    return getattr(_estado, "activo", ACTIVO_POR_DEFECTO)
+
+
+def activar(valor=True, reiniciar=True):
+    """Activa o apaga la medición en este hilo; con reiniciar empieza una lista de registros nueva."""
+    _estado.activo = valor
+    if valor:
+        configurar_logger()
+    if reiniciar or not hasattr(_estado, "registros"):
+        _estado.registros = []
+
+
+def registros():
+    """Etapas medidas en este hilo desde el último activar()."""
+    return list(getattr(_estado, "registros", []))
+
+
+def etapa(nombre, filas=None):
+    if not activo():
+        return ETAPA_NULA
+    return _Etapa(nombre, filas)
+
+
+if ACTIVO_POR_DEFECTO:
+    configurar_logger()
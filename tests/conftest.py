@@ -0,0 +1,115 @@
+# Fixtures compartidas: una hoja sintética chica y una conexión falsa que
+# imita conn.read() de GSheetsConnection, para probar el snapshot sin red.
+import os
+import threading
+import time
+
+import pytest
+
+from benchmarks.sinteticos import generar_hoja
+from nucleo.cubo import actualizar_anual, actualizar_cubo, construir_anual, construir_cubo
+from nucleo.datos import normalizar_datos
+from nucleo.snapshot import SnapshotHoja
+
+CANTONES = ["San José", "Escazú", "Desamparados", "Pérez Zeledón", "Upala", "Dota"]
+
+
+class ConexionLocal:
+    """Devuelve una copia de 'df' tras 'latencia' segundos; las primeras 'fallas' lecturas fallan.
+
+    Con 'registro' anota el pid de cada lectura en ese archivo, para contar
+    lecturas hechas desde otros procesos.
+    """
+
+    def __init__(self, df, latencia=0.0, fallas=0, registro=None):
+        self.df = df
+        self.latencia = latencia
+        self.fallas = fallas
+        self.registro = registro
+        self.intentos = 0
+        self.lecturas = 0
+        self._lock = threading.Lock()
+
+    def read(self, worksheet=None, ttl=None):
+        with self._lock:
+            self.intentos += 1
+            intento = self.intentos
+        time.sleep(self.latencia)
+        if intento <= self.fallas:
+            raise ConnectionError(f"falla simulada {intento} de {self.fallas}")
+        with self._lock:
+            self.lecturas += 1
+        if self.registro is not None:
+            with open(self.registro, "a") as f:
+                f.write(f"{os.getpid()}\n")
+        return self.df.copy()
+
+
+@pytest.fixture
+def hoja():
+    return generar_hoja(400, CANTONES)
+
+
+@pytest.fixture
+def crear_conexion(hoja):
+    """ConexionLocal sobre la hoja de prueba, con las opciones dadas (latencia, fallas, registro)."""
+    return lambda **opciones: ConexionLocal(hoja, **opciones)
+
+
+@pytest.fixture
+def conexion(crear_conexion):
+    return crear_conexion()
+
+
+@pytest.fixture
+def nuevo_snapshot(tmp_path, conexion):
+    """Crea SnapshotHoja sobre el mismo archivo, como lo haría cada proceso o sesión."""
+
+    def crear(conn=None, ruta=None, **opciones):
+        conn = conn or conexion
+        opciones = {"max_edad": 600, **opciones}
+        return SnapshotHoja(leer=lambda: conn.read(worksheet="hoja", ttl=0), normalizar=normalizar_datos,
+                            ruta=ruta or str(tmp_path / "hoja.arrow"),
+                            agregados={"cubo": (construir_cubo, actualizar_cubo),
+                                       "anual": (construir_anual, actualizar_anual)},
+                            **opciones)
+
+    return crear
+
+
+@pytest.fixture
+def esperar_refresco():
+    """Espera a que termine el refresco en segundo plano de un snapshot."""
+
+    def esperar(snapshot, limite=30):
+        inicio = time.monotonic()
+        while snapshot._refrescando:
+            assert time.monotonic() - inicio < limite, "el refresco en segundo plano no terminó"
+            time.sleep(0.01)
+
+    return esperar
+
+
+class Reloj:
+    """Reemplaza el módulo time dentro de nucleo.snapshot: la hora avanza a mano y sleep() no espera."""
+
+    def __init__(self):
+        self.ahora = time.time()
+        self.pausas = []
+
+    def time(self):
+        return self.ahora
+
+    def sleep(self, segundos):
+        self.pausas.append(segundos)
+
+    def avanzar(self, segundos):
+        self.ahora += segundos
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    import nucleo.snapshot
+    reloj = Reloj()
+    monkeypatch.setattr(nucleo.snapshot, "time", reloj)
+    return reloj
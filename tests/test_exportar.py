@@ -0,0 +1,43 @@
+# Directorio de exportaciones (nucleo/exportar.py): el archivo se genera una
+# sola vez por clave, se entrega abierto para que limpiar() no lo borre antes
+# de leerlo y el directorio no crece más allá de MAX_ARCHIVOS.
+#
+# Uso: python -m pytest tests
+import os
+
+import pandas as pd
+
+from nucleo.exportar import BLOQUEO, MAX_ARCHIVOS, exportar
+
+DF = pd.DataFrame({"CANTON_DEF": ["San José", "Dota"], "CONTEO": [3, 1]})
+
+
+def test_se_genera_una_vez_por_clave(tmp_path):
+    llamadas = []
+
+    def obtener():
+        llamadas.append(1)
+        return DF
+
+    for _ in range(3):
+        with exportar(obtener, "csv", str(tmp_path), "clave") as f:
+            assert pd.read_csv(f).equals(DF)
+    assert len(llamadas) == 1
+
+
+def test_el_directorio_no_crece(tmp_path):
+    (tmp_path / "vieja.csv.lock").write_text("")  # bloqueo por archivo de una versión anterior
+    for i in range(MAX_ARCHIVOS + 10):
+        exportar(lambda: DF, "csv", str(tmp_path), f"clave{i}").close()
+    nombres = os.listdir(tmp_path)
+    assert len(nombres) == MAX_ARCHIVOS + 1 and f"{BLOQUEO}.lock" in nombres
+
+
+def test_archivo_abierto_se_lee_aunque_otra_sesion_lo_borre(tmp_path):
+    f = exportar(lambda: DF, "csv", str(tmp_path), "primera")
+    # Otras selecciones llenan el directorio y limpiar() borra la primera
+    for i in range(MAX_ARCHIVOS + 1):
+        exportar(lambda: DF, "csv", str(tmp_path), f"clave{i}").close()
+    assert not os.path.exists(tmp_path / "primera.csv")
+    with f:
+        assert pd.read_csv(f).equals(DF)
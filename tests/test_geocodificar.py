@@ -0,0 +1,50 @@
+# Asignación de cantón a filas 'Sin dato' (nucleo/geocodificar.py) con los
+# geojson del repositorio: la geometría sale de costaricacantonesv10 (GADM, sin
+# códigos) y los códigos de cantón de las propiedades de limitecantonal_5k.
+#
+# Uso: python -m pytest tests
+import os
+
+import geopandas as gpd
+import pandas as pd
+import pytest
+
+from nucleo.geocodificar import UbicadorCantones, asignar_cantones
+from nucleo.geometria import codigos_cantones
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUTAS_MAPA = [os.path.join(RAIZ, "limitecantonal_5k.geojson"), os.path.join(RAIZ, "costaricacantonesv10.geojson")]
+
+
+@pytest.fixture(scope="module")
+def gadm():
+    return gpd.read_file(RUTAS_MAPA[1]).to_crs("EPSG:4326")
+
+
+def test_codigos_de_las_propiedades_de_limitecantonal():
+    codigos = codigos_cantones(RUTAS_MAPA)
+    assert len(codigos) == 84
+    assert codigos[101] == "San José" and codigos[102] == "Escazú"
+
+
+def test_sin_fuente_con_codigos_no_hay_tabla():
+    assert codigos_cantones(RUTAS_MAPA[1:]) == {}
+
+
+def test_fila_con_solo_codigo_recibe_su_canton(gadm):
+    ubicador = UbicadorCantones(gadm, "NAME_2", "CÓDIGO_CANTÓN", codigos=codigos_cantones(RUTAS_MAPA))
+    df = pd.DataFrame({
+        "CANTON_DEF": ["Sin dato", "Sin dato", "Sin dato", "Sin dato", "Escazú"],
+        "LATITUD": [None, None, 9.9333, None, None],
+        "LONGITUD": [None, None, -84.0833, None, None],
+        "CODIGO": [10101, "102", None, 99999, 10301],
+    })
+    asignar_cantones(df, ubicador, col_lat="LATITUD", col_lon="LONGITUD", col_codigo="CODIGO")
+    # distrito 10101 y cantón 102 por código, el punto por coordenadas; 99999 no existe
+    assert df["CANTON_DEF"].tolist() == ["San José", "Escazú", "San José", "Sin dato", "Escazú"]
+
+
+def test_geometria_sin_codigos_no_asigna_por_codigo(gadm):
+    ubicador = UbicadorCantones(gadm, "NAME_2", "CÓDIGO_CANTÓN")
+    assert ubicador.codigos == {}
+    assert ubicador.por_codigo([10101]).tolist() == [None]
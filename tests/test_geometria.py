@@ -0,0 +1,62 @@
+# Fuentes de geometría (nucleo/geometria.py): una fuente que no se puede
+# preparar, como limitecantonal_5k.geojson con su WKT cortado, se lee una sola
+# vez; la marca que deja en cache_geometria/ la saltea en los demás procesos
+# hasta que el archivo cambie.
+#
+# Uso: python -m pytest tests
+import os
+import shutil
+
+import pytest
+
+import nucleo.geometria as geometria
+from nucleo.geometria import GeometriaIncompleta, cargar_primera_geometria, fallo_registrado
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def rutas(tmp_path):
+    rutas = []
+    for nombre in ("limitecantonal_5k.geojson", "costaricacantonesv10.geojson"):
+        shutil.copy(os.path.join(RAIZ, nombre), tmp_path / nombre)
+        rutas.append(str(tmp_path / nombre))
+    return rutas
+
+
+@pytest.fixture
+def preparadas(monkeypatch):
+    """Fuentes que se leyeron y prepararon, en orden."""
+    leidas = []
+    preparar = geometria.preparar
+    monkeypatch.setattr(geometria, "preparar", lambda ruta, *args: leidas.append(os.path.basename(ruta))
+                        or preparar(ruta, *args))
+    return leidas
+
+
+def test_fuente_rota_deja_una_marca_y_no_se_vuelve_a_leer(rutas, preparadas):
+    gdf = cargar_primera_geometria(rutas, nivel="completa")
+    assert len(gdf) == 81 and preparadas == ["limitecantonal_5k.geojson", "costaricacantonesv10.geojson"]
+    assert "32767" in fallo_registrado(rutas[0])
+
+    # Otro nivel (u otro proceso): la fuente rota no se vuelve a leer
+    cargar_primera_geometria(rutas, nivel="baja")
+    assert preparadas == ["limitecantonal_5k.geojson", "costaricacantonesv10.geojson",
+                          "costaricacantonesv10.geojson"]
+
+
+def test_la_marca_vence_cuando_cambia_la_fuente(rutas, preparadas):
+    cargar_primera_geometria(rutas, nivel="completa")
+    posterior = os.path.getmtime(geometria.ruta_fallo(rutas[0])) + 10
+    os.utime(rutas[0], (posterior, posterior))
+    assert fallo_registrado(rutas[0]) is None
+    cargar_primera_geometria(rutas, nivel="completa")
+    assert preparadas.count("limitecantonal_5k.geojson") == 2
+
+
+def test_sin_fuentes_utilizables(rutas):
+    with pytest.raises(GeometriaIncompleta, match="32767"):
+        cargar_primera_geometria(rutas[:1], nivel="completa")
+    # Con la marca, el error se repite sin leer el archivo
+    with pytest.raises(GeometriaIncompleta, match="32767"):
+        cargar_primera_geometria(rutas[:1] + [rutas[0] + ".falta"], nivel="completa")
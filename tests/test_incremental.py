@@ -0,0 +1,114 @@
+# Refresco incremental del snapshot (nucleo/snapshot.py): _delta() más
+# actualizar_cubo()/actualizar_anual() deben dar lo mismo que normalizar y
+# agregar toda la hoja de nuevo, y volver al refresco completo cuando el delta
+# no sirve (cambió el esquema o cambió demasiado).
+#
+# Uso: python -m pytest tests
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.sinteticos import generar_hoja
+from nucleo.cubo import DIMENSIONES, DIMENSIONES_ANUALES
+from nucleo.snapshot import MAX_FRACCION_DELTA, esquema_crudo, hashes_de_filas
+
+FILAS = 400
+CANTONES = ["San José", "Escazú", "Desamparados", "Pérez Zeledón", "Upala", "Dota"]
+
+
+@pytest.fixture
+def completa():
+    # Las filas nuevas salen de la misma tabla, así los dtypes de la hoja no cambian
+    return generar_hoja(FILAS + 100, CANTONES)
+
+
+def ordenada(tabla, dimensiones):
+    categorias = {col: object for col in dimensiones if isinstance(tabla[col].dtype, pd.CategoricalDtype)}
+    return tabla.astype(categorias).sort_values(dimensiones).reset_index(drop=True)
+
+
+def refrescar(snapshot, conexion, nueva):
+    """Refresca con la hoja 'nueva'; devuelve (delta, filas normalizadas en cada llamada)."""
+    conexion.df = nueva
+    crudo = nueva.reset_index(drop=True)
+    delta = snapshot._delta(crudo, hashes_de_filas(crudo), esquema_crudo(crudo))
+    normalizadas = []
+    normalizar = snapshot.normalizar
+    snapshot.normalizar = lambda df: normalizadas.append(len(df)) or normalizar(df)
+    snapshot.refrescar()
+    return delta, normalizadas
+
+
+def comparar_con_completo(snapshot, nueva, nuevo_snapshot, crear_conexion, tmp_path):
+    conexion = crear_conexion()
+    conexion.df = nueva
+    referencia = nuevo_snapshot(conexion, ruta=str(tmp_path / "completo.arrow"))
+    df, cubo, anual = snapshot.obtener("cubo", "anual")
+    df_ref, cubo_ref, anual_ref = referencia.obtener("cubo", "anual")
+    pd.testing.assert_frame_equal(df, df_ref)
+    pd.testing.assert_frame_equal(ordenada(cubo, DIMENSIONES), ordenada(cubo_ref, DIMENSIONES))
+    pd.testing.assert_frame_equal(ordenada(anual, DIMENSIONES_ANUALES), ordenada(anual_ref, DIMENSIONES_ANUALES),
+                                  check_dtype=False)
+    assert snapshot.version == referencia.version
+
+
+@pytest.fixture
+def inicial(nuevo_snapshot, conexion, completa):
+    conexion.df = completa.iloc[:FILAS].copy()
+    snapshot = nuevo_snapshot(conexion)
+    snapshot.obtener("cubo", "anual")
+    return snapshot
+
+
+def test_filas_agregadas_al_final(inicial, conexion, completa, nuevo_snapshot, crear_conexion, tmp_path):
+    nueva = completa.iloc[:FILAS + 40].copy()
+    delta, normalizadas = refrescar(inicial, conexion, nueva)
+    assert np.array_equal(delta[0], np.arange(FILAS, FILAS + 40)) and len(delta[1]) == 0
+    assert normalizadas == [40]
+    comparar_con_completo(inicial, nueva, nuevo_snapshot, crear_conexion, tmp_path)
+
+
+def test_filas_modificadas_en_su_lugar(inicial, conexion, completa, nuevo_snapshot, crear_conexion, tmp_path):
+    nueva = completa.iloc[:FILAS].copy()
+    modificadas = [3, 50, 51, 199]
+    nueva.loc[modificadas, "SEXO"] = "Femenino"
+    nueva.loc[modificadas, "CERTIFICADO"] = 1.0
+    nueva.loc[modificadas[:2], "AÑO"] = 2030.0
+    cambiadas = [i for i in modificadas if not nueva.loc[i].equals(completa.loc[i])]
+    delta, normalizadas = refrescar(inicial, conexion, nueva)
+    assert delta[0].tolist() == cambiadas == delta[1].tolist()
+    assert normalizadas == [len(cambiadas)]
+    comparar_con_completo(inicial, nueva, nuevo_snapshot, crear_conexion, tmp_path)
+
+
+def test_hoja_mas_corta(inicial, conexion, completa, nuevo_snapshot, crear_conexion, tmp_path):
+    nueva = completa.iloc[:FILAS - 30].copy()
+    delta, normalizadas = refrescar(inicial, conexion, nueva)
+    assert len(delta[0]) == 0 and np.array_equal(delta[1], np.arange(FILAS - 30, FILAS))
+    assert normalizadas == [0]
+    comparar_con_completo(inicial, nueva, nuevo_snapshot, crear_conexion, tmp_path)
+
+
+def test_cambio_de_esquema_normaliza_todo(inicial, conexion, completa, nuevo_snapshot, crear_conexion, tmp_path):
+    nueva = completa.iloc[:FILAS + 10].copy()
+    nueva["OBSERVACIONES"] = "nueva columna"
+    delta, normalizadas = refrescar(inicial, conexion, nueva)
+    assert delta is None and normalizadas == [FILAS + 10]
+    comparar_con_completo(inicial, nueva, nuevo_snapshot, crear_conexion, tmp_path)
+
+
+def test_cambio_de_tipo_normaliza_todo(inicial, conexion, completa, nuevo_snapshot, crear_conexion, tmp_path):
+    nueva = completa.iloc[:FILAS].copy()
+    nueva["AÑO"] = nueva["AÑO"].astype("Int64").astype(str)
+    delta, normalizadas = refrescar(inicial, conexion, nueva)
+    assert delta is None and normalizadas == [FILAS]
+    comparar_con_completo(inicial, nueva, nuevo_snapshot, crear_conexion, tmp_path)
+
+
+def test_demasiados_cambios_normaliza_todo(inicial, conexion, completa, nuevo_snapshot, crear_conexion, tmp_path):
+    nueva = completa.iloc[:FILAS].copy()
+    cambiar = int(FILAS * MAX_FRACCION_DELTA) + 1
+    nueva.loc[:cambiar - 1, "ID"] = nueva.loc[:cambiar - 1, "ID"] + "-corregido"
+    delta, normalizadas = refrescar(inicial, conexion, nueva)
+    assert delta is None and normalizadas == [FILAS]
+    comparar_con_completo(inicial, nueva, nuevo_snapshot, crear_conexion, tmp_path)
@@ -0,0 +1,32 @@
+# Clave canónica de la selección (nucleo/memo.py): "Seleccionar todos" y elegir
+# cada valor a mano dan la misma clave, también con los alias de NOMBRE_AMIGABLE
+# que no están en la hoja.
+#
+# Uso: python -m pytest tests
+from nucleo.datos import NOMBRE_AMIGABLE, cursos_seleccionados, nombres_cursos
+from nucleo.memo import TODOS, canonizar_filtros, clave_filtros
+
+CURSOS = ["admision", "excel", "redaccion", "taller de ahorro"]
+DISPONIBLES = dict(cursos=CURSOS, anios=[2021, 2022, 2023])
+
+
+def test_todos_a_mano_igual_que_seleccionar_todos():
+    # Elegir cada nombre visible a mano trae también el alias "admisión", que la hoja no tiene
+    a_mano = cursos_seleccionados(nombres_cursos(CURSOS), CURSOS, NOMBRE_AMIGABLE)
+    assert "admisión" in a_mano
+    todos = cursos_seleccionados(None, CURSOS, NOMBRE_AMIGABLE)
+    assert clave_filtros("v1", dict(cursos=a_mano), "seleccion", DISPONIBLES) == \
+        clave_filtros("v1", dict(cursos=todos), "seleccion", DISPONIBLES)
+    assert canonizar_filtros(dict(cursos=a_mano), DISPONIBLES)["cursos"] == TODOS
+
+
+def test_valores_no_disponibles_no_cambian_la_clave():
+    filtros = dict(cursos=["excel", "admision"], anios=[2022, 2021])
+    assert canonizar_filtros(dict(filtros, cursos=["admisión", "excel", "admision"]), DISPONIBLES) == \
+        canonizar_filtros(filtros, DISPONIBLES) == {"cursos": ("admision", "excel"), "anios": ("2021", "2022")}
+    assert canonizar_filtros(dict(cursos=["otro"], flags=None), DISPONIBLES) == {"cursos": (), "flags": None}
+
+
+def test_sin_disponibles_se_conservan_los_valores():
+    assert canonizar_filtros(dict(cursos=["admisión", "excel"], flags=["CERTIFICADO"])) == \
+        {"cursos": ("admisión", "excel"), "flags": ("CERTIFICADO",)}
@@ -0,0 +1,96 @@
+# Equivalencia de las versiones vectorizadas de nucleo/normalizacion.py con las
+# originales fila por fila (clasificar_edad y normalizar_sexo, que se conservan
+# como referencia, y el antiguo applymap(convert_dates) de las apps).
+#
+# Uso: python -m pytest tests
+from datetime import date, datetime
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from nucleo.normalizacion import (MAPA_EDADES, MAPA_SEXO, clasificar_edad, clasificar_edades, convertir_fechas,
+                                  normalizar_sexo, normalizar_sexos)
+
+# Valores de borde: nulos, fuera de rango, etiquetas conocidas y desconocidas
+CASOS_EDAD = (
+    list(range(-2, 115)) + [12.9, 13.0, 18.99, 35.5, 64.999, 97.9, 98.0, 103.4, -0.5, 1e20,
+                            float("inf"), float("-inf"), float("nan"), None, pd.NA, pd.NaT,
+                            True, False, np.int64(25), np.float32(70.2), np.bool_(True), Decimal("25")]
+    + list(MAPA_EDADES) + [f"  {v} " for v in MAPA_EDADES]
+    + ["", "   ", "Sin dato", "Información incompleta", "información incompleta", "25", "15 A 18", "más de 20"]
+)
+CASOS_SEXO = (
+    list(MAPA_SEXO) + [v.upper() for v in MAPA_SEXO] + [f" {v.title()}  " for v in MAPA_SEXO]
+    + ["", " ", "sin dato", "NS", "otro", "x", None, float("nan"), pd.NA, 1, 0.0, True]
+)
+
+
+def convert_dates(x):
+    # La función por celda que las apps aplicaban con applymap()
+    if isinstance(x, (pd.Timestamp, datetime, date)):
+        return x.strftime("%Y-%m-%d")
+    return x
+
+
+def comparar(casos, escalar, vectorizada, dtype=object):
+    serie = pd.Series(casos, dtype=dtype)
+    esperado = [escalar(v) for v in serie]
+    obtenido = vectorizada(serie)
+    assert obtenido.index.equals(serie.index)
+    diferencias = [(v, e, o) for v, e, o in zip(serie, esperado, obtenido.tolist()) if e != o]
+    assert not diferencias, diferencias
+
+
+def test_clasificar_edades_igual_que_fila_por_fila():
+    comparar(CASOS_EDAD, clasificar_edad, clasificar_edades)
+
+
+@pytest.mark.parametrize("casos, dtype", [
+    # Hojas donde EDAD viene limpia y pandas la lee con dtype numérico
+    (list(range(-2, 115)) + [np.nan, 18.5, np.inf], float),
+    (list(range(-2, 115)) + [None], "Int64"),
+    ([True, False], bool),
+    (["20-29", None, "nada"], "string"),
+])
+def test_clasificar_edades_con_dtype_numerico(casos, dtype):
+    comparar(casos, clasificar_edad, clasificar_edades, dtype=dtype)
+
+
+def test_clasificar_edades_en_orden_aleatorio():
+    rng = np.random.default_rng(0)
+    comparar(rng.choice(np.array(CASOS_EDAD, dtype=object), 5_000), clasificar_edad, clasificar_edades)
+
+
+def test_normalizar_sexos_igual_que_fila_por_fila():
+    comparar(CASOS_SEXO, normalizar_sexo, normalizar_sexos)
+    comparar(["F", None, "Male", "otro"], normalizar_sexo, normalizar_sexos, dtype="string")
+
+
+def test_convertir_fechas_igual_que_applymap():
+    fechas = pd.date_range("2023-12-30", periods=5, freq="D")
+    df = pd.DataFrame({
+        "texto": ["a", "Sin dato", None, "2024-01-01", ""],
+        "numero": [1.0, np.nan, 3.5, -1, 0],
+        "fecha": fechas,
+        "fecha_tz": fechas.tz_localize("America/Costa_Rica"),
+        "mixta": [date(2024, 3, 1), "x", 1.5, None, datetime(2024, 3, 1, 12, 30)],
+        "timestamps": pd.Series(list(fechas), dtype=object),
+        "enteros": [1, 2, 3, 4, 5],
+    })
+    esperado = df.map(convert_dates)
+    obtenido = convertir_fechas(df)
+    pd.testing.assert_frame_equal(esperado.astype(object), obtenido.astype(object))
+
+
+def test_convertir_fechas_no_modifica_la_entrada():
+    df = pd.DataFrame({"mixta": [date(2024, 3, 1), "x"]})
+    convertir_fechas(df)
+    assert df.loc[0, "mixta"] == date(2024, 3, 1)
+
+
+def test_convertir_fechas_deja_nat_como_nulo():
+    # convert_dates fallaba con NaT (hereda de datetime pero no tiene strftime)
+    obtenido = convertir_fechas(pd.DataFrame({"mixta": [pd.NaT, date(2024, 3, 1), "x"]}))
+    assert pd.isna(obtenido.loc[0, "mixta"]) and obtenido["mixta"].tolist()[1:] == ["2024-03-01", "x"]
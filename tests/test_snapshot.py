@@ -0,0 +1,199 @@
+# Snapshot Arrow de nucleo/snapshot.py: conversión de columnas antes de
+# guardarlo (compatible_con_arrow) y SnapshotHoja con una conexión falsa
+# (arranque en frío, servir lo vencido mientras se refresca, reintentos con
+# espera, un solo lector entre procesos y pausa tras un fallo).
+#
+# Uso: python -m pytest tests
+import multiprocessing as mp
+import os
+import threading
+import time
+from decimal import Decimal
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from nucleo.bloqueo import bloqueo_archivo
+from nucleo.snapshot import compatible_con_arrow
+
+
+def test_deja_las_columnas_que_arrow_acepta():
+    df = pd.DataFrame({
+        "texto": pd.Series(["a", None, "b"], dtype=object),
+        "codigo": pd.Series([101, 102.0, None], dtype=object),  # enteros y floats: Arrow los guarda como double
+        "numero": [1.5, 2.0, None],
+    })
+    pd.testing.assert_frame_equal(compatible_con_arrow(df), df)
+
+
+def test_numeros_con_tipos_mezclados_quedan_numericos():
+    df = pd.DataFrame({"EDAD": pd.Series([25, 40.0, "17", None, " ", Decimal("3")], dtype=object)})
+    resultado = compatible_con_arrow(df)
+    assert pd.api.types.is_float_dtype(resultado["EDAD"])
+    assert resultado["EDAD"].tolist()[:3] == [25.0, 40.0, 17.0] and resultado["EDAD"].isna().tolist()[3:5] == [True, True]
+    pa.Table.from_pandas(resultado)
+
+
+def test_numeros_mezclados_con_texto_pasan_a_texto_sin_perder_valores():
+    df = pd.DataFrame({"EDAD": pd.Series([25, "20-29", None, 40.0], dtype=object)})
+    resultado = compatible_con_arrow(df)
+    assert resultado["EDAD"].tolist() == ["25", "20-29", None, "40.0"]
+    pa.Table.from_pandas(resultado)
+
+
+# ---------------------------
+# SnapshotHoja con una conexión falsa (ver conftest.py)
+# ---------------------------
+def test_arranque_en_frio_lee_la_hoja_una_vez(nuevo_snapshot, conexion, hoja):
+    snapshot = nuevo_snapshot()
+    df, cubo = snapshot.obtener("cubo")
+    assert conexion.lecturas == 1 and os.path.exists(snapshot.ruta)
+    assert len(df) == len(hoja) and cubo["conteo"].sum() == len(hoja)
+
+    # Otro proceso que arranca con el snapshot en disco no va a la hoja
+    otro = nuevo_snapshot()
+    version, df_otro = otro.obtener(con_version=True)
+    assert conexion.lecturas == 1 and version == snapshot.version
+    pd.testing.assert_frame_equal(df_otro, df)
+
+
+def test_snapshot_vencido_se_sirve_mientras_se_refresca(nuevo_snapshot, conexion, hoja, esperar_refresco):
+    nuevo_snapshot().obtener()
+    conexion.df = pd.concat([hoja, hoja.head(50)], ignore_index=True)
+    conexion.latencia = 0.3
+
+    vencido = nuevo_snapshot(max_edad=0)
+    inicio = time.perf_counter()
+    version, df = vencido.obtener(con_version=True)
+    assert time.perf_counter() - inicio < conexion.latencia
+    assert len(df) == len(hoja) and vencido._refrescando
+
+    esperar_refresco(vencido)
+    version_nueva, df = vencido.obtener(con_version=True)
+    assert len(df) == len(hoja) + 50 and version_nueva != version and conexion.lecturas == 2
+
+
+def test_hoja_sin_cambios_no_cambia_la_version(nuevo_snapshot, conexion):
+    snapshot = nuevo_snapshot()
+    snapshot.obtener()
+    version, mtime = snapshot.version, os.path.getmtime(snapshot.ruta)
+    time.sleep(0.01)
+    snapshot.refrescar()
+    assert conexion.lecturas == 2 and snapshot.version == version and os.path.getmtime(snapshot.ruta) > mtime
+
+
+def test_lectura_reintenta_con_espera_creciente(nuevo_snapshot, crear_conexion, hoja, reloj):
+    conn = crear_conexion(fallas=2)
+    snapshot = nuevo_snapshot(conn, reintentos=3, espera=1.0, espera_maxima=300)
+    assert len(snapshot.obtener()) == len(hoja)
+    assert conn.intentos == 3 and conn.lecturas == 1
+    # Espera exponencial con azar de hasta la mitad: [0.5, 1] y luego [1, 2] segundos
+    assert len(reloj.pausas) == 2 and 0.5 <= reloj.pausas[0] <= 1 and 1 <= reloj.pausas[1] <= 2
+
+
+def test_lectura_falla_tras_agotar_los_reintentos(nuevo_snapshot, crear_conexion, reloj):
+    conn = crear_conexion(fallas=10)
+    snapshot = nuevo_snapshot(conn, reintentos=2, espera=1.0, espera_maxima=1.5)
+    with pytest.raises(ConnectionError):
+        snapshot.obtener()
+    assert conn.intentos == 3 and max(reloj.pausas) <= 1.5 and not os.path.exists(snapshot.ruta)
+
+
+def _replica(crear, barrera, resultados):
+    snapshot = crear()
+    barrera.wait()
+    resultados.put(len(snapshot.obtener()))
+
+
+@pytest.mark.skipif("fork" not in mp.get_all_start_methods(), reason="necesita fork")
+def test_varios_procesos_leen_la_hoja_una_sola_vez(nuevo_snapshot, crear_conexion, hoja, tmp_path):
+    registro = str(tmp_path / "lecturas.txt")
+    conn = crear_conexion(latencia=0.3, registro=registro)
+    contexto = mp.get_context("fork")
+    procesos = 3
+    barrera = contexto.Barrier(procesos)
+    resultados = contexto.Queue()
+    hijos = [contexto.Process(target=_replica, args=(lambda: nuevo_snapshot(conn), barrera, resultados))
+             for _ in range(procesos)]
+    for hijo in hijos:
+        hijo.start()
+    filas = [resultados.get(timeout=60) for _ in hijos]
+    for hijo in hijos:
+        hijo.join(timeout=60)
+    with open(registro) as f:
+        lecturas = f.read().split()
+    assert filas == [len(hoja)] * procesos and len(lecturas) == 1
+
+
+# ---------------------------
+# Un solo refresco a la vez y pausa tras un fallo
+# ---------------------------
+def test_refrescos_simultaneos_leen_la_hoja_una_vez(nuevo_snapshot, conexion):
+    nuevo_snapshot().obtener()
+    conexion.latencia = 0.3
+    # Vencido para las dos: la que toma el bloqueo va a la hoja, la otra no espera
+    replicas = [nuevo_snapshot(max_edad=0), nuevo_snapshot(max_edad=0)]
+    barrera = threading.Barrier(len(replicas))
+    resultados = []
+
+    def refrescar(snapshot):
+        barrera.wait()
+        resultados.append(snapshot.refrescar(esperar=False))
+
+    hilos = [threading.Thread(target=refrescar, args=(s,)) for s in replicas]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    assert sorted(resultados) == [False, True] and conexion.lecturas == 2
+
+
+def _tomar_bloqueo(ruta, tomado, soltar):
+    with bloqueo_archivo(ruta):
+        tomado.set()
+        soltar.wait(30)
+
+
+@pytest.mark.skipif("fork" not in mp.get_all_start_methods(), reason="necesita fork")
+def test_bloqueo_excluye_a_otro_proceso(tmp_path):
+    ruta = str(tmp_path / "hoja.arrow")
+    contexto = mp.get_context("fork")
+    tomado, soltar = contexto.Event(), contexto.Event()
+    proceso = contexto.Process(target=_tomar_bloqueo, args=(ruta, tomado, soltar))
+    proceso.start()
+    try:
+        assert tomado.wait(30)
+        with bloqueo_archivo(ruta, esperar=False) as libre:
+            assert libre is False
+    finally:
+        soltar.set()
+        proceso.join(30)
+    with bloqueo_archivo(ruta, esperar=False) as libre:
+        assert libre is True
+
+
+def test_hoja_caida_sigue_sirviendo_y_pausa_los_refrescos(nuevo_snapshot, crear_conexion, hoja, reloj,
+                                                         esperar_refresco):
+    nuevo_snapshot().obtener()
+    caida = crear_conexion(fallas=10 ** 6)
+    snapshot = nuevo_snapshot(caida, max_edad=0, reintentos=1, espera=1.0, espera_maxima=300)
+    reloj.avanzar(1)  # el snapshot en disco ya está vencido
+
+    assert len(snapshot.obtener()) == len(hoja)
+    esperar_refresco(snapshot)
+    assert caida.intentos == 2 and snapshot._fallos == 1
+    pausa = snapshot._pausa_hasta - reloj.ahora
+    assert 2 <= pausa <= 4  # continúa la progresión de los reintentos: espera * 2**2 con azar
+
+    # Durante la pausa se sigue sirviendo el snapshot y no se vuelve a la hoja
+    for _ in range(5):
+        assert len(snapshot.obtener()) == len(hoja)
+        assert not snapshot._refrescando
+    assert caida.intentos == 2
+
+    # Pasada la pausa se intenta de nuevo, y la siguiente pausa es más larga
+    reloj.avanzar(pausa + 0.01)
+    assert len(snapshot.obtener()) == len(hoja)
+    esperar_refresco(snapshot)
+    assert caida.intentos == 4 and snapshot._fallos == 2 and snapshot._pausa_hasta - reloj.ahora >= 4